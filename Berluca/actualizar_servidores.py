@@ -1,19 +1,17 @@
 # actualizar_servidores.py 
 import os
-import re
 import logging
-import requests
-from typing import Dict, List, Any
-from tqdm import tqdm 
-from concurrent.futures import ThreadPoolExecutor 
 
 # 📦 Importaciones de módulos locales
 try:
-    from config import CARPETA_SALIDA, MAX_SERVIDORES_BUSCAR, PRIORIDAD_ESTADO
-    from auxiliar import extraer_bloques_m3u, extraer_url, extraer_nombre_canal
+    from config import CARPETA_SALIDA, MAX_SERVIDORES_BUSCAR
+    from sondeo_http import sondear_url
+    from almacen import abrir_almacen
+    from manifiesto import servidores_publicados
     from servidor import (
-        obtener_servidor_path, guardar_inventario_servidor, 
-        obtener_inventario_servidor, auditar_y_balancear_servidores
+        guardar_inventario_servidor,
+        obtener_inventario_servidor, leer_asignacion_servidores,
+        auditar_y_balancear_servidores, balancear_y_publicar
     )
 except ImportError as e:
     logging.error(f"Error al importar módulos en actualizar_servidores.py: {e}")
@@ -27,53 +25,34 @@ TIMEOUT_RAPIDO = 3
 MAX_THREADS = 50   
 
 def verificar_conectividad_head(url: str) -> str:
-    """Intenta una petición HEAD o GET rápida para determinar el estado (abierto/fallido/dudoso)."""
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.head(url, timeout=TIMEOUT_RAPIDO, headers=headers, allow_redirects=True)
-        response.raise_for_status() # Lanza excepción para 4xx/5xx
-
-        if response.status_code in (200, 301, 302, 303, 307, 308):
-            return 'abierto'
-        else:
-            return 'fallido' 
-            
-    except requests.exceptions.HTTPError:
-        return 'fallido'
-    except requests.exceptions.RequestException:
-        return 'dudoso' 
-    except Exception:
-        return 'dudoso'
-
-
-def actualizar_servidores_con_auditoria(ruta_inventario_auditado: str):
+    """Intenta una petición HEAD rápida para determinar el estado (abierto/fallido/dudoso)."""
+    return sondear_url(url, timeout=TIMEOUT_RAPIDO)
+
+
+def actualizar_servidores_con_auditoria(ruta_inventario_auditado: str, combinado: bool = True):
     """
-    Lee el inventario auditado (resumen de clasificador.py), 
-    actualiza el estado de los canales en los servidores existentes y re-balancea.
+    Lee el inventario auditado del almacén de canales (si el resumen M3U indicado es más
+    reciente, se importa antes), actualiza el estado de los canales en los servidores
+    existentes y re-balancea.
+
+    En modo combinado (por defecto) se re-balancean en memoria los canales del almacén y se
+    publica todo en una sola pasada de escritura; el resultado es el mismo que el del flujo
+    clásico, que primero reescribe los servidores con los estados nuevos y después re-balancea.
     """
     
     if not os.path.exists(ruta_inventario_auditado):
         print(f"⚠️ Archivo de inventario auditado no encontrado: {ruta_inventario_auditado}. Abortando actualización.")
         return
 
-    # 1. Cargar el mapa URL -> Estado auditado
-    estados_auditados = {}
+    if combinado:
+        _actualizar_y_rebalancear_combinado(ruta_inventario_auditado)
+        print("\n--- ✅ Proceso de Reclasificación por Auditoría Finalizado ---")
+        return
+
+    # 1. Cargar el mapa URL -> Estado auditado (del almacén; cada canal tiene su estado)
     try:
-        with open(ruta_inventario_auditado, "r", encoding="utf-8", errors="ignore") as f:
-            lineas = f.readlines()
-            
-        bloques = extraer_bloques_m3u(lineas)
-        for bloque in bloques:
-            url = extraer_url(bloque)
-            if not url:
-                continue
-            
-            # Buscar el estado en el bloque (formato #ESTADO:estado)
-            estado_line = next((l for l in bloque if l.startswith("#ESTADO:")), None)
-            if estado_line:
-                estado = estado_line.split(':')[1].strip().lower()
-                estados_auditados[url] = estado
-            # else: Si no tiene estado, se ignorará y usará el que tiene en el servidor existente.
+        with abrir_almacen(ruta_inventario_auditado) as almacen:
+            estados_auditados = {canal.url: canal.estado for canal in almacen.canales()}
 
         print(f"✅ Estados de {len(estados_auditados)} canales cargados del Quick Audit.")
 
@@ -84,47 +63,18 @@ def actualizar_servidores_con_auditoria(ruta_inventario_auditado: str):
     # 2. Actualizar el estado de los canales en los archivos de servidor existentes (RP_Servidor_XX.m3u)
     servidores_modificados = []
 
-    for i in range(1, MAX_SERVIDORES_BUSCAR + 1):
-        path = obtener_servidor_path(i)
-        if not os.path.exists(path):
-            continue
-        
-        # obtener_inventario_servidor debe devolver una lista de diccionarios 
-        # con 'bloque' (List[str]), 'url', 'estado' y 'categoria'.
+    for i in sorted(servidores_publicados()):
+        # obtener_inventario_servidor devuelve los Canal del servidor agrupados por categoría
         inventario = obtener_inventario_servidor(i) 
         cambios_servidor = 0
         
         for categoria, canales in inventario.items():
             for canal in canales:
-                url = canal['url']
-                
-                # Obtener el nuevo estado auditado o mantener el existente (si fue excluido del quick audit)
-                nuevo_estado = estados_auditados.get(url, canal.get('estado', 'desconocido'))
-                
-                if nuevo_estado != canal.get('estado', 'desconocido'):
-                    
-                    # 1. Actualizar el diccionario interno del canal
-                    canal['estado'] = nuevo_estado
-                    
-                    # 2. Actualizar la línea #ESTADO: dentro del bloque M3U
-                    
-                    linea_encontrada = False
-                    
-                    # R1: Buscar y actualizar si ya existe (el más común)
-                    for idx, linea in enumerate(canal['bloque']):
-                         if linea.startswith("#ESTADO:"):
-                             canal['bloque'][idx] = f"#ESTADO:{nuevo_estado}"
-                             linea_encontrada = True
-                             break
-                    
-                    # R2: Si la línea #ESTADO: no existía, añadirla antes de la URL
-                    if not linea_encontrada:
-                         # La URL siempre es la última línea
-                         canal['bloque'].insert(len(canal['bloque']) - 1, f"#ESTADO:{nuevo_estado}")
-                    
-                    # 3. Actualizar la prioridad interna para el re-balanceo
-                    canal['prioridad'] = PRIORIDAD_ESTADO.get(nuevo_estado, 0)
-                    
+                # Obtener el nuevo estado auditado o mantener el existente (si fue excluido del quick audit).
+                # cambiar_estado actualiza el código de estado (prioridad para el re-balanceo)
+                # y la línea #ESTADO: del bloque M3U (la añade antes de la URL si no existía).
+                nuevo_estado = estados_auditados.get(canal.url, canal.estado)
+                if canal.cambiar_estado(nuevo_estado):
                     cambios_servidor += 1
         
         # Guardar solo si hubo cambios de estado
@@ -133,13 +83,49 @@ def actualizar_servidores_con_auditoria(ruta_inventario_auditado: str):
                 servidores_modificados.append(i)
 
     # 3. Ejecutar la Auditoría y Balanceo Global (Reclasificación)
-    # Esta función leerá los archivos de servidor ACTUALIZADOS, ordenará por 
-    # prioridad (abierto > dudoso > fallido) y distribuirá según los límites (800/30).
+    # Esta función leerá el resumen de auditoría, ordenará por 
+    # prioridad (abierto > dudoso > fallido) y distribuirá según los límites.
     print("\n--- ⚖️ Iniciando Re-Balanceo Estratégico (Prioridad) ---")
     auditar_y_balancear_servidores(MAX_SERVIDORES_BUSCAR)
     
     print("\n--- ✅ Proceso de Reclasificación por Auditoría Finalizado ---")
 
+
+def _actualizar_y_rebalancear_combinado(ruta_inventario_auditado: str):
+    """
+    Modo combinado: publica los canales del almacén (su bloque completo, como el flujo
+    clásico, que re-balancea desde el almacén) en una sola pasada de escritura.
+    Los servidores actuales (según el manifiesto) solo aportan la asignación previa URL -> servidor
+    para el modo estable (leer_asignacion_servidores: solo las URLs, sin construir los Canal).
+    Los canales que están en un servidor pero no en el almacén se retiran, igual que en el flujo clásico.
+    """
+    # 1. Servidores actuales: URL -> servidor (asignación estable), sin parsear los canales
+    asignacion_previa = leer_asignacion_servidores()
+    print(f"📂 Inventario de servidores cargado: {len(asignacion_previa)} canales.")
+
+    # 2. Canales auditados del almacén (uno por URL, en el orden del inventario)
+    try:
+        with abrir_almacen(ruta_inventario_auditado) as almacen:
+            inventario = list(almacen.canales())
+    except Exception as e:
+        logging.error(f"Error al cargar estados auditados: {e}")
+        return
+    if not inventario:
+        print("⚠️ El almacén de canales está vacío. Abortando actualización.")
+        return
+
+    urls_inventario = {canal.url for canal in inventario}
+    nuevos = len(urls_inventario - asignacion_previa.keys())
+    retirados = len(asignacion_previa.keys() - urls_inventario)
+    print(f"✅ Quick Audit fusionado: {len(urls_inventario) - nuevos} canales ya publicados, {nuevos} canales nuevos, "
+          f"{retirados} canales retirados (ya no están en el inventario auditado).")
+
+    # 3. Re-balanceo y publicación únicos; el resumen se renderiza una vez desde el almacén
+    print("\n--- ⚖️ Iniciando Re-Balanceo Estratégico (Prioridad) ---")
+    balancear_y_publicar(inventario, asignacion_previa=asignacion_previa)
+    with abrir_almacen() as almacen:
+        almacen.exportar_m3u(ruta_inventario_auditado)
+
 if __name__ == "__main__":
     # Si se desea probar directamente, usar una ruta de archivo de resumen de prueba.
     # actualizar_servidores_con_auditoria(RUTA_RESUMEN_AUDITORIA)
@@ -0,0 +1,280 @@
+# almacen.py
+import os
+import time
+import sqlite3
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# 📦 Importaciones de configuración y auxiliares
+try:
+    from config import CARPETA_CACHE, RETENCION_HISTORIAL_ESTADOS
+except ImportError:
+    CARPETA_CACHE = os.path.join("Beluga", "cache")
+    RETENCION_HISTORIAL_ESTADOS = 90 * 24 * 3600
+
+from modelo import Canal, ESTADOS, codigo_estado
+from sondeo_http import host_de_url
+from auxiliar import iterar_bloques_archivo
+from publicador import hash_archivo
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+RUTA_ALMACEN = os.path.join(CARPETA_CACHE, "canales.sqlite3")
+TAMANO_LOTE = 5000         # Filas por executemany dentro de una transacción
+MAX_PARAMETROS_SQL = 900   # Parámetros por consulta "IN (...)" (límite clásico de SQLite: 999)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS canales (
+    url           TEXT PRIMARY KEY,
+    host          TEXT NOT NULL,
+    extinf        TEXT NOT NULL,
+    nombre_limpio TEXT NOT NULL,
+    categoria     TEXT NOT NULL,
+    estado        INTEGER NOT NULL,          -- código de estado (= PRIORIDAD_ESTADO)
+    orden         INTEGER NOT NULL,          -- posición en el resumen de auditoría
+    vigente       INTEGER NOT NULL DEFAULT 1, -- 0 = ya no está en el inventario actual
+    actualizado   INTEGER NOT NULL,
+    lineas        TEXT                       -- líneas del bloque sin #ESTADO ni URL (NULL: solo extinf)
+);
+CREATE INDEX IF NOT EXISTS idx_canales_host ON canales (host);
+CREATE INDEX IF NOT EXISTS idx_canales_categoria ON canales (categoria);
+CREATE INDEX IF NOT EXISTS idx_canales_estado ON canales (vigente, estado, orden);
+CREATE INDEX IF NOT EXISTS idx_canales_orden ON canales (vigente, orden);
+
+CREATE TABLE IF NOT EXISTS historial_estados (
+    url    TEXT NOT NULL,
+    estado INTEGER NOT NULL,
+    fecha  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_historial_url ON historial_estados (url, fecha);
+
+CREATE TABLE IF NOT EXISTS metadatos (
+    clave TEXT PRIMARY KEY,
+    valor REAL NOT NULL
+);
+"""
+
+# Instante hasta el que el almacén refleja el resumen M3U: un resumen modificado después
+# (editado a mano, restaurado de git) se vuelve a importar al abrir el almacén.
+CLAVE_SINCRONIZADO = "sincronizado"
+
+
+def _lineas_sin_estado(canal: Canal) -> str:
+    """Líneas de metadata del bloque (#EXTINF, #EXTVLCOPT, ...) sin #ESTADO ni la URL."""
+    return "\n".join(linea for linea in canal.bloque[:-1] if not linea.startswith("#ESTADO:"))
+
+
+def _lotes(filas: Iterable[tuple], tamano: int = TAMANO_LOTE) -> Iterator[List[tuple]]:
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+# =========================================================================================
+# 🗄️ ALMACÉN DE CANALES (SQLITE)
+# =========================================================================================
+
+class AlmacenCanales:
+    """
+    Registro de canales de la tubería: las Fases 1, 2 y 3 leen y actualizan esta base
+    (índices por URL, host, categoría y estado) con transacciones por lotes. Los archivos
+    M3U (resumen de auditoría, servidores) son solo salidas renderizadas desde aquí.
+    Cada cambio de estado queda además en historial_estados, que se poda en cada sincronización:
+    se conservan los cambios de los últimos `retencion` segundos y siempre el último de cada URL.
+    """
+
+    def __init__(self, ruta: str = RUTA_ALMACEN, retencion: float = RETENCION_HISTORIAL_ESTADOS):
+        self.ruta = ruta
+        self.retencion = retencion
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._conexion = sqlite3.connect(ruta)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(_ESQUEMA)
+        columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(canales)")}
+        if "lineas" not in columnas:
+            # Almacén creado antes de guardar el bloque completo
+            with self._conexion:
+                self._conexion.execute("ALTER TABLE canales ADD COLUMN lineas TEXT")
+
+    def __enter__(self) -> "AlmacenCanales":
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self._conexion.close()
+
+    # --- Escritura --------------------------------------------------------------------
+
+    def reemplazar_inventario(self, canales: Iterable[Canal]) -> int:
+        """
+        Fase 1: el inventario pasa a ser exactamente `canales`, en ese orden. Los canales que
+        ya no aparecen quedan con vigente = 0 (no se borran: conservan su historial).
+        Devuelve el número de canales vigentes.
+        """
+        ahora = int(time.time())
+        total = 0
+
+        def filas():
+            nonlocal total
+            for orden, canal in enumerate(canales):
+                total += 1
+                yield (canal.url, host_de_url(canal.url), canal.extinf, canal.nombre_limpio,
+                       canal.categoria, canal.codigo_estado, orden, ahora, _lineas_sin_estado(canal))
+
+        with self._conexion:
+            self._conexion.execute("UPDATE canales SET vigente = 0 WHERE vigente = 1")
+            for lote in _lotes(filas()):
+                self._registrar_cambios_estado([(fila[0], fila[5]) for fila in lote], ahora)
+                self._conexion.executemany(
+                    """INSERT INTO canales (url, host, extinf, nombre_limpio, categoria, estado, orden, vigente, actualizado, lineas)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+                       ON CONFLICT(url) DO UPDATE SET
+                           host = excluded.host, extinf = excluded.extinf,
+                           nombre_limpio = excluded.nombre_limpio, categoria = excluded.categoria,
+                           estado = excluded.estado, orden = excluded.orden, vigente = 1,
+                           actualizado = excluded.actualizado, lineas = excluded.lineas""",
+                    lote,
+                )
+            self._podar_historial(ahora)
+            self._marcar_sincronizado(time.time())
+        return total
+
+    def actualizar_estados(self, estados: Iterable[Tuple[str, str]]) -> int:
+        """Actualiza por lotes (URL, estado) en una sola transacción. Devuelve las filas cambiadas."""
+        ahora = int(time.time())
+        cambiados = 0
+        with self._conexion:
+            for lote in _lotes((url, codigo_estado(estado)) for url, estado in estados):
+                self._registrar_cambios_estado(lote, ahora)
+                cursor = self._conexion.executemany(
+                    "UPDATE canales SET estado = ?, actualizado = ? WHERE url = ? AND estado != ?",
+                    [(codigo, ahora, url, codigo) for url, codigo in lote],
+                )
+                cambiados += cursor.rowcount
+            self._podar_historial(ahora)
+            self._marcar_sincronizado(time.time())
+        return cambiados
+
+    def _registrar_cambios_estado(self, lote: List[Tuple[str, int]], ahora: int):
+        """Añade al historial los (url, código) cuyo estado difiere del guardado (o que son nuevos)."""
+        previos = {}
+        for i in range(0, len(lote), MAX_PARAMETROS_SQL):
+            urls = [url for url, _ in lote[i:i + MAX_PARAMETROS_SQL]]
+            previos.update(self._conexion.execute(
+                f"SELECT url, estado FROM canales WHERE url IN ({','.join('?' * len(urls))})", urls
+            ))
+        self._conexion.executemany(
+            "INSERT INTO historial_estados (url, estado, fecha) VALUES (?, ?, ?)",
+            [(url, codigo, ahora) for url, codigo in lote if previos.get(url) != codigo],
+        )
+
+    def _podar_historial(self, ahora: int) -> int:
+        """Borra los cambios anteriores a la retención que ya tienen otro más reciente de la misma URL."""
+        cursor = self._conexion.execute(
+            """DELETE FROM historial_estados
+               WHERE fecha < ? AND EXISTS (
+                   SELECT 1 FROM historial_estados AS posterior
+                   WHERE posterior.url = historial_estados.url AND posterior.rowid > historial_estados.rowid)""",
+            (ahora - self.retencion,),
+        )
+        if cursor.rowcount > 0:
+            logging.debug(f"🧹 Historial de estados: {cursor.rowcount} cambios anteriores a la retención borrados.")
+        return cursor.rowcount
+
+    def _marcar_sincronizado(self, instante: float):
+        self._conexion.execute(
+            "INSERT INTO metadatos (clave, valor) VALUES (?, ?) ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+            (CLAVE_SINCRONIZADO, instante),
+        )
+
+    # --- Lectura ----------------------------------------------------------------------
+
+    def sincronizado(self) -> float:
+        """Instante de la última escritura del almacén o del resumen renderizado/importado (0 si nunca)."""
+        fila = self._conexion.execute("SELECT valor FROM metadatos WHERE clave = ?", (CLAVE_SINCRONIZADO,)).fetchone()
+        return fila[0] if fila else 0.0
+
+    def __len__(self) -> int:
+        return self._conexion.execute("SELECT COUNT(*) FROM canales WHERE vigente = 1").fetchone()[0]
+
+    def canales(self, estado: Optional[str] = None) -> Iterator[Canal]:
+        """
+        Canales vigentes en el orden del inventario (opcionalmente solo los de un estado), con su
+        bloque completo: las líneas guardadas, #ESTADO con el estado actual y la URL.
+        """
+        consulta = "SELECT url, extinf, nombre_limpio, categoria, estado, lineas FROM canales WHERE vigente = 1"
+        parametros: tuple = ()
+        if estado is not None:
+            consulta += " AND estado = ?"
+            parametros = (codigo_estado(estado),)
+        for url, extinf, nombre_limpio, categoria, codigo, lineas in self._conexion.execute(consulta + " ORDER BY orden", parametros):
+            bloque = (lineas.split("\n") if lineas else [extinf]) + [f"#ESTADO:{ESTADOS[codigo]}", url]
+            yield Canal(bloque, url, nombre_limpio, categoria, ESTADOS[codigo])
+
+    def historial(self, url: str) -> List[Tuple[str, int]]:
+        """Estados registrados para una URL: [(estado, fecha), ...] del más antiguo al más reciente."""
+        return [(ESTADOS[codigo], fecha) for codigo, fecha in self._conexion.execute(
+            "SELECT estado, fecha FROM historial_estados WHERE url = ? ORDER BY fecha, rowid", (url,))]
+
+    # --- Importación / exportación M3U ------------------------------------------------
+
+    def importar_m3u(self, ruta: str) -> int:
+        """Carga un resumen M3U existente (p. ej. de una ejecución sin almacén) como inventario."""
+        canales = (Canal.desde_bloque(bloque) for bloque in iterar_bloques_archivo(ruta))
+        total = self.reemplazar_inventario(canal for canal in canales if canal is not None)
+        with self._conexion:
+            self._marcar_sincronizado(os.path.getmtime(ruta))
+        return total
+
+    def exportar_m3u(self, ruta: str) -> int:
+        """
+        Renderiza los canales vigentes como M3U (archivo temporal + reemplazo atómico).
+        Si el contenido no cambia, el archivo publicado no se toca.
+        """
+        ruta_tmp = ruta + ".tmp"
+        total = 0
+        with open(ruta_tmp, "w", encoding="utf-8", errors="ignore") as f:
+            f.write("#EXTM3U\n")
+            for canal in self.canales():
+                f.write("\n".join(canal.bloque) + "\n")
+                total += 1
+        if hash_archivo(ruta_tmp) == hash_archivo(ruta):
+            os.remove(ruta_tmp)
+        else:
+            os.replace(ruta_tmp, ruta)
+        with self._conexion:
+            self._marcar_sincronizado(max(self.sincronizado(), os.path.getmtime(ruta)))
+        return total
+
+
+def abrir_almacen(ruta_resumen: Optional[str] = None, ruta: str = RUTA_ALMACEN) -> AlmacenCanales:
+    """
+    Abre el almacén. Si existe el resumen M3U indicado y es más reciente que el almacén
+    (ejecuciones anteriores al almacén, o un resumen editado o restaurado a mano), lo importa
+    primero para que las fases siguientes partan del mismo inventario.
+    """
+    almacen = AlmacenCanales(ruta)
+    if ruta_resumen and os.path.exists(ruta_resumen) and os.path.getmtime(ruta_resumen) > almacen.sincronizado():
+        importados = almacen.importar_m3u(ruta_resumen)
+        logging.info(f"🗄️ Almacén actualizado desde {ruta_resumen} (más reciente): {importados} canales.")
+    return almacen
+
+
+def registrar_inventario(canales: Iterable[Canal], ruta: str = RUTA_ALMACEN) -> int:
+    """Registra `canales` como inventario del almacén (sin renderizar el resumen). Devuelve el total."""
+    with AlmacenCanales(ruta) as almacen:
+        return almacen.reemplazar_inventario(canales)
+
+
+def guardar_resumen(canales: Iterable[Canal], ruta_resumen: str, ruta: str = RUTA_ALMACEN) -> int:
+    """Registra `canales` como inventario del almacén y renderiza el resumen M3U. Devuelve el total."""
+    with AlmacenCanales(ruta) as almacen:
+        almacen.reemplazar_inventario(canales)
+        return almacen.exportar_m3u(ruta_resumen)
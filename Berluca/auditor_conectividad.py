@@ -1,16 +1,27 @@
 # auditor_conectividad.py
 import os
 import re
+import time
 import logging
 import subprocess
-from typing import Dict, List, Any
+import threading
+from typing import Dict, List, Any, Optional
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 📦 Importaciones de módulos locales
 try:
-    from config import CARPETA_SALIDA, LOGO_DEFAULT
-    from auxiliar import extraer_bloques_m3u, extraer_url, extraer_nombre_canal
+    from config import CARPETA_SALIDA, LOGO_DEFAULT, MAX_PROCESOS_STREAMLINK
+    from auxiliar import extraer_nombre_canal
+    from modelo import Canal
+    from almacen import abrir_almacen
+    from sondeo_http import CortacircuitosHosts, host_de_url, intercalar_por_host, NO_SONDEADO, SIN_SONDEAR
+    from cache_auditoria import CacheAuditoria
+    from pool_streamlink import PoolStreamlink
+    from sonda_hls import es_url_hls, sondear_hls
+    from control_adaptativo import ControlAIMD, CupoAdaptativo, TimeoutsPorHost, FACTOR_MAXIMO_CONCURRENCIA
+    from presupuesto import PresupuestoTiempo
+    from diario_auditoria import DiarioAuditoria
 except ImportError as e:
     logging.error(f"Error al importar módulos en auditor_conectividad.py: {e}")
     exit(1)
@@ -23,140 +34,348 @@ RUTA_RESUMEN_AUDITORIA = os.path.join(CARPETA_SALIDA, "RP_Resumen_Auditoria.m3u"
 COMANDO_PRUEBA_LENTA = ['streamlink', '--json', '--stream-url', '--loglevel', 'none']
 TIMEOUT_LENTO = 25  
 MAX_THREADS_LENTO = 15 
+MAX_THREADS_LENTO_POR_HOST = 3  # Pruebas Streamlink simultáneas contra un mismo host
+FALLOS_CORTE_HOST_LENTO = 3     # Timeouts consecutivos que cortan un host en la auditoría lenta
+USAR_SONDA_HLS = True           # Probar primero los .m3u8 con la sonda HLS nativa (Streamlink solo si no decide)
+CONTROL_ADAPTATIVO_LENTO = True # Hilos AIMD (desde MAX_THREADS_LENTO) y timeout por host según la latencia
+TIMEOUT_MINIMO_LENTO = 8        # Límite inferior del timeout adaptativo de Streamlink
 
-def realizar_prueba_reproduccion_real(url: str) -> bool:
+def _ejecutar_streamlink(url: str, timeout: float = TIMEOUT_LENTO) -> str:
     """
     Intenta resolver la URL de streaming usando Streamlink.
+    Devuelve 'ok', 'fallo' o 'timeout'.
     """
     try:
         resultado = subprocess.run(
             COMANDO_PRUEBA_LENTA + [url, 'best'], 
-            timeout=TIMEOUT_LENTO, 
+            timeout=timeout, 
             capture_output=True, 
             check=False 
         )
         
         if resultado.returncode == 0 and "http" in resultado.stdout.decode():
-             return True
+             return 'ok'
         else:
-             return False
+             return 'fallo'
 
     except subprocess.TimeoutExpired:
-        return False
+        return 'timeout'
     except FileNotFoundError:
         logging.error("❌ ERROR CRÍTICO: La herramienta 'streamlink' no se encuentra.")
-        return False
+        return 'fallo'
     except Exception:
-        return False
+        return 'fallo'
 
 
-def auditar_conectividad():
+def realizar_prueba_reproduccion_real(url: str) -> bool:
     """
-    Función principal que lee el Resumen, ejecuta la prueba LENTA SOLO sobre los 'dudoso' 
-    y reescribe el resumen final.
+    Intenta resolver la URL de streaming usando Streamlink.
     """
-    # 1. Verificar y leer el archivo de Resumen generado por la Fase 1
-    if not os.path.exists(RUTA_RESUMEN_AUDITORIA):
-        print(f"❌ Error: No se encontró el archivo de Resumen de Auditoría: {RUTA_RESUMEN_AUDITORIA}")
-        print("Ejecuta la Fase 1 (Clasificación/Quick Audit) primero.")
-        return
+    return _ejecutar_streamlink(url) == 'ok'
 
-    print("--- 🐢 Iniciando Auditoría LENTA Multihilo (Prueba de Reproducción REAL) ---")
 
-    with open(RUTA_RESUMEN_AUDITORIA, "r", encoding="utf-8", errors="ignore") as f:
-        bloques_auditados_fase1 = extraer_bloques_m3u(f.readlines())
-        
-    canales_a_probar = []
-    inventario_completo = []
-    
-    # 2. Identificar y recolectar solo los canales 'dudoso'
-    for bloque in bloques_auditados_fase1:
-        # El estado viene en la segunda línea del bloque: ['#EXTINF...', '#ESTADO:dudoso', 'URL']
-        estado_previo = "desconocido"
-        if len(bloque) > 1 and bloque[1].startswith("#ESTADO:"):
-            estado_previo = bloque[1].split(':')[1].strip().lower()
-        
-        canal_data = {
-            'bloque': bloque,
-            'url': extraer_url(bloque),
-            'nombre': extraer_nombre_canal(bloque),
-            'estado_previo': estado_previo
-        }
-        inventario_completo.append(canal_data)
-        
-        if estado_previo == "dudoso":
-            canales_a_probar.append(canal_data)
-        
+class _LimitesPorHost:
+    """
+    Cupo de pruebas simultáneas por host + cortacircuitos compartido entre los hilos.
+    Con `concurrencia_adaptativa` añade el cupo global AIMD (desde esa concurrencia inicial,
+    sin pasar de `concurrencia_maxima`) y los timeouts por host calculados con la latencia
+    de las pruebas anteriores.
+    Con `plazo` (instante de time.monotonic) no se empiezan pruebas una vez alcanzado.
+    """
+
+    def __init__(self, max_por_host: int, fallos_corte: int, concurrencia_adaptativa: Optional[int] = None,
+                 plazo: Optional[float] = None, concurrencia_maxima: Optional[int] = None):
+        self.max_por_host = max(1, max_por_host)
+        self.plazo = plazo
+        self.cortacircuitos = CortacircuitosHosts(fallos_corte)
+        self._semaforos: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.cupo: Optional[CupoAdaptativo] = None
+        self.timeouts: Optional[TimeoutsPorHost] = None
+        if concurrencia_adaptativa:
+            maximo = concurrencia_adaptativa * FACTOR_MAXIMO_CONCURRENCIA
+            if concurrencia_maxima:
+                maximo = min(maximo, concurrencia_maxima)
+            self.cupo = CupoAdaptativo(ControlAIMD(min(concurrencia_adaptativa, maximo), maximo=maximo))
+            # Solo latencias del propio host: un timeout corto aquí deja el canal como 'fallido'
+            self.timeouts = TimeoutsPorHost(TIMEOUT_LENTO, TIMEOUT_MINIMO_LENTO, usar_global=False)
+
+    def semaforo(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.max_por_host)
+            return self._semaforos[host]
+
+    def plazo_vencido(self) -> bool:
+        return self.plazo is not None and time.monotonic() >= self.plazo
+
+
+def _probar_con_limites(url: str, limites: _LimitesPorHost, pool: Optional[PoolStreamlink] = None) -> str:
+    """
+    Prueba Streamlink respetando el cupo del host (y el cupo global adaptativo, si lo hay).
+    Devuelve 'abierto' o 'fallido' si la prueba se hizo; SIN_SONDEAR si el host está cortado
+    (no hay veredicto) y NO_SONDEADO si el plazo de los límites ya venció (canal aplazado).
+    Con `pool` la URL se resuelve en un trabajador persistente; sin él (o si Streamlink no se
+    puede cargar como librería) se lanza el CLI.
+    """
+    host = host_de_url(url)
+    with limites.semaforo(host):
+        if limites.cortacircuitos.abierto(host):
+            return SIN_SONDEAR
+        timeout = limites.timeouts.timeout(host) if limites.timeouts is not None else TIMEOUT_LENTO
+
+        if limites.cupo is not None:
+            limites.cupo.adquirir()
+        if limites.plazo_vencido():
+            if limites.cupo is not None:
+                limites.cupo.liberar()
+            return NO_SONDEADO
+        resultado = None
+        inicio = time.monotonic()
+        try:
+            resultado = pool.resolver(url, timeout) if pool is not None else None
+            if resultado is None:
+                resultado = _ejecutar_streamlink(url, timeout)
+        finally:
+            if limites.cupo is not None:
+                limites.cupo.liberar(congestion=resultado == 'timeout')
+
+    if resultado == 'timeout':
+        limites.cortacircuitos.registrar_fallo(host)
+    else:
+        limites.cortacircuitos.registrar_exito(host)
+        # Solo las resoluciones correctas miden lo que tarda el host: un 'fallo' suele ser
+        # inmediato (sin plugin, 404) y acortaría el timeout de los streams que sí resuelven
+        if resultado == 'ok' and limites.timeouts is not None:
+            limites.timeouts.registrar_latencia(host, time.monotonic() - inicio)
+    return "abierto" if resultado == 'ok' else "fallido"
+
+
+def _prefiltrar_con_sonda_hls(canales_a_probar: List[Canal], resultados_auditoria: Dict[str, str],
+                              cache: Optional[CacheAuditoria], plazo: Optional[float] = None,
+                              diario: Optional[DiarioAuditoria] = None) -> List[Canal]:
+    """
+    Prueba los canales HLS con la sonda nativa. Los decididos ('abierto'/'fallido') se anotan
+    en resultados_auditoria (y en la caché y el diario); devuelve los que siguen a Streamlink.
+    """
+    candidatos = [canal for canal in canales_a_probar if es_url_hls(canal.url)]
+    if not candidatos:
+        return canales_a_probar
+
+    def _al_completar(i: int, veredicto: Optional[str]):
+        if veredicto is not None and diario is not None:
+            diario.anotar(candidatos[i].url, veredicto)
+        pbar.update(1)
+
+    inicio = time.time()
+    with tqdm(total=len(candidatos), desc="Sonda HLS", unit="canales") as pbar:
+        veredictos = sondear_hls([canal.url for canal in candidatos], al_completar=_al_completar, plazo=plazo)
+
+    decididos = 0
+    for canal, veredicto in zip(candidatos, veredictos):
+        if veredicto is None:
+            continue
+        resultados_auditoria[canal.url] = veredicto
+        if cache is not None:
+            cache.registrar(canal.url, veredicto)
+        decididos += 1
+
+    transcurrido = time.time() - inicio
+    print(f"⚡ Sonda HLS: {decididos}/{len(candidatos)} canales decididos en {transcurrido:.1f}s "
+          f"({1000 * transcurrido / len(candidatos):.0f} ms/canal).")
+    return [canal for canal in canales_a_probar if canal.url not in resultados_auditoria]
+
+
+def _probar_con_streamlink(canales_a_probar: List[Canal], resultados_auditoria: Dict[str, str],
+                           cache: Optional[CacheAuditoria], plazo: Optional[float] = None,
+                           diario: Optional[DiarioAuditoria] = None, ordenados: bool = False) -> List[Canal]:
+    """
+    Prueba Streamlink en paralelo sobre `canales_a_probar` y anota cada veredicto en
+    resultados_auditoria (y en la caché y el diario) según termina.
+    Devuelve los canales aplazados por el plazo (sin probar).
+    """
     canales_totales = len(canales_a_probar)
-    
-    print(f"✅ Canales dudosos detectados: {canales_totales}. Iniciando pruebas paralelas...")
+    print(f"✅ Canales dudosos a probar: {canales_totales}. Iniciando pruebas paralelas...")
+    aplazados: List[Canal] = []
+    if canales_totales == 0:
+        return aplazados
 
-    # 3. Ejecutar la auditoría en paralelo (solo en los 'dudosos')
-    resultados_auditoria = {}
-    
-    if canales_totales > 0:
-        with ThreadPoolExecutor(max_workers=MAX_THREADS_LENTO) as executor:
-            resultados_futures = {
-                executor.submit(realizar_prueba_reproduccion_real, canal['url']): canal
-                for canal in canales_a_probar
-            }
+    # Intercalar por host: los hilos no se bloquean todos esperando el cupo de un mismo origen.
+    # (Con presupuesto ya vienen ordenados por valor e intercalados por tandas.)
+    limites = _LimitesPorHost(MAX_THREADS_LENTO_POR_HOST, FALLOS_CORTE_HOST_LENTO,
+                              concurrencia_adaptativa=MAX_THREADS_LENTO if CONTROL_ADAPTATIVO_LENTO else None,
+                              plazo=plazo, concurrencia_maxima=MAX_PROCESOS_STREAMLINK)
+    canales_intercalados = (canales_a_probar if ordenados
+                            else intercalar_por_host(canales_a_probar, lambda canal: canal.url))
+    # El pool y los hilos se dimensionan con el tope de procesos (MAX_PROCESOS_STREAMLINK), no con
+    # la concurrencia AIMD: el cupo adaptativo solo decide cuántos de ellos prueban a la vez.
+    max_hilos = (limites.cupo.control.maximo if limites.cupo is not None
+                 else min(MAX_THREADS_LENTO, MAX_PROCESOS_STREAMLINK))
+
+    # Un trabajador Streamlink persistente por hilo: sin arranque de proceso por URL
+    with PoolStreamlink(max_hilos, timeout=TIMEOUT_LENTO) as pool, \
+         ThreadPoolExecutor(max_workers=max_hilos) as executor:
+        resultados_futures = {
+            executor.submit(_probar_con_limites, canal.url, limites, pool): canal
+            for canal in canales_intercalados
+        }
             
+        # Los resultados se consumen según terminan (no en el orden de envío)
+        try:
             with tqdm(total=canales_totales, desc="Prueba de Streamlink", unit="canales") as pbar:
-                for future in resultados_futures:
+                for future in as_completed(resultados_futures):
                     canal = resultados_futures[future]
-                    url = canal['url']
-                    
+                    url = canal.url
+
                     try:
-                        pasa_prueba = future.result() 
+                        estado_final = future.result() 
                     except Exception as exc:
                         logging.debug(f"Error en hilo de auditoría para {url}: {exc}")
-                        pasa_prueba = False 
+                        estado_final = SIN_SONDEAR
 
-                    estado_final = "abierto" if pasa_prueba else "fallido"
+                    if estado_final == NO_SONDEADO:
+                        aplazados.append(canal)  # Sin probar antes del plazo: sigue 'dudoso'
+                    if estado_final in (NO_SONDEADO, SIN_SONDEAR):
+                        # Sin veredicto (aplazado, host cortado o error): sigue 'dudoso' y no se cachea
+                        pbar.update(1)
+                        continue
                     resultados_auditoria[url] = estado_final
-                    
+                    if cache is not None:
+                        cache.registrar(url, estado_final)
+                    if diario is not None:
+                        diario.anotar(url, estado_final)
+
                     pbar.update(1)
+        except KeyboardInterrupt:
+            # Sin esto, la salida del executor esperaría a que se probaran todas las URLs en cola
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        if limites.cupo is not None:
+            control = limites.cupo.control
+            print(f"📈 Hilos Streamlink adaptativos: inicial {min(MAX_THREADS_LENTO, control.maximo)}, "
+                  f"tope {control.maximo}, final {control.limite}, "
+                  f"máximo {control.maximo_alcanzado}, reducciones por congestión {control.reducciones}.")
+        if pool.reinicios:
+            print(f"♻️ Trabajadores Streamlink reiniciados (timeout o caída): {pool.reinicios}")
+
+    if limites.cortacircuitos.hosts_cortados:
+        print(f"🚧 {limites.cortacircuitos.hosts_cortados} hosts cortados: "
+              f"{limites.cortacircuitos.urls_omitidas} canales sin probar (siguen 'dudoso').")
+
+    return aplazados
+
+
+def auditar_conectividad(usar_cache: bool = True, canales: Optional[List[Canal]] = None,
+                         presupuesto: Optional[PresupuestoTiempo] = None) -> Optional[List[Canal]]:
+    """
+    Función principal: toma del almacén de canales los 'dudoso', ejecuta la prueba LENTA
+    SOLO sobre ellos y guarda los veredictos en el almacén (el resumen final lo renderiza la Fase 3).
+    Los 'dudoso' con un veredicto definitivo vigente en la caché de auditoría no se vuelven a probar.
+
+    Con `canales` (modo en memoria de main) trabaja sobre esos objetos: actualiza su estado
+    con cambiar_estado, no lee ni escribe el almacén y los devuelve.
+
+    Con `presupuesto` (--time-budget) los canales se prueban por valor (nuevos, categorías
+    prioritarias, servidores bajos) hasta el plazo de la Fase 2; los que no se alcanzan a
+    probar siguen 'dudoso' y quedan en el informe de aplazados.
 
-    # 4. Consolidar todos los bloques y RE-ESCRIBIR EL RESUMEN
-    resumen_final_bloques = []
+    Cada veredicto se anota en el diario de la fase según llega: si la auditoría se interrumpe
+    (caída, kill, Ctrl-C), la siguiente ejecución reanuda sin repetir esas pruebas.
+    """
+    almacen = None
+    if canales is None:
+        # 1. Abrir el almacén generado por la Fase 1 (o importarlo del Resumen si aún no existe)
+        almacen = abrir_almacen(RUTA_RESUMEN_AUDITORIA)
+        if len(almacen) == 0:
+            almacen.cerrar()
+            print(f"❌ Error: No se encontró el archivo de Resumen de Auditoría: {RUTA_RESUMEN_AUDITORIA}")
+            print("Ejecuta la Fase 1 (Clasificación/Quick Audit) primero.")
+            return None
+        dudosos = almacen.canales(estado="dudoso")
+    else:
+        dudosos = (canal for canal in canales if canal.estado == "dudoso")
+
+    print("--- 🐢 Iniciando Auditoría LENTA Multihilo (Prueba de Reproducción REAL) ---")
+
+    canales_a_probar = []
+    resultados_auditoria = {}
+    cache = CacheAuditoria() if usar_cache else None
+    diario = DiarioAuditoria("fase2")
+    previos = diario.reanudar()
+    reanudados = 0
     
-    for canal in inventario_completo:
-        url = canal['url']
-        estado_previo = canal['estado_previo']
-        bloque_original = canal['bloque']
-        
-        estado_final_streamlink = resultados_auditoria.get(url)
-        
-        if estado_final_streamlink is None:
-            estado_final = estado_previo
+    # 2. Recolectar solo los canales 'dudoso' (en el almacén, consulta indexada por estado)
+    for canal in dudosos:
+        previo = previos.get(canal.url)
+        if previo is not None:
+            # Ya probado por una ejecución interrumpida: su veredicto está en el diario
+            resultados_auditoria[canal.url] = previo[0]
+            if cache is not None:
+                cache.registrar(canal.url, previo[0], ahora=previo[1])
+            reanudados += 1
+            continue
+        estado_cacheado = cache.obtener(canal.url) if cache is not None else None
+        if estado_cacheado in ("abierto", "fallido"):
+            resultados_auditoria[canal.url] = estado_cacheado
         else:
-            estado_final = estado_final_streamlink
+            canales_a_probar.append(canal)
         
-        # Reconstruir el bloque con el estado final (reemplazando la línea #ESTADO)
-        bloque_modificado = []
-        
-        for linea in bloque_original:
-            if linea.startswith("#ESTADO:"):
-                # Reemplazamos el estado por el estado final de Streamlink
-                bloque_modificado.append(f"#ESTADO:{estado_final}")
-            else:
-                bloque_modificado.append(linea)
-            
-        resumen_final_bloques.append(bloque_modificado)
+    if reanudados:
+        print(f"📒 Reanudando desde el diario: {reanudados} canales dudosos ya probados.")
+    if len(resultados_auditoria) > reanudados:
+        print(f"🗃️ Canales dudosos resueltos por la caché de auditoría: {len(resultados_auditoria) - reanudados}")
+
+    plazo = None
+    if presupuesto is not None:
+        canales_a_probar = presupuesto.ordenar(canales_a_probar)
+        plazo = presupuesto.plazo_fase_2()
+
+    # 2b. Sonda HLS nativa (lista -> variante -> primeros bytes de un segmento) para los .m3u8;
+    #     Streamlink solo recibe los canales que la sonda no puede decidir.
+    try:
+        if USAR_SONDA_HLS:
+            canales_a_probar = _prefiltrar_con_sonda_hls(canales_a_probar, resultados_auditoria, cache, plazo, diario)
+        aplazados = _probar_con_streamlink(canales_a_probar, resultados_auditoria, cache, plazo, diario,
+                                           ordenados=presupuesto is not None)
+    except KeyboardInterrupt:
+        diario.cerrar()
+        print(f"\n⛔ Auditoría Lenta interrumpida: {diario.anotados} veredictos guardados en {diario.ruta}. "
+              "La próxima ejecución continuará desde ahí.")
+        raise
+
+    if presupuesto is not None:
+        presupuesto.registrar_aplazados("Fase 2 (Auditoría Lenta)", aplazados)
 
+    if cache is not None:
+        cache.guardar()
 
-    # 5. Escribir el Resumen de Auditoría Final (sobre RP_Resumen_Auditoria.m3u)
-    print(f"\n--- 💾 Escribiendo Resumen de Auditoría Final: {RUTA_RESUMEN_AUDITORIA} ---")
+    if almacen is None:
+        # Modo en memoria: los veredictos se aplican a los objetos; el resumen lo escribe main al
+        # final y hasta entonces el diario se conserva (main lo borra tras escribirlo)
+        for canal in canales:
+            estado_final = resultados_auditoria.get(canal.url)
+            if estado_final is not None:
+                canal.cambiar_estado(estado_final)
+        diario.cerrar()
+        print("--- ✅ Proceso de Auditoría Lenta Finalizado ---")
+        return canales
+
+    # 4. Guardar los veredictos en el almacén (una transacción)
+    print("\n--- 💾 Guardando veredictos de la Auditoría Lenta en el almacén de canales ---")
     
-    with open(RUTA_RESUMEN_AUDITORIA, "w", encoding="utf-8", errors="ignore") as f:
-        f.write("#EXTM3U\n")
-        
-        for bloque in resumen_final_bloques:
-            f.write("\n")
-            f.writelines([linea.strip() + "\n" for linea in bloque])
+    with almacen:
+        cambiados = almacen.actualizar_estados(resultados_auditoria.items())
+    diario.finalizar()
+    print(f"✅ {len(resultados_auditoria)} veredictos guardados ({cambiados} cambios de estado).")
 
     print("--- ✅ Proceso de Auditoría Lenta Finalizado ---")
+    return None
 
 
 if __name__ == "__main__":
-    auditar_conectividad()
\ No newline at end of file
+    auditar_conectividad()
+    # Ejecutada sola (sin Fase 3), el resumen se renderiza aquí desde el almacén
+    with abrir_almacen() as almacen:
+        if len(almacen):
+            almacen.exportar_m3u(RUTA_RESUMEN_AUDITORIA)
@@ -4,7 +4,7 @@ import os
 import requests
 import logging
 import json
-from typing import List, Dict, Tuple, Set, Any, Optional
+from typing import List, Dict, Tuple, Set, Any, Optional, Iterable, Iterator, Union
 
 # 📦 Importaciones de configuración
 try:
@@ -17,6 +17,7 @@ except ImportError:
     CLAVES_CATEGORIA = {}
     CLAVES_CATEGORIA_N2 = {}
 
+from cache_descargas import CacheDescargas, descargar_con_cache
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -24,19 +25,16 @@ logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 # ⬇️ DESCARGA Y MANEJO DE ARCHIVOS
 # =========================================================================================
 
-def descargar_lista(url: str, ruta_destino: str) -> bool:
-    """Descarga el contenido de la URL en la ruta_destino."""
+def descargar_lista(url: str, ruta_destino: str, timeout: float = 30,
+                    cache: Optional[CacheDescargas] = None) -> bool:
+    """
+    Descarga el contenido de la URL en la ruta_destino.
+    Usa la caché de descargas condicionales (ETag/Last-Modified): si la lista no cambió
+    (304) se reutiliza la copia local sin volver a transferirla. Con `cache`, el índice
+    de validadores lo guarda quien la creó (una vez por ejecución).
+    """
     try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status() 
-        
-        os.makedirs(os.path.dirname(ruta_destino), exist_ok=True)
-
-        with open(ruta_destino, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk: 
-                    f.write(chunk)
-        return True
+        return descargar_con_cache(url, ruta_destino, timeout=timeout, cache=cache)
     except requests.exceptions.RequestException as e:
         logging.error(f"Error en la descarga desde {url}: {e}")
         return False
@@ -58,13 +56,26 @@ def limpiar_archivos_temporales(ruta_temp: str):
 # 📝 EXTRACCIÓN Y PARSEO DE BLOQUES M3U
 # =========================================================================================
 
-def extraer_bloques_m3u(lineas: List[str]) -> List[List[str]]:
-    """Divide las líneas de un archivo M3U en bloques de canal."""
-    bloques = []
+_PATRON_URL = re.compile(r'^https?://')
+_PATRON_NOMBRE = re.compile(r',(.+)$')
+_PATRON_LIMPIEZA_NOMBRE = re.compile(r'\[.*?\]|\{.*?\}|\(.*?\)|\-HD|\-SD|\-HQ')
+_PATRON_GROUP_TITLE = re.compile(r'group-title="([^"]+)"')
+_PATRON_ATRIBUTO = re.compile(r'(?<=[\s"])([A-Za-z][\w-]*)="([^"]*)"')
+
+
+def iterar_bloques_m3u(lineas: Iterable[Union[str, bytes]]) -> Iterator[List[str]]:
+    """
+    Divide las líneas de un M3U en bloques de canal, de forma perezosa (generador).
+    Acepta cualquier iterable de líneas: un manejador de archivo (texto o binario),
+    un flujo de bytes (p. ej. response.iter_lines()) o una lista. La memoria usada
+    no depende del tamaño de la lista.
+    """
     bloque_actual = []
     in_block = False
 
     for linea in lineas:
+        if isinstance(linea, bytes):
+            linea = linea.decode("utf-8", errors="ignore")
         linea = linea.strip()
         if not linea:
             continue
@@ -73,34 +84,39 @@ def extraer_bloques_m3u(lineas: List[str]) -> List[List[str]]:
             continue
 
         if linea.startswith("#EXTINF"):
-            if in_block and bloque_actual:
-                # Si el bloque anterior no terminó en URL, se añade
-                # (Esto no debería pasar con archivos bien formados)
-                pass 
-                
             # Iniciar nuevo bloque con la línea EXTINF
+            # (un bloque anterior sin URL se descarta; no debería pasar con archivos bien formados)
             bloque_actual = [linea]
             in_block = True
             
         elif in_block:
-            if re.match(r'^https?://', linea):
+            if _PATRON_URL.match(linea):
                 # Si la línea es una URL, termina el bloque
                 bloque_actual.append(linea)
-                bloques.append(bloque_actual)
+                yield bloque_actual
                 bloque_actual = []
                 in_block = False
             else:
                 # Si es metadata como #ESTADO:, se añade al bloque
                 bloque_actual.append(linea)
-        
-    return bloques
+
+
+def iterar_bloques_archivo(ruta: str) -> Iterator[List[str]]:
+    """Genera los bloques de un archivo M3U leyéndolo línea a línea (sin readlines())."""
+    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+        yield from iterar_bloques_m3u(f)
+
+
+def extraer_bloques_m3u(lineas: Iterable[Union[str, bytes]]) -> List[List[str]]:
+    """Divide las líneas de un archivo M3U en bloques de canal."""
+    return list(iterar_bloques_m3u(lineas))
 
 
 def extraer_url(bloque: List[str]) -> str:
     """Extrae la URL (última línea que no empieza por #) del bloque de canal."""
     # Buscar la última línea que parezca una URL
     for linea in reversed(bloque):
-        if re.match(r'^https?://', linea.strip()):
+        if _PATRON_URL.match(linea.strip()):
             return linea.strip()
     return ""
 
@@ -112,15 +128,18 @@ def extraer_nombre_canal(bloque: List[str]) -> str:
     
     for linea in bloque:
         if linea.startswith("#EXTINF"):
-            match = re.search(r',(.+)$', linea)
-            nombre = match.group(1).strip() if match else "Sin Nombre"
-            # Limpieza básica
-            nombre = re.sub(r'\[.*?\]|\{.*?\}|\(.*?\)|\-HD|\-SD|\-HQ', '', nombre).strip()
-            return nombre
+            return _limpiar_nombre_extinf(linea)
             
     return "Sin Nombre"
 
 
+def _limpiar_nombre_extinf(linea: str) -> str:
+    """Nombre del canal (tras la primera coma de la línea #EXTINF) con limpieza básica."""
+    match = _PATRON_NOMBRE.search(linea)
+    nombre = match.group(1).strip() if match else "Sin Nombre"
+    return _PATRON_LIMPIEZA_NOMBRE.sub('', nombre).strip()
+
+
 def extraer_estado(bloque: List[str]) -> str:
     """Extrae el estado ('abierto', 'dudoso', 'fallido', 'desconocido') del bloque."""
     for linea in bloque:
@@ -166,30 +185,118 @@ def extraer_categoria_del_bloque(bloque: List[str]) -> str:
     if not bloque: return "roll_over"
         
     # Buscar group-title
-    match = re.search(r'group-title="([^"]+)"', bloque[0])
+    match = _PATRON_GROUP_TITLE.search(bloque[0])
     if match:
-        titulo_visual = match.group(1).strip()
-        
-        # 1. Intentar reversar el mapeo TITULOS_VISUALES (para archivos generados)
-        for clave, titulo in TITULOS_VISUALES.items():
-            if titulo.strip().lower() == titulo_visual.strip().lower():
-                 return clave
-        
-        # 2. Si no es un título visual conocido, normalizar y clasificar
-        nombre_normalizado = normalizar_nombre(titulo_visual) 
-
-        # 3. Mapeo a las claves principales (como fallback)
-        for clave_principal in CLAVES_CATEGORIA.keys():
-             if clave_principal in nombre_normalizado:
-                 return clave_principal
-        
-        # 4. Fallback: roll_over
-        return "roll_over" 
+        return categoria_desde_titulo(match.group(1))
 
     # 5. Fallback final
     return "roll_over"
 
 
+# Índice inverso de TITULOS_VISUALES (título en minúsculas -> clave), construido una vez.
+# Ante títulos repetidos gana la primera clave, como en el recorrido lineal.
+_CLAVES_POR_TITULO_VISUAL: Dict[str, str] = {}
+for _clave, _titulo in TITULOS_VISUALES.items():
+    _CLAVES_POR_TITULO_VISUAL.setdefault(_titulo.strip().lower(), _clave)
+
+# Los group-title se repiten en miles de bloques: cada uno se resuelve una vez por ejecución
+_categorias_por_titulo: Dict[str, str] = {}
+
+
+def categoria_desde_titulo(titulo_visual: str) -> str:
+    """Convierte un group-title en la clave interna de categoría (snake_case)."""
+    titulo_visual = titulo_visual.strip()
+    categoria = _categorias_por_titulo.get(titulo_visual)
+    if categoria is None:
+        categoria = _categorias_por_titulo[titulo_visual] = _resolver_categoria_titulo(titulo_visual)
+    return categoria
+
+
+def _resolver_categoria_titulo(titulo_visual: str) -> str:
+    # 1. Reversar el mapeo TITULOS_VISUALES (para archivos generados)
+    clave = _CLAVES_POR_TITULO_VISUAL.get(titulo_visual.lower())
+    if clave is not None:
+        return clave
+    
+    # 2. Si no es un título visual conocido, normalizar y clasificar
+    nombre_normalizado = normalizar_nombre(titulo_visual) 
+
+    # 3. Mapeo a las claves principales (como fallback)
+    for clave_principal in CLAVES_CATEGORIA.keys():
+         if clave_principal in nombre_normalizado:
+             return clave_principal
+    
+    # 4. Fallback: roll_over
+    return "roll_over" 
+
+
+# =========================================================================================
+# ⚡ PARSEO EN UNA SOLA PASADA (REGISTRO DE CANAL)
+# =========================================================================================
+
+def _recorrer_bloque(bloque: List[str]) -> Tuple[Optional[str], str, Optional[str]]:
+    """Una pasada por las líneas: (primera línea #EXTINF, última URL, estado de la primera #ESTADO:)."""
+    url = ""
+    extinf = None
+    estado = None
+    for linea in bloque:
+        if linea[:1] == "#":
+            if extinf is None and linea.startswith("#EXTINF"):
+                extinf = linea
+            elif estado is None and linea.startswith("#ESTADO:"):
+                estado = linea.split(':')[1].strip().lower()
+        else:
+            linea_url = linea.strip()
+            if _PATRON_URL.match(linea_url):
+                url = linea_url
+    return extinf, url, estado
+
+
+def parsear_campos(bloque: List[str]) -> Tuple[str, str, str, str]:
+    """
+    Ruta rápida de parsear_bloque para construir un Canal: (url, nombre_limpio, categoria, estado)
+    en una sola pasada, sin diccionario ni atributos.
+    """
+    extinf, url, estado = _recorrer_bloque(bloque)
+    nombre = _limpiar_nombre_extinf(extinf) if extinf is not None else "Sin Nombre"
+    match = _PATRON_GROUP_TITLE.search(bloque[0]) if bloque else None
+    categoria = categoria_desde_titulo(match.group(1)) if match else "roll_over"
+    return url, nombre.strip().lower().replace(" ", "").replace("ñ", "n"), categoria, estado or "desconocido"
+
+
+def parsear_bloque(bloque: List[str], con_atributos: bool = False) -> Dict[str, Any]:
+    """
+    Extrae en UNA sola pasada por las líneas del bloque todos los campos del canal:
+    url, nombre (limpio), nombre_limpio (clave de deduplicación), group_title,
+    estado, prioridad y categoria; con `con_atributos`, también los atributos
+    (tvg-*, etc.), la parte más cara (Canal.desde_bloque usa parsear_campos, sin ellos).
+    Equivale a llamar a extraer_url, extraer_nombre_canal, extraer_estado y
+    extraer_categoria_del_bloque por separado.
+    """
+    extinf, url, estado = _recorrer_bloque(bloque)
+    nombre = _limpiar_nombre_extinf(extinf) if extinf is not None else "Sin Nombre"
+    estado = estado or "desconocido"
+
+    # Los atributos (y el group-title) se leen de la primera línea, como extraer_categoria_del_bloque
+    atributos: Dict[str, str] = dict(_PATRON_ATRIBUTO.findall(bloque[0])) if bloque and con_atributos else {}
+    match = _PATRON_GROUP_TITLE.search(bloque[0]) if bloque else None
+    group_title = match.group(1).strip() if match else ""
+    categoria = categoria_desde_titulo(group_title) if match else "roll_over"
+
+    return {
+        "bloque": bloque,
+        "extinf": extinf or "",
+        "url": url,
+        "nombre": nombre,
+        "nombre_limpio": nombre.strip().lower().replace(" ", "").replace("ñ", "n"),
+        "group_title": group_title,
+        "atributos": atributos,
+        "estado": estado,
+        "prioridad": PRIORIDAD_ESTADO.get(estado, 0),
+        "categoria": categoria,
+    }
+
+
 # =========================================================================================
 # 🧠 FUNCIONES DE EXTRACCIÓN Y BALANCEO (CRÍTICO PARA SERVIDOR.PY)
 # =========================================================================================
@@ -204,29 +311,20 @@ def obtener_inventario_general(ruta_resumen_auditoria: str) -> List[Dict[str, An
         logging.warning(f"⚠️ Archivo de resumen de auditoría no encontrado: {ruta_resumen_auditoria}")
         return []
 
-    with open(ruta_resumen_auditoria, "r", encoding="utf-8", errors="ignore") as f:
-        lineas = f.readlines()
-
-    bloques = extraer_bloques_m3u(lineas)
     inventario_plano = []
 
-    for bloque in bloques:
-        url = extraer_url(bloque)
-        if not url:
+    for bloque in iterar_bloques_archivo(ruta_resumen_auditoria):
+        canal = parsear_bloque(bloque)
+        if not canal["url"]:
             continue
-        
-        estado = extraer_estado(bloque)
-        prioridad = PRIORIDAD_ESTADO.get(estado, 0)
-        nombre = extraer_nombre_canal(bloque)
-        categoria = extraer_categoria_del_bloque(bloque)
 
         inventario_plano.append({
             "bloque": bloque,
-            "url": url,
-            "nombre": nombre,
-            "estado": estado,
-            "prioridad": prioridad,
-            "categoria": categoria,
+            "url": canal["url"],
+            "nombre": canal["nombre"],
+            "estado": canal["estado"],
+            "prioridad": canal["prioridad"],
+            "categoria": canal["categoria"],
         })
         
     logging.info(f"Inventario general cargado: {len(inventario_plano)} canales.")
@@ -0,0 +1,420 @@
+# benchmarks.py
+# Micro-benchmarks de las rutas calientes del pipeline. Uso:
+#   python benchmarks.py parser [ruta.m3u] [--repeticiones N]
+#   python benchmarks.py memoria [ruta.m3u] [--repeticiones N]
+#   python benchmarks.py clasificador [ruta.m3u] [--claves-extra N]
+#   python benchmarks.py balanceo [--canales N] [--categorias N]
+#   python benchmarks.py hls [--canales N]
+#   python benchmarks.py github [--listas N]
+#   python benchmarks.py reauditoria [--canales N] [--noches N]
+import os
+import sys
+import time
+import math
+import random
+import argparse
+import tempfile
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+# 📦 Importaciones de módulos locales
+try:
+    from config import (
+        CARPETA_SALIDA, CLAVES_CATEGORIA, CLAVES_CATEGORIA_N2,
+        LIMITE_BLOQUES_CATEGORIA, LIMITE_BLOQUES_SERVIDOR_GLOBAL
+    )
+    import auxiliar
+    from modelo import Canal
+    from buscador_claves import BuscadorClaves
+    from servidor import balancear_canales
+    from sonda_hls import sondear_hls
+    import cache_auditoria
+    from cache_auditoria import CacheAuditoria
+    import main as beluga
+    from tests.servidores_prueba import ServidorGitHubPrueba, ServidorHLSPrueba, iniciar_servidor
+except ImportError as e:
+    print(f"ERROR: No se pudo importar un módulo necesario: {e}")
+    sys.exit(1)
+
+RUTA_RESUMEN_AUDITORIA = os.path.join(CARPETA_SALIDA, "RP_Resumen_Auditoria.m3u")
+
+
+def _medir(funcion: Callable[[], int], repeticiones: int = 3) -> float:
+    """Devuelve el mejor tiempo (segundos) de varias ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+# =========================================================================================
+# ⚡ PARSER: multi-pasada (extraer_*) vs una sola pasada (parsear_campos)
+# =========================================================================================
+
+def _campos_multipasada(bloques: List[List[str]]) -> List[tuple]:
+    """Ruta clásica: cada campo se extrae con su propia pasada por el bloque."""
+    registros = []
+    for bloque in bloques:
+        url = auxiliar.extraer_url(bloque)
+        nombre = auxiliar.extraer_nombre_canal(bloque)
+        estado = auxiliar.extraer_estado(bloque)
+        categoria = auxiliar.extraer_categoria_del_bloque(bloque)
+        nombre_limpio = nombre.strip().lower().replace(" ", "").replace("ñ", "n")
+        registros.append((url, estado, categoria, nombre_limpio))
+    return registros
+
+
+def _campos_una_pasada(bloques: List[List[str]]) -> List[tuple]:
+    """Ruta nueva (la de Canal.desde_bloque): un único recorrido por bloque con patrones precompilados."""
+    registros = []
+    for bloque in bloques:
+        url, nombre_limpio, categoria, estado = auxiliar.parsear_campos(bloque)
+        registros.append((url, estado, categoria, nombre_limpio))
+    return registros
+
+
+def benchmark_parser(ruta: str, repeticiones_archivo: int):
+    """
+    Compara el throughput (MB/s) de ambas rutas de parseo sobre el archivo replicado N veces:
+    extremo a extremo (división en bloques + campos) y solo la extracción de campos.
+    """
+    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+        lineas = f.readlines() * repeticiones_archivo
+    megabytes = sum(len(l.encode("utf-8")) for l in lineas) / (1024 * 1024)
+    bloques = auxiliar.extraer_bloques_m3u(lineas)
+
+    # Ambas rutas deben devolver exactamente los mismos (url, estado, categoria, nombre_limpio)
+    registros = _campos_una_pasada(bloques)
+    assert registros == _campos_multipasada(bloques), "Las dos rutas de parseo no coinciden"
+    registros_completos = [auxiliar.parsear_bloque(bloque) for bloque in bloques]
+    assert [(r["url"], r["estado"], r["categoria"], r["nombre_limpio"]) for r in registros_completos] == registros, \
+        "parsear_bloque no coincide con parsear_campos"
+
+    t_bloques = _medir(lambda: auxiliar.extraer_bloques_m3u(lineas))
+    t_multi = _medir(lambda: _campos_multipasada(bloques))
+    t_una = _medir(lambda: _campos_una_pasada(bloques))
+
+    print(f"📄 Entrada: {os.path.basename(ruta)} x{repeticiones_archivo} = {megabytes:.1f} MB, {len(bloques)} canales")
+    print("   Solo extracción de campos:")
+    print(f"     Multi-pasada (extraer_*):    {t_multi:.3f}s  ->  {megabytes / t_multi:6.1f} MB/s")
+    print(f"     Una pasada (parsear_campos): {t_una:.3f}s  ->  {megabytes / t_una:6.1f} MB/s")
+    print(f"     Aceleración: x{t_multi / t_una:.2f}")
+    print(f"   Extremo a extremo (incluye {t_bloques:.3f}s de división en bloques):")
+    print(f"     Multi-pasada:  {megabytes / (t_bloques + t_multi):6.1f} MB/s")
+    print(f"     Una pasada:    {megabytes / (t_bloques + t_una):6.1f} MB/s")
+    print(f"     Aceleración: x{(t_bloques + t_multi) / (t_bloques + t_una):.2f}")
+
+
+# =========================================================================================
+# 🧮 MEMORIA: canal como diccionario vs Canal (__slots__)
+# =========================================================================================
+
+def _canales_dict(bloques: List[List[str]]) -> list:
+    """Representación clásica: un diccionario por canal."""
+    canales = []
+    for bloque in bloques:
+        registro = auxiliar.parsear_bloque(bloque)
+        canales.append({
+            "bloque": list(bloque),
+            "url": registro["url"],
+            "nombre_limpio": registro["nombre_limpio"],
+            "categoria": registro["categoria"],
+            "estado": registro["estado"],
+            "prioridad": registro["prioridad"],
+        })
+    return canales
+
+
+def _canales_slots(bloques: List[List[str]]) -> list:
+    return [Canal.desde_bloque(list(bloque)) for bloque in bloques]
+
+
+def _memoria_retenida(construir: Callable[[], list]) -> int:
+    """Bytes que siguen asignados mientras la estructura construida está viva."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    estructura = construir()
+    retenida = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del estructura
+    return retenida
+
+
+def benchmark_memoria(ruta: str, repeticiones_archivo: int):
+    """Compara la memoria por canal de ambas representaciones (bloques ya en memoria excluidos)."""
+    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+        lineas = f.readlines() * repeticiones_archivo
+    bloques = auxiliar.extraer_bloques_m3u(lineas)
+    total = len(bloques)
+
+    bytes_dict = _memoria_retenida(lambda: _canales_dict(bloques))
+    bytes_slots = _memoria_retenida(lambda: _canales_slots(bloques))
+
+    print(f"📄 Entrada: {os.path.basename(ruta)} x{repeticiones_archivo} = {total} canales")
+    print(f"   Diccionarios:      {bytes_dict / 2**20:7.1f} MB  ({bytes_dict / total:6.0f} B/canal)")
+    print(f"   Canal (__slots__): {bytes_slots / 2**20:7.1f} MB  ({bytes_slots / total:6.0f} B/canal)")
+    print(f"   Reducción: x{bytes_dict / bytes_slots:.2f}")
+
+
+# =========================================================================================
+# 🔎 CLASIFICADOR: any(palabra in nombre) por categoría vs Aho-Corasick
+# =========================================================================================
+
+def _clasificar_clasico(tablas: List[Dict[str, List[str]]], nombre: str) -> str:
+    for tabla in tablas:
+        for categoria, palabras in tabla.items():
+            if categoria != "roll_over" and any(palabra in nombre for palabra in palabras):
+                return categoria
+    return "roll_over"
+
+
+def benchmark_clasificador(ruta: str, claves_extra: int):
+    """
+    Compara ambos clasificadores sobre los nombres del archivo, con las tablas de config y con
+    `claves_extra` palabras sintéticas añadidas al final del Nivel 2 (no cambian el resultado
+    de los nombres que ya coincidían antes).
+    """
+    nombres = [auxiliar.extraer_nombre_canal(b).lower() for b in auxiliar.iterar_bloques_archivo(ruta)]
+    generador = random.Random(2048)
+    sinteticas: Dict[str, List[str]] = {}
+    for i in range(claves_extra):
+        palabra = "".join(generador.choice("bcdfghjklmnpqrstvwxz") for _ in range(8))
+        sinteticas.setdefault(f"extra_{i // 100}", []).append(palabra)
+
+    print(f"📄 Entrada: {os.path.basename(ruta)} = {len(nombres)} nombres")
+    for etiqueta, tablas in (("config", [CLAVES_CATEGORIA, CLAVES_CATEGORIA_N2]),
+                             (f"config + {claves_extra}", [CLAVES_CATEGORIA, {**CLAVES_CATEGORIA_N2, **sinteticas}])):
+        total_claves = sum(len(p) for t in tablas for c, p in t.items() if c != "roll_over")
+        buscador = BuscadorClaves(tablas, excluir=["roll_over"])
+        assert all(buscador.primera_categoria(n, "roll_over") == _clasificar_clasico(tablas, n) for n in nombres), \
+            "El buscador no coincide con el recorrido clásico"
+
+        t_clasico = _medir(lambda: [_clasificar_clasico(tablas, n) for n in nombres])
+        t_buscador = _medir(lambda: [buscador.primera_categoria(n, "roll_over") for n in nombres])
+        print(f"   Tablas {etiqueta} ({total_claves} palabras, {len(buscador)} estados):")
+        print(f"     any(palabra in nombre): {t_clasico:.3f}s  ({len(nombres) / t_clasico:9.0f} nombres/s)")
+        print(f"     Aho-Corasick:           {t_buscador:.3f}s  ({len(nombres) / t_buscador:9.0f} nombres/s)")
+        print(f"     Aceleración: x{t_clasico / t_buscador:.2f}")
+
+
+# =========================================================================================
+# ⚖️ BALANCEO: servidor_actual_num hacia adelante vs heap por cupo libre
+# =========================================================================================
+
+def _balanceo_secuencial(canales: List[Canal], limite_categoria: int, limite_global: int) -> int:
+    """Balanceador anterior: avanza de servidor y nunca vuelve atrás. Devuelve los servidores usados."""
+    servidores = defaultdict(lambda: {'inventario': defaultdict(list), 'conteo_global': 0})
+    servidor_actual_num = 1
+    for canal in canales:
+        categoria = canal.categoria
+        while True:
+            servidor = servidores[servidor_actual_num]
+            if len(servidor['inventario'][categoria]) < limite_categoria and \
+               servidor['conteo_global'] < limite_global:
+                servidor['inventario'][categoria].append(canal)
+                servidor['conteo_global'] += 1
+                break
+            servidor_actual_num += 1
+    return sum(1 for s in servidores.values() if s['conteo_global'])
+
+
+def benchmark_balanceo(total_canales: int, total_categorias: int):
+    """Reparte canales sintéticos (categorías con distribución de Zipf) con ambos balanceadores."""
+    generador = random.Random(2048)
+    categorias = [f"categoria_{i:02d}" for i in range(total_categorias)]
+    pesos = [1 / (i + 1) for i in range(total_categorias)]
+    canales = [
+        Canal(["#EXTINF:-1,Canal", f"http://host{i % 500}/{i}.m3u8"], f"http://host{i % 500}/{i}.m3u8",
+              categoria=generador.choices(categorias, pesos)[0], estado="abierto")
+        for i in range(total_canales)
+    ]
+    # Mismo orden que auditar_y_balancear_servidores
+    canales.sort(key=lambda c: (c.prioridad, c.categoria), reverse=True)
+
+    limite_cat, limite_global = LIMITE_BLOQUES_CATEGORIA, LIMITE_BLOQUES_SERVIDOR_GLOBAL
+    por_categoria = Counter(c.categoria for c in canales)
+    cota_inferior = max(math.ceil(total_canales / limite_global),
+                        max(math.ceil(n / limite_cat) for n in por_categoria.values()))
+
+    servidores_secuencial = _balanceo_secuencial(canales, limite_cat, limite_global)
+    servidores_heap = len(balancear_canales(canales, limite_cat, limite_global))
+    t_secuencial = _medir(lambda: _balanceo_secuencial(canales, limite_cat, limite_global))
+    t_heap = _medir(lambda: balancear_canales(canales, limite_cat, limite_global))
+
+    print(f"⚖️ {total_canales} canales, {total_categorias} categorías, límites {limite_cat}/categoría y {limite_global}/servidor")
+    print(f"   Cota inferior de servidores: {cota_inferior}")
+    print(f"   Secuencial (servidor_actual_num): {servidores_secuencial:5d} servidores  {t_secuencial:.3f}s")
+    print(f"   Heap por cupo libre:              {servidores_heap:5d} servidores  {t_heap:.3f}s")
+
+
+def benchmark_hls(total_canales: int):
+    """Sonda HLS nativa contra un servidor HLS local: mide ms/canal (cada veredicto se prueba en tests/test_sonda_hls.py)."""
+    servidor, base = iniciar_servidor(ServidorHLSPrueba)
+
+    esperado = {"vivo": "abierto", "roto": "fallido", "web": None}
+    tipos = ["vivo"] * 8 + ["roto", "web"]  # Mayoría de canales sanos, como en los 'dudoso' reales
+    casos = [tipos[i % len(tipos)] for i in range(total_canales)]
+    urls = [f"{base}/{tipo}/{i}/" + ("canal.m3u8" if tipo == "web" else "master.m3u8") for i, tipo in enumerate(casos)]
+
+    try:
+        inicio = time.perf_counter()
+        veredictos = sondear_hls(urls)
+        transcurrido = time.perf_counter() - inicio
+    finally:
+        servidor.shutdown()
+
+    errores = sum(1 for tipo, veredicto in zip(casos, veredictos) if veredicto != esperado[tipo])
+    print(f"📺 Sonda HLS: {total_canales} canales en {transcurrido:.2f}s "
+          f"({1000 * transcurrido / max(1, total_canales):.1f} ms/canal en total, con concurrencia)")
+    print(f"   Veredictos: {dict(Counter(veredictos))}  Incorrectos: {errores}")
+
+
+# =========================================================================================
+# 🌐 DESCUBRIMIENTO EN GITHUB contra una API local (git/trees + caché por SHA)
+# =========================================================================================
+
+def benchmark_github(total_listas: int):
+    """
+    Descubrimiento de listas contra una API de GitHub local: coste (peticiones y tiempo) del
+    árbol nuevo, del repositorio sin cambios (caché por SHA) y del recorrido por la API de
+    Contenido. Los escenarios se comprueban en tests/test_github.py.
+    """
+    archivos = [f"listas/pais_{i % 7}/lista {i}.m3u" if i % 3 else f"listas/lista_{i}.m3u8" for i in range(total_listas)]
+    archivos += ["README.md", "otros/fuera.m3u"]
+    manejador = ServidorGitHubPrueba.nuevo(archivos)
+    servidor, base = iniciar_servidor(manejador)
+    repo_url = "https://github.com/dueno/listas/tree/main/listas"
+
+    def _recolectar(usar_arbol: bool = True):
+        manejador.PETICIONES.clear()
+        inicio = time.perf_counter()
+        urls = beluga.recolectar_urls_desde_repositorio(
+            repo_url, usar_arbol=usar_arbol, api_base=base, raw_base=f"{base}/raw")
+        return len(urls), len(manejador.PETICIONES), time.perf_counter() - inicio
+
+    ruta_cache_original = beluga.RUTA_CACHE_ARBOLES
+    with tempfile.TemporaryDirectory() as carpeta:
+        beluga.RUTA_CACHE_ARBOLES = os.path.join(carpeta, "github_arboles.json")
+        try:
+            resultados = [("Árbol nuevo", _recolectar()),
+                          ("Sin cambios (caché)", _recolectar()),
+                          ("API de Contenido", _recolectar(usar_arbol=False))]
+        finally:
+            beluga.RUTA_CACHE_ARBOLES = ruta_cache_original
+            servidor.shutdown()
+
+    print(f"🌐 Descubrimiento en GitHub (API local, {total_listas} listas):")
+    for etiqueta, (listas, peticiones, transcurrido) in resultados:
+        print(f"   {etiqueta:<20} {listas:5d} listas  {peticiones:4d} peticiones  {1000 * transcurrido:8.1f} ms")
+
+
+# =========================================================================================
+# 🗓️ RE-AUDITORÍA: sondeos por noche con TTL fijo vs historial de salud
+# =========================================================================================
+
+def _simular_noches(tipos: List[str], noches: int, generador: random.Random) -> List[Counter]:
+    """Una ejecución por noche: cada canal se sondea si la caché no tiene un veredicto vigente."""
+    cache = CacheAuditoria(ruta=os.path.join(tempfile.gettempdir(), "beluga_no_existe", "auditoria.json"))
+    inicio = 1_700_000_000
+    sondeos_por_noche = []
+    for noche in range(noches):
+        ahora = inicio + noche * 24 * 3600
+        sondeos: Counter = Counter()
+        for i, tipo in enumerate(tipos):
+            url = f"http://host{i % 200}.example/{i}.m3u8"
+            if cache.obtener(url, ahora=ahora) is not None:
+                continue
+            if tipo == "estable":
+                estado = "abierto"
+            elif tipo == "muerto":
+                estado = "fallido"
+            else:
+                estado = generador.choice(("abierto", "fallido"))
+            cache.registrar(url, estado, ahora=ahora)
+            sondeos[tipo] += 1
+        sondeos_por_noche.append(sondeos)
+    return sondeos_por_noche
+
+
+def benchmark_reauditoria(total_canales: int, noches: int):
+    """
+    Simula `noches` ejecuciones diarias sobre canales sintéticos (90% estables, 5% caídos, 5%
+    intermitentes) y compara los sondeos por noche sin caché, con el TTL fijo por estado y con
+    la vigencia según el historial de salud (CacheAuditoria). Se promedia la segunda mitad.
+    """
+    generador = random.Random(2048)
+    tipos = generador.choices(["estable", "muerto", "intermitente"], [90, 5, 5], k=total_canales)
+    por_tipo = Counter(tipos)
+
+    # TTL fijo: sin ampliación por racha y sin marcar canales inestables
+    originales = (cache_auditoria.REAUDITORIA_FACTOR_MAXIMO, cache_auditoria.REAUDITORIA_UMBRAL_INESTABLE)
+    cache_auditoria.REAUDITORIA_FACTOR_MAXIMO, cache_auditoria.REAUDITORIA_UMBRAL_INESTABLE = 1, float("inf")
+    try:
+        ttl_fijo = _simular_noches(tipos, noches, random.Random(7))
+    finally:
+        cache_auditoria.REAUDITORIA_FACTOR_MAXIMO, cache_auditoria.REAUDITORIA_UMBRAL_INESTABLE = originales
+    historial = _simular_noches(tipos, noches, random.Random(7))
+
+    def _media(resultados: List[Counter], tipo: Optional[str] = None) -> float:
+        tramo = resultados[noches // 2:]
+        return sum(sum(r.values()) if tipo is None else r[tipo] for r in tramo) / len(tramo)
+
+    print(f"🗓️ {total_canales} canales ({por_tipo['estable']} estables, {por_tipo['muerto']} caídos, "
+          f"{por_tipo['intermitente']} intermitentes), {noches} noches (media de la segunda mitad)")
+    print(f"   Sin caché:          {total_canales:7.1f} sondeos/noche")
+    for etiqueta, resultados in (("TTL fijo:", ttl_fijo), ("Historial de salud:", historial)):
+        total = _media(resultados)
+        print(f"   {etiqueta:<19} {total:7.1f} sondeos/noche  "
+              f"(estables {_media(resultados, 'estable'):.1f}, caídos {_media(resultados, 'muerto'):.1f}, "
+              f"intermitentes {_media(resultados, 'intermitente'):.1f} = "
+              f"{100 * _media(resultados, 'intermitente') / total:.0f}%)")
+
+
+# 🚀 Punto de entrada
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de Beluga")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p_parser = sub.add_parser("parser", help="Throughput del parseo de bloques M3U")
+    p_parser.add_argument("ruta", nargs="?", default=RUTA_RESUMEN_AUDITORIA)
+    p_parser.add_argument("--repeticiones", type=int, default=10)
+
+    p_memoria = sub.add_parser("memoria", help="Memoria por canal: diccionario vs Canal")
+    p_memoria.add_argument("ruta", nargs="?", default=RUTA_RESUMEN_AUDITORIA)
+    p_memoria.add_argument("--repeticiones", type=int, default=10)
+
+    p_clasificador = sub.add_parser("clasificador", help="Clasificación por palabras clave")
+    p_clasificador.add_argument("ruta", nargs="?", default=RUTA_RESUMEN_AUDITORIA)
+    p_clasificador.add_argument("--claves-extra", type=int, default=3000)
+
+    p_balanceo = sub.add_parser("balanceo", help="Reparto de canales en servidores")
+    p_balanceo.add_argument("--canales", type=int, default=150_000)
+    p_balanceo.add_argument("--categorias", type=int, default=30)
+
+    p_hls = sub.add_parser("hls", help="Sonda HLS nativa contra un servidor HLS local")
+    p_hls.add_argument("--canales", type=int, default=1000)
+
+    p_github = sub.add_parser("github", help="Descubrimiento de listas contra una API de GitHub local")
+    p_github.add_argument("--listas", type=int, default=200)
+
+    p_reauditoria = sub.add_parser("reauditoria", help="Sondeos por noche según la vigencia de la caché de auditoría")
+    p_reauditoria.add_argument("--canales", type=int, default=1000)
+    p_reauditoria.add_argument("--noches", type=int, default=60)
+
+    args = parser.parse_args()
+    if args.benchmark == "parser":
+        benchmark_parser(args.ruta, args.repeticiones)
+    elif args.benchmark == "memoria":
+        benchmark_memoria(args.ruta, args.repeticiones)
+    elif args.benchmark == "clasificador":
+        benchmark_clasificador(args.ruta, args.claves_extra)
+    elif args.benchmark == "balanceo":
+        benchmark_balanceo(args.canales, args.categorias)
+    elif args.benchmark == "hls":
+        benchmark_hls(args.canales)
+    elif args.benchmark == "github":
+        benchmark_github(args.listas)
+    elif args.benchmark == "reauditoria":
+        benchmark_reauditoria(args.canales, args.noches)
@@ -0,0 +1,99 @@
+# buscador_claves.py
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+# =========================================================================================
+# 🔎 BUSCADOR MULTI-PATRÓN (AHO-CORASICK) PARA LAS TABLAS DE PALABRAS CLAVE
+# =========================================================================================
+
+class BuscadorClaves:
+    """
+    Autómata Aho-Corasick compilado una sola vez a partir de tablas {categoria: [palabras]}.
+    Encuentra todas las palabras clave presentes en un texto con UNA pasada por sus
+    caracteres, sin importar cuántas palabras tengan las tablas.
+
+    Conserva la semántica "la primera categoría gana" del recorrido clásico
+    `for categoria, palabras in tabla.items(): if any(p in texto for p in palabras)`:
+    cada categoría recibe un rango según su orden (tabla a tabla) y se devuelve la
+    categoría de menor rango entre todas las coincidencias.
+    """
+
+    def __init__(self, tablas: Sequence[Mapping[str, Iterable[str]]], excluir: Iterable[str] = ()):
+        excluir = set(excluir)
+        self._categorias: List[str] = []
+        # Una palabra vacía coincide con cualquier texto (igual que '' in texto)
+        self._rango_vacio: Optional[int] = None
+
+        # Trie: transiciones por estado y rango mínimo de las palabras que terminan en él
+        transiciones: List[Dict[str, int]] = [{}]
+        rango_salida: List[Optional[int]] = [None]
+
+        for tabla in tablas:
+            for categoria, palabras in tabla.items():
+                if categoria in excluir:
+                    continue
+                rango = len(self._categorias)
+                self._categorias.append(categoria)
+                for palabra in palabras:
+                    if not palabra:
+                        if self._rango_vacio is None:
+                            self._rango_vacio = rango
+                        continue
+                    estado = 0
+                    for caracter in palabra:
+                        siguiente = transiciones[estado].get(caracter)
+                        if siguiente is None:
+                            siguiente = len(transiciones)
+                            transiciones[estado][caracter] = siguiente
+                            transiciones.append({})
+                            rango_salida.append(None)
+                        estado = siguiente
+                    if rango_salida[estado] is None or rango < rango_salida[estado]:
+                        rango_salida[estado] = rango
+
+        # Enlaces de fallo (BFS) y autómata determinista: cada estado hereda las transiciones de
+        # su estado de fallo y añade las propias. Un carácter sin transición vuelve a la raíz,
+        # así la búsqueda es un único dict.get por carácter.
+        fallo = [0] * len(transiciones)
+        automata: List[Dict[str, int]] = [dict(transiciones[0])] + [{} for _ in transiciones[1:]]
+        cola = deque(transiciones[0].values())
+
+        while cola:
+            estado = cola.popleft()
+            fila_fallo = automata[fallo[estado]]
+            # El rango de salida incluye las palabras que terminan en el estado de fallo (sufijos)
+            rango_fallo = rango_salida[fallo[estado]]
+            if rango_fallo is not None and (rango_salida[estado] is None or rango_fallo < rango_salida[estado]):
+                rango_salida[estado] = rango_fallo
+
+            fila = dict(fila_fallo)
+            for caracter, siguiente in transiciones[estado].items():
+                fallo[siguiente] = fila_fallo.get(caracter, 0)
+                fila[caracter] = siguiente
+                cola.append(siguiente)
+            automata[estado] = fila
+
+        self._automata = automata
+        self._rango_salida = rango_salida
+
+    def __len__(self) -> int:
+        """Número de estados del autómata."""
+        return len(self._automata)
+
+    def primera_categoria(self, texto: str, defecto: Optional[str] = None) -> Optional[str]:
+        """Categoría de mayor prioridad con alguna palabra clave contenida en el texto."""
+        mejor = self._rango_vacio
+        if mejor == 0:
+            return self._categorias[0]
+
+        automata, rango_salida = self._automata, self._rango_salida
+        estado = 0
+        for caracter in texto:
+            estado = automata[estado].get(caracter, 0)
+            rango = rango_salida[estado]
+            if rango is not None and (mejor is None or rango < mejor):
+                if rango == 0:
+                    return self._categorias[0]
+                mejor = rango
+
+        return self._categorias[mejor] if mejor is not None else defecto
@@ -0,0 +1,161 @@
+# cache_auditoria.py
+import os
+import json
+import time
+import zlib
+import logging
+from typing import Dict, List, Optional, Any
+
+# 📦 Importaciones de configuración
+try:
+    from config import (
+        CARPETA_CACHE, TTL_CACHE_AUDITORIA, REAUDITORIA_RACHA_DUPLICACION, REAUDITORIA_FACTOR_MAXIMO,
+        REAUDITORIA_UMBRAL_INESTABLE, REAUDITORIA_VENTANA_INESTABLE
+    )
+except ImportError:
+    CARPETA_CACHE = os.path.join("Beluga", "cache")
+    TTL_CACHE_AUDITORIA = {"abierto": 3 * 24 * 3600, "dudoso": 6 * 3600, "fallido": 24 * 3600}
+    REAUDITORIA_RACHA_DUPLICACION = 3
+    REAUDITORIA_FACTOR_MAXIMO = 8
+    REAUDITORIA_UMBRAL_INESTABLE = 2
+    REAUDITORIA_VENTANA_INESTABLE = 7 * 24 * 3600
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+RUTA_CACHE_AUDITORIA = os.path.join(CARPETA_CACHE, "auditoria.json")
+VERSION_CACHE_AUDITORIA = 2
+ESTADOS_DEFINITIVOS = ("abierto", "fallido")
+
+# =========================================================================================
+# 🗃️ CACHÉ PERSISTENTE DE VEREDICTOS DE AUDITORÍA
+# =========================================================================================
+
+class CacheAuditoria:
+    """
+    Guarda por URL el último veredicto de auditoría y el historial de salud del canal:
+    [estado, timestamp del sondeo, código HTTP, racha, último fallo, cambios, último cambio].
+
+    - racha: veredictos definitivos iguales seguidos (> 0 'abierto', < 0 'fallido'; 'dudoso' no la toca),
+    - cambios: saltos abierto <-> fallido dentro de REAUDITORIA_VENTANA_INESTABLE (flapping).
+
+    Un veredicto está vigente mientras no supere el TTL de su estado (TTL_CACHE_AUDITORIA),
+    alargado según la racha: los canales estables se re-auditan cada vez con menos frecuencia
+    y los inestables en todas las ejecuciones.
+    """
+
+    def __init__(self, ruta: str = RUTA_CACHE_AUDITORIA, ttl: Optional[Dict[str, int]] = None):
+        self.ruta = ruta
+        self.ttl = ttl if ttl is not None else TTL_CACHE_AUDITORIA
+        self._entradas: Dict[str, List[Any]] = {}
+        self._modificada = False
+        self.cargar()
+
+    def cargar(self):
+        """Carga la caché desde disco. Un archivo ausente, corrupto o de otra versión se ignora."""
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            if datos.get("version") == VERSION_CACHE_AUDITORIA:
+                self._entradas = datos.get("entradas", {})
+            elif datos.get("version") == 1:
+                # Versión sin historial: la racha empieza con el veredicto guardado
+                self._entradas = {
+                    url: [estado, marca, codigo, 1 if estado == "abierto" else -1 if estado == "fallido" else 0,
+                          marca if estado == "fallido" else None, 0, None]
+                    for url, (estado, marca, codigo) in datos.get("entradas", {}).items()
+                }
+                self._modificada = True
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Caché de auditoría ilegible ({self.ruta}), se reconstruirá: {e}")
+            self._entradas = {}
+
+    def guardar(self):
+        """Escribe la caché de forma atómica (archivo temporal + os.replace), solo si cambió."""
+        if not self._modificada:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        ruta_tmp = self.ruta + ".tmp"
+        try:
+            with open(ruta_tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": VERSION_CACHE_AUDITORIA, "entradas": self._entradas},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(ruta_tmp, self.ruta)
+            self._modificada = False
+        except OSError as e:
+            logging.error(f"❌ No se pudo guardar la caché de auditoría: {e}")
+
+    @staticmethod
+    def _inestable(entrada: List[Any], ahora: float) -> bool:
+        cambios, ultimo_cambio = entrada[5], entrada[6]
+        return (cambios >= REAUDITORIA_UMBRAL_INESTABLE and ultimo_cambio is not None
+                and ahora - ultimo_cambio < REAUDITORIA_VENTANA_INESTABLE)
+
+    def vigencia(self, url: str) -> int:
+        """
+        Segundos de vigencia del veredicto actual: el TTL de su estado, multiplicado por 2 cada
+        REAUDITORIA_RACHA_DUPLICACION veredictos iguales seguidos (hasta REAUDITORIA_FACTOR_MAXIMO).
+        La parte ampliada se reparte entre el 75% y el 100% según la URL, para que los canales
+        estables no caduquen todos en la misma ejecución.
+        """
+        entrada = self._entradas.get(url)
+        if not entrada:
+            return 0
+        estado, racha = entrada[0], entrada[3]
+        ttl = self.ttl.get(estado, 0)
+        if estado not in ESTADOS_DEFINITIVOS:
+            return ttl
+        factor = min(REAUDITORIA_FACTOR_MAXIMO, 2 ** (abs(racha) // REAUDITORIA_RACHA_DUPLICACION))
+        reparto = 0.75 + 0.25 * (zlib.crc32(url.encode("utf-8", errors="ignore")) % 1000) / 1000
+        return int(ttl + ttl * (factor - 1) * reparto)
+
+    def obtener(self, url: str, ahora: Optional[float] = None) -> Optional[str]:
+        """Devuelve el estado cacheado si sigue vigente; None si no existe, expiró o el canal es inestable."""
+        entrada = self._entradas.get(url)
+        if not entrada:
+            return None
+        ahora = time.time() if ahora is None else ahora
+        if self._inestable(entrada, ahora):
+            return None
+        estado, marca_tiempo = entrada[0], entrada[1]
+        if ahora - marca_tiempo < self.vigencia(url):
+            return estado
+        return None
+
+    def registrar(self, url: str, estado: str, codigo_http: Optional[int] = None, ahora: Optional[float] = None):
+        """Registra el resultado de un sondeo y actualiza el historial de salud del canal."""
+        ahora = int(time.time() if ahora is None else ahora)
+        previa = self._entradas.get(url)
+        racha, ultimo_fallo, cambios, ultimo_cambio = previa[3:7] if previa else (0, None, 0, None)
+
+        if estado in ESTADOS_DEFINITIVOS:
+            signo = 1 if estado == "abierto" else -1
+            if racha * signo < 0:
+                # Cambio abierto <-> fallido: los cambios fuera de la ventana ya no cuentan
+                if ultimo_cambio is None or ahora - ultimo_cambio >= REAUDITORIA_VENTANA_INESTABLE:
+                    cambios = 0
+                cambios, ultimo_cambio = cambios + 1, ahora
+                racha = 0
+            racha += signo
+            if estado == "fallido":
+                ultimo_fallo = ahora
+
+        self._entradas[url] = [estado, ahora, codigo_http, racha, ultimo_fallo, cambios, ultimo_cambio]
+        self._modificada = True
+
+    def salud(self, url: str, ahora: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Historial de salud de la URL (racha, último fallo, cambios, inestable), o None si no hay datos."""
+        entrada = self._entradas.get(url)
+        if not entrada:
+            return None
+        ahora = time.time() if ahora is None else ahora
+        return {"estado": entrada[0], "racha": entrada[3], "ultimo_fallo": entrada[4],
+                "cambios": entrada[5], "inestable": self._inestable(entrada, ahora)}
+
+    def es_inestable(self, url: str, ahora: Optional[float] = None) -> bool:
+        entrada = self._entradas.get(url)
+        return bool(entrada) and self._inestable(entrada, time.time() if ahora is None else ahora)
+
+    def __len__(self) -> int:
+        return len(self._entradas)
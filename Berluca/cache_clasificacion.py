@@ -0,0 +1,100 @@
+# cache_clasificacion.py
+import os
+import sys
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Set
+
+# 📦 Importaciones de configuración
+try:
+    from config import CARPETA_CACHE
+except ImportError:
+    CARPETA_CACHE = os.path.join("Beluga", "cache")
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+RUTA_CACHE_CLASIFICACION = os.path.join(CARPETA_CACHE, "clasificacion.json")
+VERSION_CACHE_CLASIFICACION = 1
+
+
+def firma_configuracion(*tablas: Any) -> str:
+    """
+    Huella (sha1) de las tablas de palabras clave. El orden de las categorías forma parte
+    de la huella: decide qué categoría gana cuando un nombre coincide con varias.
+    """
+    serializado = json.dumps(tablas, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(serializado.encode("utf-8")).hexdigest()
+
+# =========================================================================================
+# 🗃️ CACHÉ PERSISTENTE NOMBRE NORMALIZADO -> CATEGORÍA
+# =========================================================================================
+
+class CacheClasificacion:
+    """
+    Guarda la categoría asignada a cada nombre de canal normalizado entre ejecuciones.
+    La caché se descarta entera si cambia la huella de la configuración de palabras clave,
+    y guardar() olvida los nombres que no se consultaron en esta ejecución (canales que ya
+    no aparecen), para que no crezca sin límite.
+    """
+
+    def __init__(self, firma: str, ruta: str = RUTA_CACHE_CLASIFICACION):
+        self.firma = firma
+        self.ruta = ruta
+        self._categorias: Dict[str, str] = {}
+        self._usados: Set[str] = set()
+        self._modificada = False
+        self.cargar()
+
+    def cargar(self):
+        """Carga la caché si es de esta versión y de la misma configuración; si no, empieza vacía."""
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Caché de clasificación ilegible ({self.ruta}), se reconstruirá: {e}")
+            return
+
+        if datos.get("version") != VERSION_CACHE_CLASIFICACION or datos.get("firma") != self.firma:
+            logging.info("🔄 La configuración de palabras clave cambió: se descarta la caché de clasificación.")
+            self._modificada = True
+            return
+        # Las categorías son unas pocas decenas de valores repetidos: se internan
+        self._categorias = {nombre: sys.intern(categoria) for nombre, categoria in datos.get("categorias", {}).items()}
+
+    def guardar(self, purgar: bool = True):
+        """
+        Escribe la caché de forma atómica (archivo temporal + os.replace), solo si cambió.
+        Con `purgar`, descarta antes los nombres no consultados desde que se cargó.
+        """
+        if purgar and len(self._usados) < len(self._categorias):
+            self._categorias = {nombre: categoria for nombre, categoria in self._categorias.items()
+                                if nombre in self._usados}
+            self._modificada = True
+        if not self._modificada:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        ruta_tmp = self.ruta + ".tmp"
+        try:
+            with open(ruta_tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": VERSION_CACHE_CLASIFICACION, "firma": self.firma,
+                           "categorias": self._categorias},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(ruta_tmp, self.ruta)
+            self._modificada = False
+        except OSError as e:
+            logging.error(f"❌ No se pudo guardar la caché de clasificación: {e}")
+
+    def obtener(self, nombre: str) -> Optional[str]:
+        self._usados.add(nombre)
+        return self._categorias.get(nombre)
+
+    def registrar(self, nombre: str, categoria: str):
+        self._usados.add(nombre)
+        self._categorias[nombre] = categoria
+        self._modificada = True
+
+    def __len__(self) -> int:
+        return len(self._categorias)
@@ -0,0 +1,179 @@
+# cache_descargas.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import requests
+from typing import Dict, Any, Optional, Set
+
+# 📦 Importaciones de configuración
+try:
+    from config import CARPETA_CACHE
+except ImportError:
+    CARPETA_CACHE = os.path.join("Beluga", "cache")
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+CARPETA_CACHE_DESCARGAS = os.path.join(CARPETA_CACHE, "descargas")
+RUTA_INDICE_DESCARGAS = os.path.join(CARPETA_CACHE, "descargas.json")
+USER_AGENT_DESCARGAS = "Beluga M3U Scraper (v1.0)"
+
+_sesiones = threading.local()  # requests.Session no es segura entre hilos: una por hilo de descarga
+
+
+def _sesion() -> requests.Session:
+    """Sesión HTTP del hilo actual (cada hilo conserva sus conexiones keep-alive)."""
+    sesion = getattr(_sesiones, "sesion", None)
+    if sesion is None:
+        sesion = _sesiones.sesion = requests.Session()
+        sesion.headers.update({"User-Agent": USER_AGENT_DESCARGAS})
+    return sesion
+
+
+def _ruta_cuerpo(url: str) -> str:
+    """Ruta del cuerpo cacheado para una URL (nombre estable derivado del hash de la URL)."""
+    return os.path.join(CARPETA_CACHE_DESCARGAS, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".m3u")
+
+# =========================================================================================
+# 🗃️ ÍNDICE DE VALIDADORES (ETag / Last-Modified)
+# =========================================================================================
+
+class CacheDescargas:
+    """
+    Índice de validadores (ETag / Last-Modified) de las listas descargadas, cargado una vez
+    por ejecución y compartido por los hilos de descarga. guardar() lo escribe una sola vez
+    al final y, con purgar=True, descarta las URLs que no aparecieron en esta ejecución
+    (entrada del índice y cuerpo cacheado).
+    """
+
+    def __init__(self, ruta: str = RUTA_INDICE_DESCARGAS):
+        self.ruta = ruta
+        self._entradas: Dict[str, Dict[str, Any]] = {}
+        self._usadas: Set[str] = set()
+        self._modificada = False
+        self._lock = threading.Lock()
+        self.cargar()
+
+    def cargar(self):
+        """Carga el índice desde disco. Un archivo ausente o corrupto se ignora."""
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                self._entradas = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Índice de descargas ilegible, se reconstruirá: {e}")
+            self._entradas = {}
+
+    def guardar(self, purgar: bool = True):
+        """
+        Escribe el índice de forma atómica si cambió. Un fallo de escritura se registra sin
+        propagarse: las descargas ya están hechas y la próxima ejecución solo pierde los 304.
+        """
+        with self._lock:
+            if purgar:
+                obsoletas = [url for url in self._entradas if url not in self._usadas]
+                for url in obsoletas:
+                    del self._entradas[url]
+                    try:
+                        os.remove(_ruta_cuerpo(url))
+                    except OSError:
+                        pass
+                if obsoletas:
+                    self._modificada = True
+                    logging.info(f"🧹 Caché de descargas: {len(obsoletas)} listas que ya no aparecen, descartadas.")
+            if not self._modificada:
+                return
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            ruta_tmp = self.ruta + ".tmp"
+            try:
+                with open(ruta_tmp, "w", encoding="utf-8") as f:
+                    json.dump(self._entradas, f, ensure_ascii=False, indent=1)
+                os.replace(ruta_tmp, self.ruta)
+                self._modificada = False
+            except OSError as e:
+                logging.warning(f"⚠️ No se pudo guardar el índice de descargas ({self.ruta}): {e}")
+
+    def validadores(self, url: str) -> Dict[str, Any]:
+        """Devuelve los validadores guardados para la URL y la marca como usada en esta ejecución."""
+        with self._lock:
+            self._usadas.add(url)
+            return dict(self._entradas.get(url, {}))
+
+    def registrar(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        with self._lock:
+            self._usadas.add(url)
+            self._entradas[url] = {"etag": etag, "last_modified": last_modified, "actualizado": int(time.time())}
+            self._modificada = True
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+# =========================================================================================
+# ⬇️ DESCARGA CONDICIONAL
+# =========================================================================================
+
+def _guardar_respuesta(response: requests.Response, url: str, ruta_cuerpo: str, cache: CacheDescargas):
+    """Guarda el cuerpo de una respuesta completa como copia cacheada y anota sus validadores."""
+    response.raise_for_status()
+    ruta_tmp = f"{ruta_cuerpo}.{threading.get_ident()}.tmp"
+    with open(ruta_tmp, "wb") as f:
+        for chunk in response.iter_content(chunk_size=65536):
+            if chunk:
+                f.write(chunk)
+    os.replace(ruta_tmp, ruta_cuerpo)
+    cache.registrar(url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+
+def descargar_con_cache(url: str, ruta_destino: str, timeout: float = 30,
+                        cache: Optional[CacheDescargas] = None) -> bool:
+    """
+    Descarga la URL en ruta_destino usando una petición condicional (If-None-Match /
+    If-Modified-Since) cuando hay una copia cacheada. Ante un 304 se reutiliza el cuerpo
+    cacheado sin volver a transferirlo; un 304 sin copia o sin validadores se trata como un
+    fallo de caché y se repite la descarga completa. Lanza requests.exceptions.RequestException
+    si falla la red.
+
+    Con `cache` (compartida por una ejecución), el índice se escribe al llamar a cache.guardar();
+    sin ella, se usa un índice propio que se guarda tras esta descarga (sin purgar).
+    """
+    cache_propia = cache is None
+    if cache_propia:
+        cache = CacheDescargas()
+
+    os.makedirs(CARPETA_CACHE_DESCARGAS, exist_ok=True)
+    ruta_cuerpo = _ruta_cuerpo(url)
+    entrada = cache.validadores(url)
+
+    cabeceras = {}
+    if os.path.exists(ruta_cuerpo):
+        if entrada.get("etag"):
+            cabeceras["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabeceras["If-Modified-Since"] = entrada["last_modified"]
+
+    with _sesion().get(url, headers=cabeceras, stream=True, timeout=timeout) as response:
+        reutilizada = response.status_code == 304 and bool(cabeceras) and os.path.exists(ruta_cuerpo)
+        if reutilizada:
+            logging.info(f"♻️ Sin cambios (304), se reutiliza la copia cacheada: {url}")
+        elif response.status_code != 304:
+            _guardar_respuesta(response, url, ruta_cuerpo, cache)
+
+    if response.status_code == 304 and not reutilizada:
+        # 304 sin nada que reutilizar (no se enviaron validadores o la copia desapareció): descarga completa
+        logging.debug(f"304 sin copia cacheada para {url}; se descarga de nuevo.")
+        with _sesion().get(url, headers={"Cache-Control": "no-cache"}, stream=True, timeout=timeout) as response:
+            if response.status_code == 304:
+                raise requests.exceptions.HTTPError(f"304 sin copia cacheada: {url}", response=response)
+            _guardar_respuesta(response, url, ruta_cuerpo, cache)
+
+    if cache_propia:
+        cache.guardar(purgar=False)
+
+    os.makedirs(os.path.dirname(ruta_destino) or ".", exist_ok=True)
+    shutil.copyfile(ruta_cuerpo, ruta_destino)
+    return True
@@ -1,18 +1,28 @@
 # clasificador.py
 import os
 import re 
+import sys
 from typing import List, Dict, Optional, Tuple, Set
 import logging
-import requests 
+import threading
 from tqdm import tqdm 
 
 # 📦 Importaciones de configuración y auxiliares
 try:
     from config import (
         CLAVES_CATEGORIA, contiene_exclusion, CLAVES_NO_ESPANOL, 
-        TITULOS_VISUALES, CLAVES_CATEGORIA_N2, PRIORIDAD_ESTADO, CARPETA_SALIDA
+        TITULOS_VISUALES, CLAVES_CATEGORIA_N2, PRIORIDAD_ESTADO, CARPETA_SALIDA,
+        MAX_SONDEOS_AUDITORIA_RAPIDA
     )
     import auxiliar
+    from sondeo_http import sondear_url, sondear_urls_detalle, NO_SONDEADO, SIN_SONDEAR
+    from cache_auditoria import CacheAuditoria
+    from modelo import Canal
+    from buscador_claves import BuscadorClaves
+    from cache_clasificacion import CacheClasificacion, firma_configuracion
+    from almacen import registrar_inventario
+    from presupuesto import PresupuestoTiempo
+    from diario_auditoria import DiarioAuditoria
     # Intentamos importar file_manager, si existe
     try:
         from file_manager import asegurar_archivo_categoria
@@ -23,6 +33,7 @@ except ImportError as e:
     # Definiciones de fallback si falla la importación
     PRIORIDAD_ESTADO = {"abierto": 3, "dudoso": 2, "fallido": 1, "desconocido": 0}
     CARPETA_SALIDA = "Beluga"
+    MAX_SONDEOS_AUDITORIA_RAPIDA = 200
     class auxiliar: 
         @staticmethod
         def extraer_nombre_canal(bloque): return "sin_nombre"
@@ -30,146 +41,269 @@ except ImportError as e:
         def extraer_url(bloque): return ""
         @staticmethod
         def extraer_bloques_m3u(lineas): return []
+        @staticmethod
+        def iterar_bloques_archivo(ruta): return iter(())
 
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
 # --- CONFIGURACIÓN DEL CHECK REAL ---
 TIMEOUT_CHECK = 15 
+MAX_WORKERS_CHECK = MAX_SONDEOS_AUDITORIA_RAPIDA # Sondeos HEAD simultáneos (en vuelo) de la Auditoría Rápida (config / --workers)
 contador_verificacion = 0
+_lock_contador = threading.Lock()
 
 # =========================================================================================
 # 🧠 LÓGICA DE ASIGNACIÓN (CRÍTICO: FUNCIÓN CLASIFICAR_BLOQUE)
 # =========================================================================================
 
+# Buscador compilado una vez: Nivel 1 (sin roll_over) y luego Nivel 2, en el orden de config.
+# Devuelve la misma categoría que recorrer las tablas con any(palabra in nombre ...).
+_BUSCADOR_CATEGORIAS = BuscadorClaves([CLAVES_CATEGORIA, CLAVES_CATEGORIA_N2], excluir=["roll_over"])
+
+# Caché persistente nombre -> categoría, invalidada si cambian las tablas de palabras clave.
+# Solo la usa esta fase: la Fase 1 clasifica todos los canales vivos (los guardados y los nuevos),
+# así que al guardar se olvidan los nombres que no se consultaron. La re-clasificación del
+# roll-over de generador.py (CLAVES_ROLL_OVER, otra tabla) queda fuera a propósito: es una
+# pasada puntual sobre un archivo ya clasificado, sin nombres que se repitan entre ejecuciones.
+_FIRMA_CLAVES = firma_configuracion(CLAVES_CATEGORIA, CLAVES_CATEGORIA_N2)
+_cache_clasificacion: Optional[CacheClasificacion] = None
+
+
+def _obtener_cache_clasificacion() -> CacheClasificacion:
+    """Caché de clasificación del proceso, cargada desde disco en el primer uso."""
+    global _cache_clasificacion
+    if _cache_clasificacion is None:
+        _cache_clasificacion = CacheClasificacion(_FIRMA_CLAVES)
+    return _cache_clasificacion
+
+
 def clasificar_bloque(bloque: List[str]) -> str:
     """Asigna una categoría a un bloque de canal."""
-    nombre = auxiliar.extraer_nombre_canal(bloque).lower() 
-    
-    # 1. Búsqueda por CLAVES_CATEGORIA (Nivel 1)
-    for categoria_clave, palabras in CLAVES_CATEGORIA.items():
-        if categoria_clave in ["roll_over"]:
-            continue
-            
-        if any(palabra in nombre for palabra in palabras):
-            return categoria_clave
+    return clasificar_nombre(auxiliar.extraer_nombre_canal(bloque).lower())
 
-    # 2. Búsqueda por CLAVES_CATEGORIA_N2 (Nivel 2)
-    for categoria_clave, palabras in CLAVES_CATEGORIA_N2.items():
-        if any(palabra in nombre for palabra in palabras):
-            return categoria_clave
-            
-    # 3. Categoría por defecto si no hay coincidencia
-    return "roll_over"
+
+def clasificar_nombre(nombre: str) -> str:
+    """Asigna una categoría a un nombre de canal ya normalizado (limpio y en minúsculas)."""
+    cache = _obtener_cache_clasificacion()
+    categoria = cache.obtener(nombre)
+    if categoria is None:
+        # 1. Búsqueda por CLAVES_CATEGORIA (Nivel 1), 2. CLAVES_CATEGORIA_N2 (Nivel 2)
+        #    en una sola pasada por el nombre.
+        # 3. Categoría por defecto si no hay coincidencia
+        categoria = _BUSCADOR_CATEGORIAS.primera_categoria(nombre, "roll_over")
+        cache.registrar(nombre, categoria)
+    return categoria
 
 
 def verificar_estado_canal(url: str, nombre: str, index: int) -> str:
     """Verificación de URL por HTTP para obtener el estado real (Quick Audit)."""
     global contador_verificacion
-    contador_verificacion += 1
+    with _lock_contador:
+        contador_verificacion += 1
 
-    if 'localhost' in url or '127.0.0.1' in url:
+    if _es_url_local(url):
         return 'fallido' 
 
-    # Prueba rápida HEAD
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.head(url, timeout=TIMEOUT_CHECK, headers=headers, allow_redirects=True)
-        
-        # Evaluación de estado HTTP
-        if response.status_code in (200, 301, 302, 303, 307, 308):
-            return 'abierto'
-        else:
-            return 'fallido'
-            
-    except requests.exceptions.RequestException:
-        return 'dudoso'
+    # Prueba rápida HEAD (motor asyncio compartido)
+    return sondear_url(url, timeout=TIMEOUT_CHECK)
+
+
+def _es_url_local(url: str) -> bool:
+    """Las URLs locales nunca son accesibles para los clientes: se marcan 'fallido' sin sondear."""
+    return 'localhost' in url or '127.0.0.1' in url
 
 # =========================================================================================
 # 📝 FUNCIONES DE ESCRITURA Y CLASIFICACIÓN FINAL
 # =========================================================================================
 
-def clasificar_enlaces(rutas_lista_nueva: List[str], inventario_existente: Dict[str, List[str]]):
+def _preparar_bloque(bloque_completo: List[str]) -> Canal:
+    """Clasifica un bloque y construye el Canal a auditar (con su estado base)."""
+    url = auxiliar.extraer_url(bloque_completo) 
+    nombre = auxiliar.extraer_nombre_canal(bloque_completo) 
+    
+    estado_base = "desconocido"
+    if len(bloque_completo) > 1 and bloque_completo[1].startswith("#ESTADO:"):
+        estado_base = bloque_completo[1].split(':')[1].strip().lower()
+
+    return Canal(
+        bloque_completo, url,
+        nombre_limpio=nombre.strip().lower().replace(" ", "").replace("ñ", "n"),
+        categoria=clasificar_nombre(nombre.lower()),
+        estado=estado_base,
+    )
+
+
+def _enriquecer_bloque(canal: Canal, estado_final: str) -> Canal:
+    """Reescribe el bloque del canal con el group-title de su categoría y su estado final."""
+    url, categoria = canal.url, canal.categoria
+    extinf_line = canal.extinf
+    
+    titulo_visual = TITULOS_VISUALES.get(categoria, f"★ {categoria.replace('_', ' ').upper()} ★")
+    extinf_line_mod = re.sub(r'group-title=\"[^\"]*\"', f'group-title=\"{titulo_visual}\"', extinf_line)
+    if 'group-title' not in extinf_line_mod:
+        nombre = auxiliar.extraer_nombre_canal(canal.bloque)
+        extinf_line_mod = extinf_line_mod.replace(f",{nombre}", f' group-title="{titulo_visual}",{nombre}')
+
+    # El bloque final para el inventario (Resumen_Auditoria.m3u):
+    canal.bloque = [extinf_line_mod, sys.intern(f"#ESTADO:{estado_final}"), url]
+    canal.estado = estado_final
+    return canal
+
+
+def clasificar_enlaces(rutas_lista_nueva: List[str], inventario_existente: Dict[str, List[str]],
+                       max_workers: int = MAX_WORKERS_CHECK, usar_cache: bool = True,
+                       usar_almacen: bool = True,
+                       presupuesto: Optional["PresupuestoTiempo"] = None) -> List[Canal]:
     """
     Combina el inventario existente, lo fusiona con TODAS las listas nuevas de las rutas 
-    y ejecuta la Auditoría Rápida solo en los canales nuevos o fallidos.
+    y ejecuta la Auditoría Rápida solo en los canales sin un veredicto vigente en la caché
+    de auditoría (sin caché: solo en los canales que no están 'abierto').
+    La auditoría admite hasta `max_workers` sondeos simultáneos; el orden de salida se conserva.
+    Devuelve los canales enriquecidos y los registra en el almacén de canales (el resumen M3U
+    se renderiza desde él en la Fase 3). Con usar_almacen=False (modo en memoria de main)
+    no se toca el almacén: los canales pasan directamente a la Fase 2.
+    Con `presupuesto` (--time-budget) se sondea primero lo más valioso y los canales que no se
+    alcanzan a sondear antes del plazo de la Fase 1 conservan su estado anterior.
+    Cada resultado se anota en el diario de la fase: si la ejecución se interrumpe (caída,
+    kill, Ctrl-C), la siguiente reanuda sin volver a sondear esos canales.
     """
     
-    # 1. Leer los bloques de TODAS las listas M3U nuevas y consolidar
-    bloques_nuevos = []
-    for ruta in rutas_lista_nueva:
-        with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
-            lineas_nueva = f.readlines()
-        bloques_nuevos.extend(auxiliar.extraer_bloques_m3u(lineas_nueva)) 
-    
-    # 2. Compilar inventario total (Existente + Nuevo)
+    # 1 y 2. Leer en streaming los bloques de TODAS las listas M3U nuevas y compilar
+    # el inventario total (Existente + Nuevo) sin materializar las listas completas en memoria.
     inventario_total = inventario_existente.copy() 
     total_canales_nuevos = 0
     
-    for bloque in bloques_nuevos:
-        url = auxiliar.extraer_url(bloque) 
-        if url and url not in inventario_total:
-            
-            extinf_line = [l for l in bloque if l.startswith("#EXTINF")][0]
-            bloque_simple = [extinf_line, url] 
-            inventario_total[url] = bloque_simple 
-            total_canales_nuevos += 1
+    for ruta in rutas_lista_nueva:
+        for bloque in auxiliar.iterar_bloques_archivo(ruta):
+            url = auxiliar.extraer_url(bloque) 
+            if url and url not in inventario_total:
+                
+                extinf_line = [l for l in bloque if l.startswith("#EXTINF")][0]
+                bloque_simple = [extinf_line, url] 
+                inventario_total[url] = bloque_simple 
+                total_canales_nuevos += 1
             
     bloques_para_auditar = list(inventario_total.values())
 
     print(f"Total de canales combinados (deduplicados) para auditar: {len(bloques_para_auditar)}")
     print(f"Canales nuevos añadidos de la(s) URL(s): {total_canales_nuevos}") 
     
-    # 3. EJECUTAR LA LÓGICA DE CLASIFICACIÓN Y AUDITORÍA
-    bloques_enriquecidos = []
-    
-    for i, bloque_completo in tqdm(enumerate(bloques_para_auditar), 
-                                desc="Clasificando y Auditando Rápido", 
-                                total=len(bloques_para_auditar)):
-        
-        url = auxiliar.extraer_url(bloque_completo) 
-        nombre = auxiliar.extraer_nombre_canal(bloque_completo) 
-        
-        estado_base = "desconocido"
-        if len(bloque_completo) > 1 and bloque_completo[1].startswith("#ESTADO:"):
-            estado_base = bloque_completo[1].split(':')[1].strip().lower()
+    # 3. CLASIFICACIÓN
+    canales = [_preparar_bloque(b) for b in tqdm(bloques_para_auditar, desc="Clasificando")]
+    _obtener_cache_clasificacion().guardar()
 
-        categoria = clasificar_bloque(bloque_completo)
+    # Prioridad de Auditoría: No re-auditar canales con un veredicto vigente en caché (la vigencia
+    # crece con la racha de veredictos iguales; los canales inestables se auditan siempre).
+    # Sin caché se mantiene la regla clásica: no re-auditar canales 'abierto' existentes.
+    cache = CacheAuditoria() if usar_cache else None
+    estados_finales: List[str] = [canal.estado for canal in canales]
+    indices_a_sondear = []
+    for i, canal in enumerate(canales):
+        if _es_url_local(canal.url):
+            estados_finales[i] = "fallido"
+            continue
+        if cache is not None:
+            estado_cacheado = cache.obtener(canal.url)
+            if estado_cacheado is not None:
+                estados_finales[i] = estado_cacheado
+                continue
+        elif canal.estado == "abierto":
+            continue
+        indices_a_sondear.append(i)
 
-        # Prioridad de Auditoría: No re-auditar canales 'abierto' existentes.
-        if estado_base == "abierto":
-            estado_final = "abierto"
-        else:
-            estado_final = verificar_estado_canal(url, nombre, i)
-        
-        # 4. Enriquecer el bloque para el resumen final
-        extinf_line = [l for l in bloque_completo if l.startswith("#EXTINF")][0]
-        
-        titulo_visual = TITULOS_VISUALES.get(categoria, f"★ {categoria.replace('_', ' ').upper()} ★")
-        extinf_line_mod = re.sub(r'group-title=\"[^\"]*\"', f'group-title=\"{titulo_visual}\"', extinf_line)
-        if 'group-title' not in extinf_line_mod:
-            extinf_line_mod = extinf_line_mod.replace(f",{nombre}", f' group-title="{titulo_visual}",{nombre}')
-
-        # El bloque final para el inventario (Resumen_Auditoria.m3u):
-        bloques_enriquecidos.append({
-            "bloque": [extinf_line_mod, f"#ESTADO:{estado_final}", url], 
-            "url": url,
-            "nombre_limpio": nombre.strip().lower().replace(" ", "").replace("ñ", "n"),
-            "categoria": categoria,
-            "estado": estado_final
-        })
+    if cache is not None:
+        inestables = sum(1 for i in indices_a_sondear if cache.es_inestable(canales[i].url))
+        print(f"🗃️ Veredictos vigentes en caché: {len(canales) - len(indices_a_sondear)}. "
+              f"Canales a sondear: {len(indices_a_sondear)} (inestables: {inestables})")
+
+    # Reanudación: los canales ya sondeados por una ejecución interrumpida toman su resultado del diario
+    diario = DiarioAuditoria("fase1")
+    previos = diario.reanudar()
+    if previos:
+        pendientes = []
+        for i in indices_a_sondear:
+            previo = previos.get(canales[i].url)
+            if previo is None or previo[0] in (NO_SONDEADO, SIN_SONDEAR):
+                pendientes.append(i)
+                continue
+            estados_finales[i] = previo[0]
+            if cache is not None:
+                cache.registrar(canales[i].url, previo[0], ahora=previo[1])
+        print(f"📒 Reanudando desde el diario: {len(indices_a_sondear) - len(pendientes)} canales ya sondeados. "
+              f"Pendientes: {len(pendientes)}")
+        indices_a_sondear = pendientes
+
+    plazo = None
+    if presupuesto is not None:
+        # Con presupuesto de tiempo: canales nuevos, categorías prioritarias y servidores bajos primero
+        indices_a_sondear = presupuesto.ordenar(indices_a_sondear, lambda i: canales[i])
+        plazo = presupuesto.plazo_fase_1()
+
+    # 4. AUDITORÍA RÁPIDA (Concurrente, motor asyncio con conexiones keep-alive)
+    # Los resultados se asignan por índice, por lo que el resumen mantiene el orden original.
+    urls_a_sondear = [canales[i].url for i in indices_a_sondear]
+
+    def _al_completar(j: int, estado: str):
+        # Solo resultados de un sondeo real: aplazados y omitidos (host cortado, error) se repiten
+        if estado not in (NO_SONDEADO, SIN_SONDEAR):
+            diario.anotar(urls_a_sondear[j], estado)
+        pbar.update(1)
+
+    try:
+        with tqdm(total=len(indices_a_sondear), desc="Auditando Rápido (HEAD)", unit="canales") as pbar:
+            resultados_sondeo = sondear_urls_detalle(
+                urls_a_sondear,
+                timeout=TIMEOUT_CHECK,
+                max_simultaneos=max_workers,
+                al_completar=_al_completar,
+                plazo=plazo,
+            )
+    except KeyboardInterrupt:
+        diario.cerrar()
+        print(f"\n⛔ Auditoría Rápida interrumpida: {diario.anotados} resultados guardados en {diario.ruta}. "
+              "La próxima ejecución continuará desde ahí.")
+        raise
+    aplazados = []
+    sin_sondear = 0
+    for i, (estado, codigo_http) in zip(indices_a_sondear, resultados_sondeo):
+        if estado == NO_SONDEADO:
+            aplazados.append(canales[i])  # Sin sondear: conserva su estado anterior
+            continue
+        if estado == SIN_SONDEAR:
+            # Host cortado o error interno: no hay veredicto que cachear; la Auditoría Lenta lo prueba
+            estados_finales[i] = "dudoso"
+            sin_sondear += 1
+            continue
+        estados_finales[i] = estado
+        if cache is not None:
+            cache.registrar(canales[i].url, estado, codigo_http)
+    if presupuesto is not None:
+        presupuesto.registrar_aplazados("Fase 1 (Auditoría Rápida)", aplazados)
+
+    if cache is not None:
+        cache.guardar()
+
+    global contador_verificacion
+    with _lock_contador:
+        contador_verificacion += len(indices_a_sondear) - len(aplazados) - sin_sondear
+
+    bloques_enriquecidos = [
+        _enriquecer_bloque(canal, estado) for canal, estado in zip(canales, estados_finales)
+    ]
         
-    # 5. Escribir el resumen de auditoría
-    RUTA_RESUMEN_AUDITORIA = os.path.join(CARPETA_SALIDA, "RP_Resumen_Auditoria.m3u")
-    
-    print(f"\n--- 💾 Escribiendo Resumen de Auditoría Rápida: {RUTA_RESUMEN_AUDITORIA} ---")
+    if not usar_almacen:
+        # Los resultados solo están en memoria: main borra el diario cuando escribe el resumen
+        diario.cerrar()
+        print("✅ Consolidación y Quick Audit finalizada. Canales listos en memoria para auditoría lenta.")
+        return bloques_enriquecidos
+
+    # 5. Registrar el inventario en el almacén (el resumen de auditoría se renderiza en la Fase 3)
+    print("\n--- 💾 Registrando inventario de la Auditoría Rápida en el almacén de canales ---")
     
-    with open(RUTA_RESUMEN_AUDITORIA, "w", encoding="utf-8", errors="ignore") as f:
-        f.write("#EXTM3U\n")
-        canales_totales_resumen = 0
-        for canal in bloques_enriquecidos:
-            f.write("\n".join(canal["bloque"]) + "\n")
-            canales_totales_resumen += 1
-
-    print(f"✅ Archivo de Resumen de Auditoría (Quick Audit) generado con {canales_totales_resumen} canales.")
-    print("✅ Consolidación y Quick Audit finalizada. Archivo de resumen listo para auditoría lenta.")
\ No newline at end of file
+    canales_registrados = registrar_inventario(bloques_enriquecidos)
+    diario.finalizar()
+
+    print(f"✅ Inventario (Quick Audit) registrado con {canales_registrados} canales.")
+    print("✅ Consolidación y Quick Audit finalizada. Almacén listo para auditoría lenta.")
+    return bloques_enriquecidos
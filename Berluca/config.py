@@ -8,9 +8,10 @@ CARPETA_SALIDA = "Beluga"
 CARPETA_ORIGEN = os.path.join(CARPETA_SALIDA, "compilados")
 CARPETA_SEGMENTADOS = os.path.join(CARPETA_SALIDA, "segmentados")
 CARPETA_LOGS = os.path.join(CARPETA_SALIDA, "logs")
+CARPETA_CACHE = os.path.join(CARPETA_SALIDA, "cache") # Estado persistente entre ejecuciones (no se publica)
 
 # 🧱 Crear carpetas si no existen
-for carpeta in [CARPETA_SALIDA, CARPETA_ORIGEN, CARPETA_SEGMENTADOS, CARPETA_LOGS]:
+for carpeta in [CARPETA_SALIDA, CARPETA_ORIGEN, CARPETA_SEGMENTADOS, CARPETA_LOGS, CARPETA_CACHE]:
     os.makedirs(carpeta, exist_ok=True)
 
 
@@ -24,10 +25,43 @@ PRIORIDAD_ESTADO = {
     "desconocido": 0
 }
 
+# ⏳ Vigencia (segundos) del último veredicto de auditoría de cada URL, según su estado.
+# Mientras el veredicto esté vigente, la URL no se vuelve a sondear.
+TTL_CACHE_AUDITORIA = {
+    "abierto": 3 * 24 * 3600,
+    "dudoso": 6 * 3600,
+    "fallido": 24 * 3600,
+}
+
+# 🩺 Re-auditoría según el historial de salud de cada canal (cache_auditoria.py).
+# La vigencia de un veredicto se duplica cada REAUDITORIA_RACHA_DUPLICACION veredictos iguales
+# seguidos (hasta REAUDITORIA_FACTOR_MAXIMO veces el TTL). Un canal que cambió de estado
+# REAUDITORIA_UMBRAL_INESTABLE veces o más en REAUDITORIA_VENTANA_INESTABLE se audita en cada ejecución.
+REAUDITORIA_RACHA_DUPLICACION = 3
+REAUDITORIA_FACTOR_MAXIMO = 8
+REAUDITORIA_UMBRAL_INESTABLE = 2
+REAUDITORIA_VENTANA_INESTABLE = 7 * 24 * 3600
+
+# 🗄️ Retención del historial de estados del almacén de canales (almacen.py): en cada sincronización
+# se borran los cambios más antiguos que esto, salvo el último de cada URL (su estado actual).
+RETENCION_HISTORIAL_ESTADOS = 90 * 24 * 3600
+
 # 🔢 Límite de Bloques (Canales) por Categoría y Servidor (REQUERIDO)
 # 🚨 MODIFICADO: Límite muy alto para que no haya exclusión por categoría.
 LIMITE_BLOQUES_CATEGORIA = 70 
 LIMITE_BLOQUES_SERVIDOR_GLOBAL = 1200 
+
+# 📌 Asignación estable: cada canal se queda en su servidor anterior si los límites lo permiten
+# (solo se reescriben los servidores que cambian). False = re-empaquetar todo desde el Servidor 01.
+ASIGNACION_ESTABLE = True
+
+# ⚡ Sondeos HEAD simultáneos (en vuelo) de la Auditoría Rápida (Fase 1). Con el control adaptativo
+# es la concurrencia inicial. En main.py se puede cambiar por ejecución con --workers.
+MAX_SONDEOS_AUDITORIA_RAPIDA = 200
+
+# 🎬 Procesos Streamlink simultáneos como máximo en la Auditoría Lenta (cada uno es un intérprete
+# con los plugins cargados). Los hilos adaptativos (AIMD) regulan la concurrencia por debajo de este tope.
+MAX_PROCESOS_STREAMLINK = max(4, os.cpu_count() or 4)
                                      
 # ... (El resto de config.py se mantiene)
                                      
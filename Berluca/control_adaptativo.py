@@ -0,0 +1,153 @@
+# control_adaptativo.py
+import math
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# --- CONFIGURACIÓN DEL CONTROL ADAPTATIVO ---
+FACTOR_REDUCCION = 0.7          # Decremento multiplicativo de la concurrencia ante congestión
+UMBRAL_CONGESTION = 0.25        # Fracción de timeouts en una ventana que se considera congestión
+MIN_VENTANA = 10                # Resultados mínimos por ventana de evaluación
+FACTOR_MAXIMO_CONCURRENCIA = 2  # La concurrencia puede crecer hasta este múltiplo del valor configurado
+MUESTRAS_LATENCIA_HOST = 50     # Latencias recientes que se conservan por host
+MIN_MUESTRAS_PERCENTIL = 5      # Muestras necesarias para fiarse del percentil de un host
+PERCENTIL_TIMEOUT = 0.95
+MULTIPLICADOR_TIMEOUT = 3.0     # timeout = 3 × p95 de la latencia observada (acotado a [mínimo, máximo])
+
+# =========================================================================================
+# 📈 CONCURRENCIA AIMD
+# =========================================================================================
+
+class ControlAIMD:
+    """
+    Límite de concurrencia AIMD evaluado por ventanas (una ventana = tantos resultados como
+    el límite actual, como un RTT en TCP):
+      - arranque lento: mientras no haya congestión, el límite se duplica en cada ventana,
+      - después, +1 por ventana sin congestión,
+      - si la fracción de timeouts de la ventana supera UMBRAL_CONGESTION, límite × FACTOR_REDUCCION.
+    Los errores rápidos (conexión rechazada, 404...) no cuentan como congestión: son canales
+    muertos, no una red saturada.
+    """
+
+    def __init__(self, inicial: int, minimo: int = 1, maximo: Optional[int] = None):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo if maximo is not None else inicial)
+        self._limite = float(min(self.maximo, max(self.minimo, inicial)))
+        self._arranque_lento = True
+        self._ventana_total = 0
+        self._ventana_congestion = 0
+        self.reducciones = 0
+        self.maximo_alcanzado = self.limite
+        self._lock = threading.Lock()
+
+    @property
+    def limite(self) -> int:
+        return int(self._limite)
+
+    def registrar(self, congestion: bool):
+        """Anota un resultado terminado (congestion=True si fue un timeout)."""
+        with self._lock:
+            self._ventana_total += 1
+            if congestion:
+                self._ventana_congestion += 1
+            if self._ventana_total < max(MIN_VENTANA, self.limite):
+                return
+
+            if self._ventana_congestion / self._ventana_total > UMBRAL_CONGESTION:
+                self._limite = max(self.minimo, self._limite * FACTOR_REDUCCION)
+                self._arranque_lento = False
+                self.reducciones += 1
+            elif self._arranque_lento:
+                self._limite = min(self.maximo, self._limite * 2)
+            else:
+                self._limite = min(self.maximo, self._limite + 1)
+            self.maximo_alcanzado = max(self.maximo_alcanzado, self.limite)
+            self._ventana_total = self._ventana_congestion = 0
+
+
+class CupoAdaptativo:
+    """Cupo de tareas simultáneas para hilos, con el límite de un ControlAIMD."""
+
+    def __init__(self, control: ControlAIMD):
+        self.control = control
+        self._en_vuelo = 0
+        self._condicion = threading.Condition()
+
+    def adquirir(self):
+        with self._condicion:
+            while self._en_vuelo >= self.control.limite:
+                self._condicion.wait()
+            self._en_vuelo += 1
+
+    def liberar(self, congestion: Optional[bool] = None):
+        """Libera el cupo; con `congestion` (True/False) registra además el resultado en el control."""
+        if congestion is not None:
+            self.control.registrar(congestion)
+        with self._condicion:
+            self._en_vuelo -= 1
+            self._condicion.notify_all()
+
+
+class CupoAdaptativoAsync:
+    """Versión asyncio de CupoAdaptativo (se crea dentro del bucle de eventos que la usa)."""
+
+    def __init__(self, control: ControlAIMD):
+        self.control = control
+        self._en_vuelo = 0
+        self._condicion = asyncio.Condition()
+
+    async def adquirir(self):
+        async with self._condicion:
+            await self._condicion.wait_for(lambda: self._en_vuelo < self.control.limite)
+            self._en_vuelo += 1
+
+    async def liberar(self, congestion: Optional[bool] = None):
+        if congestion is not None:
+            self.control.registrar(congestion)
+        async with self._condicion:
+            self._en_vuelo -= 1
+            self._condicion.notify_all()
+
+# =========================================================================================
+# ⏱️ TIMEOUTS POR HOST A PARTIR DE LA LATENCIA OBSERVADA
+# =========================================================================================
+
+def percentil(valores_ordenados, fraccion: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada (no vacía)."""
+    indice = max(0, math.ceil(fraccion * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+class TimeoutsPorHost:
+    """
+    Timeout de cada host = MULTIPLICADOR_TIMEOUT × p95 de sus latencias recientes, acotado a
+    [timeout_minimo, timeout_maximo]. Con pocas muestras del host se usa el percentil global
+    de la ejecución (salvo usar_global=False), y sin muestras el máximo (el timeout fijo de siempre).
+    """
+
+    def __init__(self, timeout_maximo: float, timeout_minimo: float, usar_global: bool = True):
+        self.timeout_maximo = timeout_maximo
+        self.timeout_minimo = min(timeout_minimo, timeout_maximo)
+        self.usar_global = usar_global
+        self._por_host: Dict[str, Deque[float]] = {}
+        self._global: Deque[float] = deque(maxlen=MUESTRAS_LATENCIA_HOST * 20)
+        self._lock = threading.Lock()
+
+    def registrar_latencia(self, host: str, segundos: float):
+        with self._lock:
+            muestras = self._por_host.get(host)
+            if muestras is None:
+                muestras = self._por_host[host] = deque(maxlen=MUESTRAS_LATENCIA_HOST)
+            muestras.append(segundos)
+            self._global.append(segundos)
+
+    def timeout(self, host: str) -> float:
+        with self._lock:
+            muestras = self._por_host.get(host)
+            if (muestras is None or len(muestras) < MIN_MUESTRAS_PERCENTIL) and self.usar_global:
+                muestras = self._global
+            if muestras is None or len(muestras) < MIN_MUESTRAS_PERCENTIL:
+                return self.timeout_maximo
+            p = percentil(sorted(muestras), PERCENTIL_TIMEOUT)
+        return min(self.timeout_maximo, max(self.timeout_minimo, p * MULTIPLICADOR_TIMEOUT))
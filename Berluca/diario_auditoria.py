@@ -0,0 +1,91 @@
+# diario_auditoria.py
+import os
+import json
+import time
+import logging
+from typing import Dict, Optional, Tuple
+
+# 📦 Importaciones de configuración
+try:
+    from config import CARPETA_CACHE
+except ImportError:
+    CARPETA_CACHE = os.path.join("Beluga", "cache")
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+VIGENCIA_DIARIO = 24 * 3600   # Resultados de una ejecución interrumpida más antiguos que esto se vuelven a sondear
+
+# =========================================================================================
+# 📒 DIARIO DE PROGRESO (JSONL, SOLO AÑADIR)
+# =========================================================================================
+# Una línea por resultado: {"url": "...", "estado": "abierto", "fecha": 1700000000.0}
+# El diario existe solo mientras la fase está en curso: al terminar bien se borra. Si la
+# ejecución muere (caída, kill, Ctrl-C), la siguiente lo lee y no repite esos sondeos.
+
+class DiarioAuditoria:
+    """
+    Diario de una fase de auditoría. Cada resultado se escribe y se vuelca al sistema operativo
+    en cuanto se conoce, así que sobrevive a que maten el proceso (una última línea cortada
+    se ignora al reanudar).
+    """
+
+    def __init__(self, fase: str, ruta: Optional[str] = None, vigencia: float = VIGENCIA_DIARIO):
+        self.fase = fase
+        self.ruta = ruta or os.path.join(CARPETA_CACHE, f"diario_{fase}.jsonl")
+        self.vigencia = vigencia
+        self.anotados = 0
+        self._archivo = None
+
+    def __enter__(self) -> "DiarioAuditoria":
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def reanudar(self) -> Dict[str, Tuple[str, float]]:
+        """
+        Lee el diario de una ejecución interrumpida y lo abre para seguir añadiendo.
+        Devuelve {url: (estado, fecha)} con los resultados aún vigentes (el último por URL).
+        """
+        previos: Dict[str, Tuple[str, float]] = {}
+        termina_en_linea = True
+        if os.path.exists(self.ruta):
+            limite = time.time() - self.vigencia
+            try:
+                with open(self.ruta, "r", encoding="utf-8", errors="ignore") as f:
+                    for linea in f:
+                        termina_en_linea = linea.endswith("\n")
+                        try:
+                            entrada = json.loads(linea)
+                            if entrada["fecha"] >= limite:
+                                previos[entrada["url"]] = (entrada["estado"], entrada["fecha"])
+                        except (ValueError, KeyError, TypeError):
+                            continue  # Línea cortada por una interrupción
+            except OSError as e:
+                logging.warning(f"⚠️ No se pudo leer el diario {self.ruta}: {e}")
+
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        self._archivo = open(self.ruta, "a", encoding="utf-8", buffering=1)
+        if not termina_en_linea:
+            self._archivo.write("\n")  # Que la siguiente entrada no se pegue a la línea cortada
+        return previos
+
+    def anotar(self, url: str, estado: str):
+        if self._archivo is None:
+            self.reanudar()
+        self._archivo.write(json.dumps({"url": url, "estado": estado, "fecha": time.time()}, ensure_ascii=False) + "\n")
+        self.anotados += 1
+
+    def cerrar(self):
+        """Cierra el diario conservándolo (la fase no terminó: la siguiente ejecución lo reanuda)."""
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def finalizar(self):
+        """La fase terminó y sus resultados ya están guardados: el diario deja de hacer falta."""
+        self.cerrar()
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
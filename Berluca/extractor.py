@@ -9,6 +9,8 @@ try:
 except ImportError:
     CARPETA_SALIDA = "Beluga"
 
+from cache_descargas import descargar_con_cache
+
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
 def recolectar_enlaces(url: str, nombre_temp: str = "TEMP_MATERIAL.m3u") -> Optional[str]:
@@ -21,14 +23,8 @@ def recolectar_enlaces(url: str, nombre_temp: str = "TEMP_MATERIAL.m3u") -> Opti
     print(f"🔗 Recolectando lista desde: {url}")
     
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status() 
-
-        # Decodificación y limpieza (Movian a veces requiere encoding específico)
-        contenido = response.text
-        
-        with open(ruta_temp, "w", encoding="utf-8", errors="ignore") as f:
-            f.write(contenido)
+        # Descarga condicional: si la lista no cambió (304) se reutiliza la copia cacheada.
+        descargar_con_cache(url, ruta_temp, timeout=30)
         
         logging.info(f"✅ Lista guardada temporalmente en: {ruta_temp}")
         return ruta_temp
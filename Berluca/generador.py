@@ -6,6 +6,8 @@ import re
 from collections import Counter, defaultdict
 from typing import List, Tuple, Dict
 
+from buscador_claves import BuscadorClaves
+
 # 📦 Importaciones de configuración y funciones de parseo
 try:
     from config import (
@@ -72,23 +74,30 @@ def limpiar_archivos_temporales(ruta_archivos: str):
             print(f"⚠️ No se pudo eliminar {os.path.basename(ruta_roll_over)}: {e}")
 
 
+_buscador_roll_over_compilado = None
+
+
+def _buscador_roll_over() -> BuscadorClaves:
+    """Buscador de CLAVES_ROLL_OVER, compilado en el primer uso."""
+    global _buscador_roll_over_compilado
+    if _buscador_roll_over_compilado is None:
+        _buscador_roll_over_compilado = BuscadorClaves([CLAVES_ROLL_OVER])
+    return _buscador_roll_over_compilado
+
+
 def reclasificar_roll_over(bloques: List[List[str]]) -> List[Tuple[str, List[str]]]:
     """
     Toma bloques y los clasifica en categorías específicas para el roll-over,
     usando CLAVES_ROLL_OVER.
     """
     bloques_clasificados = []
+    buscador = _buscador_roll_over()
     
     for bloque in bloques:
         nombre = extraer_nombre_canal(bloque)
         nombre_lower = nombre.lower().replace("ñ", "n").replace(".", "")
         
-        categoria_asignada = None
-        
-        for categoria, claves in CLAVES_ROLL_OVER.items():
-            if any(clave in nombre_lower for clave in claves):
-                categoria_asignada = categoria 
-                break
+        categoria_asignada = buscador.primera_categoria(nombre_lower)
         
         if categoria_asignada:
             bloques_clasificados.append((categoria_asignada, bloque))
@@ -9,6 +9,7 @@ try:
         CARPETA_SALIDA, NOMBRE_BASE_SERVIDOR, MAX_SERVIDORES_BUSCAR, 
         URL_BASE_REPOSITORIO, LOGO_DEFAULT
     )
+    from manifiesto import servidores_publicados
 except ImportError as e:
     logging.error(f"Error al importar módulos en generar_maestro.py: {e}")
     exit(1)
@@ -40,16 +41,10 @@ def generar_maestro_m3u():
             
             servidores_encontrados = 0
 
-            for i in range(1, MAX_SERVIDORES_BUSCAR + 100): 
+            # Servidores según el manifiesto publicado por el balanceo (glob si falta o ya no coincide)
+            for i, ruta_local in sorted(servidores_publicados().items()): 
                 
-                nombre_servidor = f"{NOMBRE_BASE_SERVIDOR}_{i:02d}.m3u"
-                ruta_local = os.path.join(CARPETA_SALIDA, nombre_servidor)
-                
-                if not os.path.exists(ruta_local):
-                    if servidores_encontrados > 0 and i > MAX_SERVIDORES_BUSCAR:
-                        break
-                    continue 
-
+                nombre_servidor = os.path.basename(ruta_local)
                 
                 # 🛠️ Construcción de la URL de Referencia (Robust URL)
                 ruta_completa_github = f"{REPO_ROOT_FOLDER}/{CARPETA_LISTAS}/{nombre_servidor}"
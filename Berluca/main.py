@@ -4,18 +4,28 @@ import sys
 import requests
 import logging
 import re # Necesario para procesar URLs de GitHub
+import time
+import json
+import argparse
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
 # 🌟 CORRECCIÓN CRÍTICA: Añadir 'Tuple' a la importación de typing
-from typing import List, Dict, Set, Any, Tuple 
+from typing import List, Dict, Set, Any, Tuple, Optional
 
 # 📦 Importaciones de módulos locales
 try:
-    from config import CARPETA_SALIDA, MAX_SERVIDORES_BUSCAR
+    from config import CARPETA_SALIDA, MAX_SERVIDORES_BUSCAR, CARPETA_CACHE, MAX_SONDEOS_AUDITORIA_RAPIDA
     from auxiliar import (
         descargar_lista, limpiar_archivos_temporales
     )
     from clasificador import clasificar_enlaces 
-    from servidor import auditar_y_balancear_servidores, compilar_inventario_existente
+    from servidor import auditar_y_balancear_servidores, balancear_y_publicar, compilar_inventario_existente
     from auditor_conectividad import auditar_conectividad 
+    from almacen import guardar_resumen
+    from cache_descargas import CacheDescargas
+    from presupuesto import PresupuestoTiempo, parsear_duracion
+    from diario_auditoria import DiarioAuditoria
 
 except ImportError as e:
     print(f"ERROR: No se pudo importar un módulo necesario. Asegúrate de tener todos los archivos (.py) en la misma carpeta.")
@@ -24,10 +34,31 @@ except ImportError as e:
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# --- CONFIGURACIÓN DE DESCARGAS ---
+MAX_DESCARGAS_PARALELAS = 8
+TIMEOUT_DESCARGA = 30
+
+# --- CONFIGURACIÓN DE LA TUBERÍA ---
+# En memoria: las Fases 1, 2 y 3 se pasan los objetos Canal y el resumen se escribe una vez al final.
+# Desactivado: cada fase lee y actualiza el almacén de canales y la Fase 3 renderiza el resumen (por fases).
+PIPELINE_EN_MEMORIA = True
+RUTA_RESUMEN_AUDITORIA = os.path.join(CARPETA_SALIDA, "RP_Resumen_Auditoria.m3u")
+
+# --- CONFIGURACIÓN DE DESCUBRIMIENTO EN GITHUB ---
+GITHUB_API_BASE = "https://api.github.com"
+GITHUB_RAW_BASE = "https://raw.githubusercontent.com"
+RUTA_CACHE_ARBOLES = os.path.join(CARPETA_CACHE, "github_arboles.json")
+EXTENSIONES_LISTAS = ('.m3u', '.m3u8')  # Mismo filtro en el recorrido clásico y en el modo árbol
+
 # =========================================================================================
 # ⚙️ GESTIÓN DE ENTRADA (Múltiples URLs - GitHub Scraper)
 # =========================================================================================
 
+def _es_lista_m3u(ruta: str) -> bool:
+    """Filtro común de ambos modos de descubrimiento: archivos .m3u y .m3u8 (sin distinguir mayúsculas)."""
+    return ruta.lower().endswith(EXTENSIONES_LISTAS)
+
+
 def _url_to_api(repo_url: str) -> Tuple[str, str, str, str]:
     """Convierte una URL de repositorio de GitHub a su URL de API de Contenido."""
     
@@ -46,18 +77,19 @@ def _url_to_api(repo_url: str) -> Tuple[str, str, str, str]:
     raise ValueError("URL de GitHub inválida o no soporta el formato de contenido.")
 
 
-def _get_api_content_url(owner: str, repo: str, branch: str, path: str) -> str:
+def _get_api_content_url(owner: str, repo: str, branch: str, path: str, api_base: str = GITHUB_API_BASE) -> str:
     """Construye la URL de la API de Contenido."""
-    return f"https://api.github.com/repos/{owner}/{repo}/contents/{path}?ref={branch}"
+    return f"{api_base}/repos/{owner}/{repo}/contents/{path}?ref={branch}"
 
 
-def extraer_urls_m3u_de_github(owner: str, repo: str, branch: str, path: str, urls_encontradas: Set[str]) -> None:
+def extraer_urls_m3u_de_github(owner: str, repo: str, branch: str, path: str, urls_encontradas: Set[str],
+                               token: Optional[str] = None, api_base: str = GITHUB_API_BASE) -> None:
     """Función recursiva para extraer URLs M3U de la API de Contenido de GitHub."""
     
-    api_url = _get_api_content_url(owner, repo, branch, path)
+    api_url = _get_api_content_url(owner, repo, branch, path, api_base)
     
     # Se recomienda usar un User-Agent en peticiones a la API de GitHub
-    headers = {'User-Agent': 'Beluga M3U Scraper (v1.0)'}
+    headers = _cabeceras_github(token)
     
     try:
         response = requests.get(api_url, headers=headers, timeout=20)
@@ -67,7 +99,7 @@ def extraer_urls_m3u_de_github(owner: str, repo: str, branch: str, path: str, ur
         
         if isinstance(contenido, list):
             for item in contenido:
-                if item['type'] == 'file' and item['name'].lower().endswith('.m3u'):
+                if item['type'] == 'file' and _es_lista_m3u(item['name']):
                     # La API proporciona 'download_url', que es la URL RAW.
                     if item.get('download_url'):
                         urls_encontradas.add(item['download_url'])
@@ -76,7 +108,8 @@ def extraer_urls_m3u_de_github(owner: str, repo: str, branch: str, path: str, ur
                     # Llamada recursiva al subdirectorio
                     # path_recursivo es el camino relativo que se envía al API
                     path_recursivo = item['path'] 
-                    extraer_urls_m3u_de_github(owner, repo, branch, path_recursivo, urls_encontradas)
+                    extraer_urls_m3u_de_github(owner, repo, branch, path_recursivo, urls_encontradas,
+                                               token=token, api_base=api_base)
                     
     except requests.exceptions.RequestException as e:
         logging.error(f"❌ Error al acceder a la API de GitHub ({api_url.split('?')[0]}...): {e}")
@@ -84,16 +117,124 @@ def extraer_urls_m3u_de_github(owner: str, repo: str, branch: str, path: str, ur
          logging.error(f"❌ Error inesperado al procesar contenido de GitHub: {e}")
 
 
-def recolectar_urls_desde_repositorio(repo_url: str) -> List[str]:
-    """Función principal que inicia la extracción de URLs de GitHub."""
+def _cabeceras_github(token: Optional[str] = None) -> Dict[str, str]:
+    """Cabeceras para la API de GitHub (con token opcional para superar el límite de 60 peticiones/hora)."""
+    headers = {'User-Agent': 'Beluga M3U Scraper (v1.0)'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    return headers
+
+
+def _cargar_cache_arboles() -> Dict[str, Any]:
+    if not os.path.exists(RUTA_CACHE_ARBOLES):
+        return {}
+    try:
+        with open(RUTA_CACHE_ARBOLES, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_cache_arboles(cache: Dict[str, Any]):
+    ruta_tmp = RUTA_CACHE_ARBOLES + ".tmp"
+    try:
+        with open(ruta_tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(ruta_tmp, RUTA_CACHE_ARBOLES)
+    except OSError as e:
+        logging.warning(f"⚠️ No se pudo guardar la caché de árboles de GitHub: {e}")
+
+
+def extraer_urls_m3u_de_github_arbol(owner: str, repo: str, branch: str, path: str,
+                                     token: Optional[str] = None,
+                                     api_base: str = GITHUB_API_BASE,
+                                     raw_base: str = GITHUB_RAW_BASE) -> Optional[List[str]]:
+    """
+    Lista la rama completa con UNA petición recursiva a la API git/trees y filtra localmente
+    los .m3u/.m3u8 bajo `path`. El árbol se cachea por SHA de commit: si la rama no cambió,
+    el redescubrimiento cuesta una sola petición (la resolución del SHA).
+    Retorna None si no se pudo usar este modo (p. ej. árbol truncado), para recurrir al recorrido clásico.
+    """
+    headers = _cabeceras_github(token)
+    clave_repo = f"{owner}/{repo}@{branch}"
+
+    try:
+        # 1. Resolver el SHA actual de la rama (respuesta mínima: solo el SHA en texto plano)
+        response = requests.get(
+            f"{api_base}/repos/{owner}/{repo}/commits/{branch}",
+            headers={**headers, 'Accept': 'application/vnd.github.sha'}, timeout=20
+        )
+        response.raise_for_status()
+        sha = response.text.strip()
+
+        cache = _cargar_cache_arboles()
+        entrada = cache.get(clave_repo)
+
+        if entrada and entrada.get("sha") == sha:
+            rutas_listas = entrada["rutas"]
+            logging.info(f"♻️ Árbol de {clave_repo} sin cambios (SHA {sha[:7]}), se usa la caché.")
+        else:
+            # 2. Una sola petición para todo el árbol de la rama
+            response = requests.get(
+                f"{api_base}/repos/{owner}/{repo}/git/trees/{sha}?recursive=1",
+                headers=headers, timeout=30
+            )
+            response.raise_for_status()
+            arbol = response.json()
+
+            if arbol.get("truncated"):
+                logging.warning(f"⚠️ El árbol de {clave_repo} está truncado por la API. Se usará el recorrido por directorios.")
+                return None
+
+            rutas_listas = [
+                item['path'] for item in arbol.get("tree", [])
+                if item.get('type') == 'blob' and _es_lista_m3u(item['path'])
+            ]
+            cache[clave_repo] = {"sha": sha, "rutas": rutas_listas}
+            _guardar_cache_arboles(cache)
+
+    except requests.exceptions.RequestException as e:
+        logging.error(f"❌ Error al listar el árbol de GitHub ({clave_repo}): {e}")
+        return None
+    except (ValueError, KeyError) as e:
+        logging.error(f"❌ Respuesta inesperada de la API git/trees ({clave_repo}): {e}")
+        return None
+
+    # 3. Filtrar por subdirectorio localmente y construir las URLs RAW
+    prefijo = path.strip('/')
+    if prefijo:
+        prefijo += '/'
+    return [
+        f"{raw_base}/{owner}/{repo}/{branch}/{quote(ruta)}"
+        for ruta in rutas_listas if ruta.startswith(prefijo)
+    ]
+
+
+def recolectar_urls_desde_repositorio(repo_url: str, usar_arbol: bool = True,
+                                      token: Optional[str] = None,
+                                      api_base: str = GITHUB_API_BASE,
+                                      raw_base: str = GITHUB_RAW_BASE) -> List[str]:
+    """
+    Función principal que inicia la extracción de URLs de GitHub.
+    Por defecto usa el listado git/trees (una petición); si no es posible, recorre la API de Contenido.
+    El token se toma de la variable de entorno GITHUB_TOKEN si no se indica.
+    api_base/raw_base permiten apuntar a un servidor local de prueba (ver `benchmarks.py github`).
+    """
     print(f"\n--- 🌐 Analizando Repositorio GitHub: {repo_url} ---")
+    token = token or os.environ.get("GITHUB_TOKEN")
     try:
         owner, repo, branch, path = _url_to_api(repo_url)
-        urls_encontradas = set()
-        
-        extraer_urls_m3u_de_github(owner, repo, branch, path, urls_encontradas)
-        
-        urls_final = list(urls_encontradas)
+
+        urls_final = None
+        if usar_arbol:
+            urls_final = extraer_urls_m3u_de_github_arbol(owner, repo, branch, path, token=token,
+                                                          api_base=api_base, raw_base=raw_base)
+
+        if urls_final is None:
+            urls_encontradas = set()
+            extraer_urls_m3u_de_github(owner, repo, branch, path, urls_encontradas, token=token, api_base=api_base)
+            urls_final = list(urls_encontradas)
+
         print(f"✅ Se encontraron {len(urls_final)} enlaces M3U en el repositorio.")
         return urls_final
         
@@ -104,29 +245,78 @@ def recolectar_urls_desde_repositorio(repo_url: str) -> List[str]:
         print(f"❌ Error crítico al iniciar la recolección de GitHub: {e}")
         return []
 
+# =========================================================================================
+# ⬇️ DESCARGA PARALELA DE LISTAS
+# =========================================================================================
+
+def descargar_listas_paralelo(urls: List[str], max_paralelas: int = MAX_DESCARGAS_PARALELAS,
+                              timeout: float = TIMEOUT_DESCARGA) -> List[str]:
+    """
+    Descarga las URLs en TEMP_MATERIAL_XX.m3u con hasta `max_paralelas` descargas simultáneas.
+    Las descargas fallidas se omiten. Devuelve las rutas temporales en el orden de las URLs.
+    El índice de la caché de descargas se escribe una sola vez, al terminar, y olvida las
+    listas que ya no aparecen en `urls`.
+    """
+    inicio = time.time()
+    rutas_por_indice: Dict[int, str] = {}
+    fallidas = 0
+    cache = CacheDescargas()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_paralelas)) as executor:
+        futuros = {}
+        for i, url in enumerate(urls):
+            ruta_temp = os.path.join(CARPETA_SALIDA, f"TEMP_MATERIAL_{i+1:02d}.m3u")
+            futuros[executor.submit(descargar_lista, url, ruta_temp, timeout, cache)] = (i, url, ruta_temp)
+
+        with tqdm(total=len(urls), desc="Descargando listas", unit="listas") as pbar:
+            for futuro in as_completed(futuros):
+                i, url, ruta_temp = futuros[futuro]
+                try:
+                    exito = futuro.result()
+                except Exception as e:
+                    logging.debug(f"Error en hilo de descarga para {url}: {e}")
+                    exito = False
+
+                if exito:
+                    logging.info(f"✅ Lista {i+1} guardada temporalmente en: {ruta_temp}")
+                    rutas_por_indice[i] = ruta_temp
+                else:
+                    logging.error(f"❌ Falló la descarga de la lista {i+1} ({url}). Omitiendo.")
+                    fallidas += 1
+                pbar.update(1)
+
+    cache.guardar()
+    print(f"📥 Descargas finalizadas en {time.time() - inicio:.1f}s: "
+          f"{len(rutas_por_indice)} correctas, {fallidas} fallidas de {len(urls)}.")
+    return [rutas_por_indice[i] for i in sorted(rutas_por_indice)]
+
 # =========================================================================================
 # ⚙️ FLUJO DE CONTROL PRINCIPAL
 # =========================================================================================
 
-def ejecutar_proceso_completo(urls: List[str]):
-    """Ejecuta el flujo completo para una lista de URLs."""
+def ejecutar_proceso_completo(urls: List[str], en_memoria: bool = PIPELINE_EN_MEMORIA,
+                              presupuesto: Optional[PresupuestoTiempo] = None,
+                              max_workers: int = MAX_SONDEOS_AUDITORIA_RAPIDA):
+    """
+    Ejecuta el flujo completo para una lista de URLs.
+    En memoria, los canales pasan de fase a fase sin serializarse y el Resumen de Auditoría
+    se escribe una sola vez al final (mismo archivo que en la ejecución por fases).
+    Con `presupuesto` (--time-budget), las Fases 1 y 2 sondean por valor hasta sus plazos y al
+    final se escribe el informe de los canales aplazados (conservan su estado anterior).
+    `max_workers` son los sondeos HEAD simultáneos de la Auditoría Rápida (--workers).
+    """
     rutas_temp = [] 
     print("\n--- 🚀 Iniciando Flujo de Beluga (FASE 1, 2 y 3) ---")
 
     # 0. COMPILAR INVENTARIO EXISTENTE (FASE 0)
-    inventario_existente = compilar_inventario_existente(MAX_SERVIDORES_BUSCAR)
+    asignacion: Dict[str, int] = {}
+    inventario_existente = compilar_inventario_existente(MAX_SERVIDORES_BUSCAR, asignacion)
+    if presupuesto is not None:
+        presupuesto.asignacion = asignacion  # Ya leída: el presupuesto no vuelve a leer los servidores
     
-    # 1. Obtener todas las listas nuevas (Temporales)
-    for i, url in enumerate(urls):
-        ruta_temp = os.path.join(CARPETA_SALIDA, f"TEMP_MATERIAL_{i+1:02d}.m3u")
-        print(f"\n🔗 Recolectando lista {i+1} de {len(urls)} desde: {url}")
-        
-        # Se asume que auxiliar.descargar_lista existe y es funcional
-        if descargar_lista(url, ruta_temp):
-            logging.info(f"✅ Lista {i+1} guardada temporalmente en: {ruta_temp}")
-            rutas_temp.append(ruta_temp)
-        else:
-            logging.error(f"❌ Falló la descarga de la lista {i+1}. Omitiendo.")
+    # 1. Obtener todas las listas nuevas (Temporales, descarga paralela)
+    print(f"\n🔗 Recolectando {len(urls)} listas ({MAX_DESCARGAS_PARALELAS} descargas simultáneas)...")
+    rutas_temp = descargar_listas_paralelo(urls)
 
     if not rutas_temp:
         print("ERROR: No se pudo descargar ninguna lista válida. Saliendo.")
@@ -135,35 +325,75 @@ def ejecutar_proceso_completo(urls: List[str]):
     try:
         # 2. CLASIFICACIÓN, FUSIÓN Y CONSOLIDACIÓN (FASE 1 - Quick Audit)
         print("\n--- 🧠 Clasificando, Fusionando y Consolidando Inventario (FASE 1 - Rápida) ---")
-        clasificar_enlaces(rutas_temp, inventario_existente) 
-        print("✅ Consolidación y Quick Audit finalizada. Archivo de resumen listo para Auditoría Lenta.")
+        canales = clasificar_enlaces(rutas_temp, inventario_existente, max_workers=max_workers,
+                                     usar_almacen=not en_memoria, presupuesto=presupuesto)
+        print("✅ Consolidación y Quick Audit finalizada.")
 
         # 3. AUDITORÍA LENTA (FASE 2 - Streamlink)
         print("\n--- 🐌 Iniciando Auditoría Lenta (FASE 2 - Streamlink) ---")
-        auditar_conectividad()
-        print("✅ Auditoría Lenta completada. Archivo de resumen finalizado.")
+        auditar_conectividad(canales=canales if en_memoria else None, presupuesto=presupuesto)
+        print("✅ Auditoría Lenta completada.")
         
         # 4. BALANCEO ESTRATÉGICO Y EXCLUSIÓN (FASE 3)
         print("\n--- ⚖️ Iniciando Balanceo Estratégico (FASE 3) ---")
-        auditar_y_balancear_servidores(MAX_SERVIDORES_BUSCAR)
+        if en_memoria:
+            balancear_y_publicar(canales, asignacion_previa=asignacion)
+
+            # 5. Resumen de Auditoría (compatibilidad): una única escritura con los estados finales
+            total = guardar_resumen(canales, RUTA_RESUMEN_AUDITORIA)
+            print(f"💾 Resumen de Auditoría escrito con {total} canales: {RUTA_RESUMEN_AUDITORIA}")
+            # Los resultados de las Fases 1 y 2 ya están guardados: sus diarios dejan de hacer falta
+            for fase in ("fase1", "fase2"):
+                DiarioAuditoria(fase).finalizar()
+        else:
+            auditar_y_balancear_servidores(MAX_SERVIDORES_BUSCAR)
             
     except Exception as e:
         print(f"\nERROR CRÍTICO durante el proceso: {e}")
     finally:
         for ruta in rutas_temp:
             limpiar_archivos_temporales(ruta) 
+        if presupuesto is not None:
+            ruta_informe = presupuesto.escribir_informe()
+            print(f"⏳ Presupuesto de tiempo: {presupuesto.segundos:.0f}s, restante {presupuesto.restante():.0f}s."
+                  + (f" Canales aplazados en: {ruta_informe}" if ruta_informe else " Ningún canal aplazado."))
         print("\n--- ✅ Proceso Completo Finalizado ---")
         
 # =========================================================================================
 # 🚀 PUNTO DE ENTRADA
 # =========================================================================================
 
+def _duracion(texto: str) -> float:
+    try:
+        return parsear_duracion(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"duración no válida: {texto!r} (p. ej. 3600, 45m, 2h)")
+
+
+def _entero_positivo(texto: str) -> int:
+    if not texto.isdigit() or int(texto) < 1:
+        raise argparse.ArgumentTypeError(f"se esperaba un entero positivo: {texto!r}")
+    return int(texto)
+
+
 if __name__ == "__main__":
     
+    parser = argparse.ArgumentParser(description="Flujo completo de Beluga (Fases 1, 2 y 3)")
+    parser.add_argument("repo_url", nargs="?", help="URL del repositorio/directorio de GitHub (si no, se pregunta)")
+    parser.add_argument("--time-budget", type=_duracion, default=None, metavar="DURACION",
+                        help="Tiempo máximo de la ejecución (segundos, o con sufijo m/h). Se sondea "
+                             "primero lo más valioso y lo que no llegue a sondearse conserva su estado.")
+    parser.add_argument("--workers", type=_entero_positivo, default=MAX_SONDEOS_AUDITORIA_RAPIDA, metavar="N",
+                        help="Sondeos HEAD simultáneos de la Auditoría Rápida "
+                             f"(por defecto {MAX_SONDEOS_AUDITORIA_RAPIDA}, MAX_SONDEOS_AUDITORIA_RAPIDA en config.py).")
+    args = parser.parse_args()
+    # El presupuesto cuenta desde el arranque (incluye el descubrimiento y las descargas)
+    presupuesto = PresupuestoTiempo(args.time_budget) if args.time_budget else None
+
     print("--- 🚀 Iniciando Flujo de Beluga (FASE 1, 2 y 3) ---")
     
     # 1. Solicitar URL del Repositorio/Directorio
-    repo_url = input("🔗 Ingresa la URL COMPLETA del repositorio/directorio de GitHub para analizar: ").strip()
+    repo_url = (args.repo_url or input("🔗 Ingresa la URL COMPLETA del repositorio/directorio de GitHub para analizar: ")).strip()
 
     if not repo_url:
         print("ERROR: URL no ingresada. Saliendo.")
@@ -177,4 +407,9 @@ if __name__ == "__main__":
         sys.exit(0)
     
     # 3. Ejecutar el proceso completo
-    ejecutar_proceso_completo(urls_fuente)
\ No newline at end of file
+    try:
+        ejecutar_proceso_completo(urls_fuente, presupuesto=presupuesto, max_workers=args.workers)
+    except KeyboardInterrupt:
+        # Los resultados ya sondeados están en los diarios de auditoría: la próxima ejecución los reanuda
+        print("\n⛔ Ejecución interrumpida por el usuario. Vuelve a ejecutar para continuar donde se quedó.")
+        sys.exit(130)
\ No newline at end of file
@@ -0,0 +1,143 @@
+# manifiesto.py
+import os
+import re
+import glob
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+# 📦 Importaciones de configuración
+try:
+    from config import CARPETA_SALIDA, NOMBRE_BASE_SERVIDOR
+except ImportError:
+    CARPETA_SALIDA = "Beluga"
+    NOMBRE_BASE_SERVIDOR = "RP_Servidor"
+
+from publicador import hash_archivo
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+NOMBRE_MANIFIESTO = "RP_Manifiesto.json"
+RUTA_MANIFIESTO = os.path.join(CARPETA_SALIDA, NOMBRE_MANIFIESTO)
+VERSION_MANIFIESTO = 2
+VERSIONES_LEGIBLES = (1, 2)   # La versión 1 no lleva 'bytes': se valida solo con el sha256
+
+# =========================================================================================
+# 🧾 MANIFIESTO DE SERVIDORES PUBLICADOS
+# =========================================================================================
+
+def entrada_servidor(numero: int, archivo: str, contenido: str, inventario: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """
+    Entrada del manifiesto para un servidor: canales, canales por categoría, tamaño en bytes y
+    sha256 del contenido publicado y huella del conjunto de URLs (independiente del orden).
+    El tamaño descarta sin leer el archivo los servidores que ya no son los publicados; el
+    sha256 detecta una edición que conserva el tamaño.
+    """
+    datos = contenido.encode("utf-8", errors="ignore")
+    urls = sorted(canal.url for canales in inventario.values() for canal in canales)
+    return {
+        "archivo": archivo,
+        "numero": numero,
+        "canales": len(urls),
+        "categorias": {categoria: len(canales) for categoria, canales in sorted(inventario.items()) if canales},
+        "bytes": len(datos),
+        "sha256": hashlib.sha256(datos).hexdigest(),
+        "huella_urls": hashlib.sha256("\n".join(urls).encode("utf-8")).hexdigest(),
+    }
+
+
+def serializar_manifiesto(entradas: List[Dict[str, Any]]) -> str:
+    """Manifiesto en JSON. No lleva fecha: si los servidores no cambian, el manifiesto tampoco."""
+    manifiesto = {
+        "version": VERSION_MANIFIESTO,
+        "total_servidores": len(entradas),
+        "total_canales": sum(e["canales"] for e in entradas),
+        "servidores": sorted(entradas, key=lambda e: e["numero"]),
+    }
+    return json.dumps(manifiesto, ensure_ascii=False, indent=1) + "\n"
+
+
+def leer_manifiesto(ruta: str = RUTA_MANIFIESTO) -> Optional[Dict[str, Any]]:
+    """Devuelve el manifiesto publicado, o None si no existe, es ilegible o es de otra versión."""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"⚠️ Manifiesto ilegible ({ruta}): {e}")
+        return None
+    if manifiesto.get("version") not in VERSIONES_LEGIBLES:
+        logging.warning(f"⚠️ Manifiesto de versión {manifiesto.get('version')} no soportada: se ignora.")
+        return None
+    return manifiesto
+
+
+def actualizar_entrada(entrada: Dict[str, Any], ruta: str = RUTA_MANIFIESTO):
+    """
+    Reemplaza en el manifiesto publicado la entrada de un servidor reescrito fuera del balanceo
+    (flujo clásico de actualizar_servidores). Sin manifiesto no hace nada: se usará el glob.
+    """
+    manifiesto = leer_manifiesto(ruta)
+    if manifiesto is None:
+        return
+    entradas = [e for e in manifiesto.get("servidores", []) if e.get("numero") != entrada["numero"]]
+    entradas.append(entrada)
+    try:
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(serializar_manifiesto(entradas))
+    except OSError as e:
+        logging.warning(f"⚠️ No se pudo actualizar el manifiesto ({ruta}): {e}")
+
+# =========================================================================================
+# 📂 DESCUBRIMIENTO DE ARCHIVOS DE SERVIDOR
+# =========================================================================================
+
+def buscar_archivos_servidor() -> Dict[int, str]:
+    """Archivos RP_Servidor_XX.m3u presentes en la carpeta de salida (glob), por número de servidor."""
+    patron_numero = re.compile(rf"^{re.escape(NOMBRE_BASE_SERVIDOR)}_(\d+)\.m3u$")
+    archivos = {}
+    for ruta in glob.glob(os.path.join(CARPETA_SALIDA, f"{NOMBRE_BASE_SERVIDOR}_*.m3u")):
+        match = patron_numero.match(os.path.basename(ruta))
+        if match:
+            archivos[int(match.group(1))] = ruta
+    return archivos
+
+
+def _manifiesto_vigente(entradas: List[Dict[str, Any]], archivos: Dict[int, str]) -> bool:
+    """
+    True si el manifiesto describe exactamente los archivos de servidor presentes: mismo conjunto,
+    mismo tamaño (comprobación barata, sin leer) y, si el tamaño coincide, mismo sha256.
+    """
+    if {e.get("numero") for e in entradas} != set(archivos):
+        return False
+    for entrada in entradas:
+        ruta = archivos[entrada["numero"]]
+        if os.path.basename(ruta) != entrada.get("archivo"):
+            return False
+        try:
+            if "bytes" in entrada and os.path.getsize(ruta) != entrada["bytes"]:
+                return False
+            if hash_archivo(ruta) != entrada.get("sha256"):
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def servidores_publicados() -> Dict[int, str]:
+    """
+    Servidores publicados (número -> ruta) según el manifiesto, comprobado contra la carpeta de
+    salida (listado, tamaños y sha256). Sin manifiesto válido, o si ya no coincide con los
+    archivos presentes (se borró, añadió o editó un servidor a mano), se recurre al glob.
+    """
+    archivos = buscar_archivos_servidor()
+    manifiesto = leer_manifiesto()
+    if manifiesto is None:
+        return archivos
+    entradas = manifiesto.get("servidores", [])
+    if not _manifiesto_vigente(entradas, archivos):
+        logging.warning("⚠️ El manifiesto no coincide con los servidores de la carpeta de salida: se usa el glob.")
+        return archivos
+    return {entrada["numero"]: archivos[entrada["numero"]] for entrada in entradas}
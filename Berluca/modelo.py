@@ -0,0 +1,103 @@
+# modelo.py
+import sys
+from typing import List, Optional, Sequence
+
+# 📦 Importaciones de configuración y auxiliares
+try:
+    from config import PRIORIDAD_ESTADO
+    from auxiliar import parsear_campos
+except ImportError:
+    PRIORIDAD_ESTADO = {"abierto": 3, "dudoso": 2, "fallido": 1, "desconocido": 0}
+    parsear_campos = None
+
+# =========================================================================================
+# 🔢 CÓDIGOS DE ESTADO
+# =========================================================================================
+
+# El código de cada estado es su prioridad (PRIORIDAD_ESTADO): 0 desconocido ... 3 abierto.
+# Así ordenar por prioridad es ordenar por código, sin diccionarios intermedios.
+ESTADOS = tuple(sorted(PRIORIDAD_ESTADO, key=PRIORIDAD_ESTADO.get))
+_CODIGO_POR_ESTADO = {estado: PRIORIDAD_ESTADO[estado] for estado in ESTADOS}
+_ESTADO_POR_CODIGO = {codigo: estado for estado, codigo in _CODIGO_POR_ESTADO.items()}
+
+
+def codigo_estado(estado: str) -> int:
+    """Código numérico del estado. Un estado no reconocido equivale a 'desconocido' (0)."""
+    return _CODIGO_POR_ESTADO.get(estado, 0)
+
+
+def _internar_bloque(bloque: Sequence[str], url: str) -> List[str]:
+    """
+    Copia el bloque internando solo la línea #ESTADO: (cuatro valores posibles, repetidos en
+    todos los canales). Las #EXTINF son casi todas distintas (en el resumen, 6.389 únicas de
+    6.542) y internarlas no ahorra nada. La línea de la URL reutiliza el objeto de Canal.url.
+    """
+    return [url if linea == url else sys.intern(linea) if linea.startswith("#ESTADO:") else linea
+            for linea in bloque]
+
+# =========================================================================================
+# 📺 CANAL
+# =========================================================================================
+
+class Canal:
+    """
+    Canal de la tubería (clasificador, auditor, servidor y actualizar_servidores).
+    Usa __slots__ (sin __dict__ por instancia), categoría y línea #ESTADO: internadas y el
+    estado como código entero (su prioridad).
+    """
+    __slots__ = ("bloque", "url", "nombre_limpio", "categoria", "codigo_estado")
+
+    def __init__(self, bloque: Sequence[str], url: str, nombre_limpio: str = "",
+                 categoria: str = "roll_over", estado: str = "desconocido"):
+        self.bloque = _internar_bloque(bloque, url)
+        self.url = url
+        self.nombre_limpio = nombre_limpio
+        self.categoria = sys.intern(categoria)
+        self.codigo_estado = codigo_estado(estado)
+
+    @classmethod
+    def desde_bloque(cls, bloque: List[str]) -> Optional["Canal"]:
+        """Construye el canal a partir de un bloque M3U. Devuelve None si el bloque no tiene URL."""
+        url, nombre_limpio, categoria, estado = parsear_campos(bloque)
+        if not url:
+            return None
+        return cls(bloque, url, nombre_limpio, categoria, estado)
+
+    @property
+    def estado(self) -> str:
+        return _ESTADO_POR_CODIGO[self.codigo_estado]
+
+    @estado.setter
+    def estado(self, estado: str):
+        self.codigo_estado = codigo_estado(estado)
+
+    @property
+    def prioridad(self) -> int:
+        return self.codigo_estado
+
+    @property
+    def extinf(self) -> str:
+        """Primera línea #EXTINF del bloque ("" si no tiene)."""
+        return next((linea for linea in self.bloque if linea.startswith("#EXTINF")), "")
+
+    def cambiar_estado(self, nuevo_estado: str) -> bool:
+        """
+        Actualiza el estado y la línea #ESTADO: del bloque (la añade antes de la URL si no
+        existía). Devuelve True si el estado cambió.
+        """
+        if codigo_estado(nuevo_estado) == self.codigo_estado:
+            return False
+        self.estado = nuevo_estado
+        linea_estado = sys.intern(f"#ESTADO:{self.estado}")
+
+        for idx, linea in enumerate(self.bloque):
+            if linea.startswith("#ESTADO:"):
+                self.bloque[idx] = linea_estado
+                break
+        else:
+            # La URL siempre es la última línea
+            self.bloque.insert(len(self.bloque) - 1, linea_estado)
+        return True
+
+    def __repr__(self) -> str:
+        return f"Canal({self.url!r}, categoria={self.categoria!r}, estado={self.estado!r})"
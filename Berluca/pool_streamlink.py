@@ -0,0 +1,236 @@
+# pool_streamlink.py
+import os
+import sys
+import json
+import queue
+import logging
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# --- CONFIGURACIÓN DEL POOL ---
+TIMEOUT_RESOLUCION = 25               # Segundos por URL (igual que la prueba con el CLI)
+TIMEOUT_ARRANQUE = 30                 # Segundos para importar Streamlink y cargar sus plugins
+FALLOS_ARRANQUE_MAXIMOS = 3           # Arranques fallidos seguidos (lentos o caídos) que desactivan el pool
+MAX_PETICIONES_POR_TRABAJADOR = 500   # Se recicla el proceso para acotar fugas de memoria de los plugins
+
+# =========================================================================================
+# 🛠️ PROCESO TRABAJADOR (se ejecuta como script: python pool_streamlink.py <timeout_http>)
+# =========================================================================================
+# Protocolo por tuberías, un JSON por línea:
+#   arranque  -> {"listo": true}  |  {"error": "..."}
+#   petición  <- {"id": 7, "url": "http://..."}
+#   respuesta -> {"id": 7, "resultado": "ok" | "fallo"}
+
+def _bucle_trabajador(timeout_http: float):
+    """Carga Streamlink UNA vez y resuelve URLs leídas de stdin hasta que se cierre la tubería."""
+    try:
+        from streamlink import Streamlink
+        sesion = Streamlink()
+        sesion.set_option("http-timeout", timeout_http)
+    except Exception as e:
+        print(json.dumps({"error": f"{type(e).__name__}: {e}"}), flush=True)
+        return
+    print(json.dumps({"listo": True}), flush=True)
+
+    for linea in sys.stdin:
+        try:
+            peticion = json.loads(linea)
+        except ValueError:
+            continue
+        resultado = "fallo"
+        try:
+            streams = sesion.streams(peticion["url"])
+            # Mismo criterio que `streamlink --stream-url URL best`: existe 'best' y resuelve a http
+            if "best" in streams and "http" in streams["best"].to_url():
+                resultado = "ok"
+        except Exception:
+            pass
+        print(json.dumps({"id": peticion.get("id"), "resultado": resultado}), flush=True)
+
+# =========================================================================================
+# 🏊 POOL DE TRABAJADORES PERSISTENTES
+# =========================================================================================
+
+class _Trabajador:
+    """Un proceso trabajador y el hilo que lee sus respuestas (para poder esperar con timeout)."""
+
+    def __init__(self, comando: List[str]):
+        self.peticiones = 0
+        self.proceso = subprocess.Popen(
+            comando, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="replace", bufsize=1
+        )
+        self._respuestas: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._leer, daemon=True).start()
+
+    def _leer(self):
+        for linea in self.proceso.stdout:
+            self._respuestas.put(linea)
+        self._respuestas.put(None)  # EOF: el proceso terminó
+
+    def enviar(self, mensaje: Dict[str, Any]):
+        self.proceso.stdin.write(json.dumps(mensaje) + "\n")
+        self.proceso.stdin.flush()
+
+    def recibir(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Siguiente mensaje JSON. None si el proceso murió; queue.Empty si vence el timeout."""
+        while True:
+            linea = self._respuestas.get(timeout=timeout)
+            if linea is None:
+                return None
+            try:
+                return json.loads(linea)
+            except ValueError:
+                continue  # Salida ajena al protocolo (p. ej. un plugin que escribe en stdout)
+
+    def terminar(self, forzar: bool = True):
+        try:
+            if forzar:
+                self.proceso.kill()
+            else:
+                self.proceso.stdin.close()
+            self.proceso.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proceso.kill()
+
+
+class PoolStreamlink:
+    """
+    Pool de hasta `max_trabajadores` procesos que cargan Streamlink una sola vez y resuelven
+    muchas URLs por una tubería (sin pagar el arranque del intérprete ni de los plugins por URL).
+    Los procesos se crean bajo demanda. Si una petición vence su timeout o el proceso muere,
+    ese trabajador se descarta y el siguiente uso arranca uno nuevo.
+    resolver() devuelve 'ok', 'fallo' o 'timeout', o None si esta URL no se pudo resolver en
+    el pool (el llamador recurre entonces al CLI): el trabajador no arrancó a tiempo o murió
+    durante la petición. El pool solo se desactiva del todo si Streamlink no se puede importar
+    como librería o tras FALLOS_ARRANQUE_MAXIMOS arranques fallidos seguidos.
+    """
+
+    def __init__(self, max_trabajadores: int, timeout: float = TIMEOUT_RESOLUCION,
+                 comando: Optional[List[str]] = None):
+        self.max_trabajadores = max(1, max_trabajadores)
+        self.timeout = timeout
+        self.comando = comando or [sys.executable, os.path.abspath(__file__), str(timeout)]
+        self.disponible = True
+        self.reinicios = 0
+        self._fallos_arranque = 0
+        self._libres: "queue.LifoQueue[_Trabajador]" = queue.LifoQueue()
+        self._creados = 0
+        self._siguiente_id = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "PoolStreamlink":
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _arrancar(self) -> Optional[_Trabajador]:
+        trabajador = None
+        try:
+            trabajador = _Trabajador(self.comando)
+            saludo = trabajador.recibir(TIMEOUT_ARRANQUE)
+        except OSError as e:
+            saludo = {"error": f"{type(e).__name__}: {e}"}
+        except queue.Empty:
+            saludo = None  # Arranque lento (disco o CPU saturados): puede ser pasajero
+        if saludo and saludo.get("listo"):
+            with self._lock:
+                self._fallos_arranque = 0
+            return trabajador
+
+        if trabajador is not None:
+            trabajador.terminar()
+        with self._lock:
+            self._fallos_arranque += 1
+            # Un error de importación es definitivo; un arranque lento o caído solo tras varios seguidos
+            desactivar = (saludo is not None and "error" in saludo) or self._fallos_arranque >= FALLOS_ARRANQUE_MAXIMOS
+            if desactivar and self.disponible:
+                self.disponible = False
+                motivo = (saludo or {}).get("error", f"{self._fallos_arranque} arranques fallidos seguidos")
+                logging.warning(f"⚠️ No se pudo cargar Streamlink como librería ({motivo}). Se usará el CLI por URL.")
+        return None
+
+    def _obtener(self) -> Optional[_Trabajador]:
+        while self.disponible:
+            try:
+                return self._libres.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                crear = self._creados < self.max_trabajadores
+                if crear:
+                    self._creados += 1
+            if crear:
+                trabajador = self._arrancar()
+                if trabajador is None:
+                    with self._lock:
+                        self._creados -= 1
+                return trabajador
+            # Todos ocupados: esperar a que se libere uno (o a que se descarte y quede cupo)
+            try:
+                return self._libres.get(timeout=1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _descartar(self, trabajador: _Trabajador, forzar: bool = True, reinicio: bool = False):
+        trabajador.terminar(forzar)
+        with self._lock:
+            self._creados -= 1
+            if reinicio:
+                self.reinicios += 1
+
+    def resolver(self, url: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Resuelve una URL esperando como mucho `timeout` segundos (por defecto el del pool)."""
+        if not self.disponible:
+            return None
+        trabajador = self._obtener()
+        if trabajador is None:
+            return None
+
+        with self._lock:
+            self._siguiente_id += 1
+            id_peticion = self._siguiente_id
+
+        try:
+            trabajador.enviar({"id": id_peticion, "url": url})
+            while True:
+                respuesta = trabajador.recibir(timeout or self.timeout)
+                if respuesta is None or respuesta.get("id") == id_peticion:
+                    break
+        except queue.Empty:
+            # El proceso sigue ocupado con esta URL: se mata y el siguiente uso arranca otro
+            self._descartar(trabajador, reinicio=True)
+            return "timeout"
+        except OSError:
+            respuesta = None
+
+        if respuesta is None:
+            # El trabajador murió (p. ej. un plugin que tumba el intérprete): sin veredicto,
+            # el llamador prueba la URL con el CLI
+            self._descartar(trabajador, reinicio=True)
+            return None
+
+        trabajador.peticiones += 1
+        if trabajador.peticiones >= MAX_PETICIONES_POR_TRABAJADOR:
+            self._descartar(trabajador, forzar=False)
+        else:
+            self._libres.put(trabajador)
+        return "ok" if respuesta.get("resultado") == "ok" else "fallo"
+
+    def cerrar(self):
+        """Cierra las tuberías de los trabajadores libres (terminan solos) y espera a que salgan."""
+        while True:
+            try:
+                trabajador = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(trabajador, forzar=False)
+
+
+if __name__ == "__main__":
+    _bucle_trabajador(float(sys.argv[1]) if len(sys.argv) > 1 else TIMEOUT_RESOLUCION)
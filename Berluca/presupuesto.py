@@ -0,0 +1,145 @@
+# presupuesto.py
+import os
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 📦 Importaciones de configuración y auxiliares
+try:
+    from config import CARPETA_LOGS, CLAVES_CATEGORIA
+except ImportError:
+    CARPETA_LOGS = os.path.join("Beluga", "logs")
+    CLAVES_CATEGORIA = {}
+
+from modelo import Canal
+from sondeo_http import intercalar_por_host
+from cache_auditoria import CacheAuditoria
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# --- CONFIGURACIÓN DEL PRESUPUESTO ---
+FRACCION_RESERVA_FINAL = 0.10   # Parte del presupuesto reservada para la Fase 3 y las escrituras finales
+RESERVA_FINAL_MINIMA = 30       # Segundos mínimos de esa reserva
+FRACCION_FASE_1 = 0.5           # Parte del tiempo de sondeo para la Fase 1 (lo que no use pasa a la Fase 2)
+TAMANO_TANDA = 1000             # Canales por tanda: orden por valor entre tandas, intercalado por host dentro
+_SIN_SERVIDOR = 10 ** 6         # Canales conocidos sin servidor (caídos o dudosos): tras los publicados
+
+# Orden de CLAVES_CATEGORIA = prioridad de la categoría (la primera es la más valiosa)
+_RANGO_CATEGORIA = {categoria: rango for rango, categoria in enumerate(CLAVES_CATEGORIA)}
+
+
+def parsear_duracion(texto: str) -> float:
+    """'90' -> 90 s, '45m' -> 2700 s, '2h' -> 7200 s (para --time-budget)."""
+    texto = texto.strip().lower()
+    multiplicador = {"s": 1, "m": 60, "h": 3600}.get(texto[-1:], None)
+    valor = float(texto[:-1] if multiplicador else texto)
+    if valor <= 0:
+        raise ValueError(f"Duración no válida: {texto}")
+    return valor * (multiplicador or 1)
+
+
+def clave_valor(canal: Canal, asignacion: Dict[str, int], cache: CacheAuditoria) -> Tuple[int, int, int]:
+    """
+    Clave de orden (menor = se sondea antes): primero los canales nuevos (sin historial en la
+    caché de auditoría: nunca sondeados), luego por prioridad de la categoría en
+    CLAVES_CATEGORIA y por número de servidor actual (los que no están en ningún servidor, al final).
+    """
+    servidor = asignacion.get(canal.url)
+    return (
+        0 if cache.salud(canal.url) is None else 1,
+        _RANGO_CATEGORIA.get(canal.categoria, len(_RANGO_CATEGORIA)),
+        servidor if servidor is not None else _SIN_SERVIDOR,
+    )
+
+# =========================================================================================
+# ⏳ PRESUPUESTO GLOBAL DE TIEMPO (--time-budget)
+# =========================================================================================
+
+class PresupuestoTiempo:
+    """
+    Presupuesto de tiempo de una ejecución. Fija los plazos de la Fase 1 y la Fase 2 (dejando
+    una reserva para la Fase 3), ordena los sondeos por valor y recuerda los canales que no se
+    sondearon a tiempo (conservan su estado anterior) para el informe de aplazados.
+    """
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self.inicio = time.monotonic()
+        self.reserva_final = max(RESERVA_FINAL_MINIMA, segundos * FRACCION_RESERVA_FINAL)
+        self.aplazados: Dict[str, List[Canal]] = {}
+        self._asignacion: Optional[Dict[str, int]] = None
+        self._cache: Optional[CacheAuditoria] = None
+
+    def restante(self) -> float:
+        return self.segundos - (time.monotonic() - self.inicio)
+
+    def plazo_fase_1(self) -> float:
+        """Instante (time.monotonic) a partir del cual la Fase 1 deja de empezar sondeos."""
+        disponible = self.restante() - self.reserva_final
+        return time.monotonic() + max(0.0, disponible * FRACCION_FASE_1)
+
+    def plazo_fase_2(self) -> float:
+        return self.inicio + self.segundos - self.reserva_final
+
+    @property
+    def asignacion(self) -> Dict[str, int]:
+        """
+        URL -> servidor actual. main la toma de la lectura de servidores de la Fase 0; si no se
+        fijó, se lee una vez de los servidores publicados (según el manifiesto).
+        """
+        if self._asignacion is None:
+            from servidor import leer_asignacion_servidores
+            self._asignacion = leer_asignacion_servidores()
+        return self._asignacion
+
+    @asignacion.setter
+    def asignacion(self, asignacion: Dict[str, int]):
+        self._asignacion = asignacion
+
+    @property
+    def cache(self) -> CacheAuditoria:
+        """Caché de auditoría tal como estaba al primer uso: decide qué canales son nuevos en esta ejecución."""
+        if self._cache is None:
+            self._cache = CacheAuditoria()
+        return self._cache
+
+    def ordenar(self, elementos: Iterable[Any], obtener_canal: Callable[[Any], Canal] = lambda x: x) -> List[Any]:
+        """Elementos por valor descendente de su canal; dentro de cada tanda se intercalan por host."""
+        ordenados = sorted(elementos, key=lambda e: clave_valor(obtener_canal(e), self.asignacion, self.cache))
+        resultado: List[Any] = []
+        for inicio in range(0, len(ordenados), TAMANO_TANDA):
+            resultado.extend(intercalar_por_host(ordenados[inicio:inicio + TAMANO_TANDA],
+                                                 lambda e: obtener_canal(e).url))
+        return resultado
+
+    def registrar_aplazados(self, fase: str, canales: List[Canal]):
+        if canales:
+            self.aplazados.setdefault(fase, []).extend(canales)
+            print(f"⏳ {fase}: {len(canales)} canales aplazados por el presupuesto de tiempo (conservan su estado).")
+
+    def escribir_informe(self) -> Optional[str]:
+        """Escribe en CARPETA_LOGS el informe de canales aplazados. Devuelve la ruta (None si no hubo)."""
+        if not self.aplazados:
+            return None
+        fecha = datetime.now()
+        ruta = os.path.join(CARPETA_LOGS, f"RP_Aplazados_{fecha.strftime('%Y%m%d_%H%M%S')}.md")
+        contenido = [
+            "# ⏳ Canales Aplazados por el Presupuesto de Tiempo",
+            f"Ejecución: **{fecha.strftime('%Y-%m-%d %H:%M:%S')}** — presupuesto {self.segundos:.0f}s, "
+            f"usado {self.segundos - self.restante():.0f}s",
+            "",
+        ]
+        for fase, canales in self.aplazados.items():
+            contenido.append(f"\n## {fase}: {len(canales)} canales\n")
+            for categoria, total in Counter(canal.categoria for canal in canales).most_common():
+                contenido.append(f"* **{categoria}:** {total}")
+            contenido.append("")
+            contenido.extend(f"    {canal.estado:<11} {canal.categoria:<20} {canal.url}" for canal in canales)
+
+        os.makedirs(CARPETA_LOGS, exist_ok=True)
+        with open(ruta, "w", encoding="utf-8", errors="ignore") as f:
+            f.write("\n".join(contenido) + "\n")
+        logging.info(f"📝 Informe de canales aplazados: {ruta}")
+        return ruta
@@ -0,0 +1,89 @@
+# publicador.py
+import os
+import shutil
+import hashlib
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+CARPETA_PREPARACION = ".preparacion"
+
+# =========================================================================================
+# 📤 PUBLICACIÓN ATÓMICA (SOLO LOS ARCHIVOS QUE CAMBIAN)
+# =========================================================================================
+
+def hash_archivo(ruta: str) -> Optional[str]:
+    """sha256 del contenido de un archivo (None si no existe)."""
+    if not os.path.exists(ruta):
+        return None
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+class PublicacionAtomica:
+    """
+    Prepara los archivos de salida en una carpeta de preparación (dentro de la carpeta de
+    destino, mismo sistema de archivos) y al confirmar:
+      1. compara el hash de cada archivo preparado con el publicado y descarta los iguales,
+      2. reemplaza con os.replace (atómico) solo los que cambiaron,
+      3. elimina al final los archivos obsoletos.
+    Si el proceso se interrumpe antes de confirmar, los archivos publicados no se tocan.
+    """
+
+    def __init__(self, carpeta_destino: str):
+        self.carpeta_destino = carpeta_destino
+        self.carpeta_preparacion = os.path.join(carpeta_destino, CARPETA_PREPARACION)
+        self._preparados: List[str] = []
+        # Restos de una ejecución interrumpida
+        shutil.rmtree(self.carpeta_preparacion, ignore_errors=True)
+        os.makedirs(self.carpeta_preparacion, exist_ok=True)
+
+    def ruta_preparacion(self, nombre: str) -> str:
+        """Ruta donde escribir `nombre` (para escritores en streaming). Queda registrado para publicar."""
+        if nombre not in self._preparados:
+            self._preparados.append(nombre)
+        return os.path.join(self.carpeta_preparacion, nombre)
+
+    def escribir(self, nombre: str, contenido: str):
+        # newline="\n": sin traducción de saltos de línea, los bytes publicados son los de `contenido`
+        with open(self.ruta_preparacion(nombre), "w", encoding="utf-8", errors="ignore", newline="\n") as f:
+            f.write(contenido)
+
+    def confirmar(self, obsoletos: Iterable[str] = ()) -> Tuple[List[str], List[str]]:
+        """Publica los archivos que cambiaron y elimina los obsoletos. Devuelve (publicados, sin_cambios)."""
+        publicados, sin_cambios = [], []
+
+        for nombre in self._preparados:
+            ruta_preparada = os.path.join(self.carpeta_preparacion, nombre)
+            ruta_destino = os.path.join(self.carpeta_destino, nombre)
+            if not os.path.exists(ruta_preparada):
+                continue
+            if hash_archivo(ruta_preparada) == hash_archivo(ruta_destino):
+                os.remove(ruta_preparada)
+                sin_cambios.append(nombre)
+            else:
+                os.replace(ruta_preparada, ruta_destino)
+                publicados.append(nombre)
+
+        # Los obsoletos se eliminan al final: hasta aquí siempre hay una versión completa publicada
+        for nombre in obsoletos:
+            if nombre in publicados or nombre in sin_cambios:
+                continue
+            try:
+                os.remove(os.path.join(self.carpeta_destino, nombre))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"❌ Error al eliminar {nombre}: {e}")
+
+        self.descartar()
+        return publicados, sin_cambios
+
+    def descartar(self):
+        """Elimina la carpeta de preparación sin publicar nada más."""
+        shutil.rmtree(self.carpeta_preparacion, ignore_errors=True)
+        self._preparados = []
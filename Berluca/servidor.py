@@ -1,8 +1,10 @@
 # servidor.py
 import os
+import math
+import heapq
 import shutil
 from collections import defaultdict, Counter
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Set
 import logging
 from datetime import datetime
 import glob 
@@ -14,12 +16,19 @@ try:
     from config import (
         CARPETA_SALIDA, NOMBRE_BASE_SERVIDOR, LIMITE_BLOQUES_CATEGORIA,
         LIMITE_BLOQUES_SERVIDOR_GLOBAL, PRIORIDAD_ESTADO, TITULOS_VISUALES, 
-        MAX_SERVIDORES_BUSCAR, LOGO_DEFAULT
+        MAX_SERVIDORES_BUSCAR, LOGO_DEFAULT, ASIGNACION_ESTABLE
     )
     from auxiliar import (
-        extraer_bloques_m3u, extraer_url, extraer_nombre_canal, 
+        extraer_bloques_m3u, iterar_bloques_archivo, extraer_url, extraer_nombre_canal, 
         extraer_estado, extraer_prioridad, extraer_categoria_del_bloque
     )
+    from modelo import Canal
+    from almacen import abrir_almacen
+    from publicador import PublicacionAtomica
+    from manifiesto import (
+        NOMBRE_MANIFIESTO, buscar_archivos_servidor, servidores_publicados,
+        entrada_servidor, serializar_manifiesto, actualizar_entrada
+    )
 except ImportError as e:
     logging.error(f"Error al importar módulos en servidor.py: {e}")
     CARPETA_SALIDA = "Beluga"
@@ -30,6 +39,7 @@ except ImportError as e:
     TITULOS_VISUALES = {}
     MAX_SERVIDORES_BUSCAR = 40
     LOGO_DEFAULT = ""
+    ASIGNACION_ESTABLE = True
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -42,36 +52,19 @@ def obtener_servidor_path(servidor_num: int) -> str:
     nombre_archivo = f"{NOMBRE_BASE_SERVIDOR}_{servidor_num:02d}.m3u"
     return os.path.join(CARPETA_SALIDA, nombre_archivo)
 
-def obtener_inventario_servidor(servidor_num: int) -> Dict[str, List[Dict[str, Any]]]:
-    """Lee un archivo RP_Servidor_XX.m3u y devuelve un diccionario de bloques enriquecidos."""
+def obtener_inventario_servidor(servidor_num: int) -> Dict[str, List[Canal]]:
+    """Lee un archivo RP_Servidor_XX.m3u y devuelve sus canales agrupados por categoría."""
     ruta = obtener_servidor_path(servidor_num)
     inventario = defaultdict(list)
     if not os.path.exists(ruta):
         return inventario
 
     try:
-        with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
-            lineas = f.readlines()
-        
-        bloques = extraer_bloques_m3u(lineas)
-        
-        for bloque in bloques:
-            url = extraer_url(bloque)
-            if not url: continue
+        for bloque in iterar_bloques_archivo(ruta):
+            canal = Canal.desde_bloque(bloque)
+            if canal is None: continue
 
-            nombre = extraer_nombre_canal(bloque)
-            estado = extraer_estado(bloque)
-            prioridad = PRIORIDAD_ESTADO.get(estado, 0)
-            categoria = extraer_categoria_del_bloque(bloque)
-            
-            inventario[categoria].append({
-                "bloque": bloque, 
-                "url": url,
-                "nombre_limpio": nombre.strip().lower().replace(" ", "").replace("ñ", "n"),
-                "categoria": categoria,
-                "estado": estado,
-                "prioridad": prioridad
-            })
+            inventario[canal.categoria].append(canal)
             
     except Exception as e:
         logging.error(f"Error al leer el inventario del servidor {servidor_num}: {e}")
@@ -79,63 +72,71 @@ def obtener_inventario_servidor(servidor_num: int) -> Dict[str, List[Dict[str, A
     return inventario
 
 
-def guardar_inventario_servidor(servidor_num: int, inventario: Dict[str, List[Dict[str, Any]]]) -> bool:
-    """Escribe el inventario de vuelta al archivo de servidor."""
+def _renderizar_servidor(inventario: Dict[str, List[Canal]]) -> str:
+    """Contenido M3U de un servidor."""
+    partes = ["#EXTM3U\n"]
+    for categoria in inventario:
+        for canal in inventario[categoria]:
+            partes.append("\n".join(canal.bloque) + "\n")
+    return "".join(partes)
+
+
+def guardar_inventario_servidor(servidor_num: int, inventario: Dict[str, List[Canal]]) -> bool:
+    """Escribe el inventario de vuelta al archivo de servidor y actualiza su entrada del manifiesto."""
     ruta = obtener_servidor_path(servidor_num)
     
     try:
-        with open(ruta, "w", encoding="utf-8", errors="ignore") as f:
-            f.write("#EXTM3U\n")
-            for categoria in inventario:
-                for canal in inventario[categoria]:
-                    f.write("\n".join(canal["bloque"]) + "\n")
+        contenido = _renderizar_servidor(inventario)
+        with open(ruta, "w", encoding="utf-8", errors="ignore", newline="\n") as f:
+            f.write(contenido)
+        actualizar_entrada(entrada_servidor(servidor_num, os.path.basename(ruta), contenido, inventario))
         return True
     except Exception as e:
         logging.error(f"Error al guardar el servidor {servidor_num}: {e}")
         return False
 
 
-def _limpiar_archivos_servidor():
-    """CRÍTICO: Elimina todos los archivos RP_Servidor_XX.m3u de la carpeta de salida."""
-    patron = os.path.join(CARPETA_SALIDA, f"{NOMBRE_BASE_SERVIDOR}_*.m3u")
-    archivos = glob.glob(patron)
-    
-    if archivos:
-        logging.info(f"🧹 Eliminando {len(archivos)} archivos de servidores antiguos para el re-balanceo.")
-        for archivo in archivos:
-            try:
-                os.remove(archivo)
-            except Exception as e:
-                logging.error(f"❌ Error al eliminar {os.path.basename(archivo)}: {e}")
+def leer_asignacion_servidores() -> Dict[str, int]:
+    """Asignación actual URL -> número de servidor, leída de los archivos de servidor publicados."""
+    asignacion: Dict[str, int] = {}
+    for num, ruta in sorted(servidores_publicados().items()):
+        for bloque in iterar_bloques_archivo(ruta):
+            url = extraer_url(bloque)
+            if url:
+                asignacion.setdefault(url, num)
+    return asignacion
 
 
-def compilar_inventario_existente(max_servers: int) -> Dict[str, List[str]]:
-    """Lee todos los archivos de servidor existentes y devuelve un diccionario de bloques de canal."""
+def compilar_inventario_existente(max_servers: int, asignacion: Optional[Dict[str, int]] = None) -> Dict[str, List[str]]:
+    """
+    Lee todos los archivos de servidor existentes y devuelve un diccionario de bloques de canal.
+    Con `asignacion` la rellena además con URL -> número de servidor (la misma lectura).
+    """
     inventario_compilado: Dict[str, List[str]] = {}
     
-    for i in range(1, max_servers + 1):
-        ruta = obtener_servidor_path(i)
-        if os.path.exists(ruta):
-            inventario_servidor = obtener_inventario_servidor(i)
-            
-            for categoria in inventario_servidor:
-                for canal in inventario_servidor[categoria]:
-                    url = canal['url']
-                    if not url:
-                        continue
-                        
-                    extinf_line = [l for l in canal['bloque'] if l.startswith("#EXTINF")][0]
-                    
-                    # Bloque final para la auditoría (se asumirá estado 'abierto')
-                    bloque_final = [
-                        extinf_line, 
-                        "#ESTADO:abierto", 
-                        url
-                    ] 
-                    
-                    if url not in inventario_compilado:
-                        inventario_compilado[url] = bloque_final
+    # Servidores según el manifiesto publicado (glob si no hay manifiesto o ya no coincide)
+    for i in sorted(servidores_publicados()):
+        if i > max_servers:
+            continue
+        inventario_servidor = obtener_inventario_servidor(i)
+        
+        for categoria in inventario_servidor:
+            for canal in inventario_servidor[categoria]:
+                url = canal.url
                 
+                # Bloque final para la auditoría: se conserva el estado registrado en el servidor.
+                # La Fase 1 decide con la caché de auditoría si hay que volver a sondearlo.
+                bloque_final = [
+                    canal.extinf, 
+                    f"#ESTADO:{canal.estado}", 
+                    url
+                ] 
+                
+                if url not in inventario_compilado:
+                    inventario_compilado[url] = bloque_final
+                    if asignacion is not None:
+                        asignacion[url] = i
+            
     logging.info(f"💾 Compilado inventario existente de {len(inventario_compilado)} canales de servidores anteriores.")
     return inventario_compilado
 
@@ -143,113 +144,196 @@ def compilar_inventario_existente(max_servers: int) -> Dict[str, List[str]]:
 # ⚖️ BALANCEO Y DISTRIBUCIÓN
 # =========================================================================================
 
-def auditar_y_balancear_servidores(max_servidores_a_buscar: int):
+def auditar_y_balancear_servidores(max_servidores_a_buscar: int, asignacion_estable: bool = ASIGNACION_ESTABLE):
     """
-    Lee el archivo de resumen de auditoría final, distribuye los canales 'abierto' 
-    en servidores, aplicando límites y forzando el inicio desde el Servidor 01.
+    Lee los canales del almacén y distribuye los 'abierto' en servidores, aplicando límites
+    (ver balancear_y_publicar). Al final renderiza desde el almacén el resumen de auditoría,
+    una sola vez por ejecución: es una salida, las fases no lo vuelven a leer.
     """
-    
-    # 1. PASO CRÍTICO: Limpiar los archivos finales ANTES de escribir los nuevos.
-    _limpiar_archivos_servidor()
-    
     RUTA_RESUMEN_AUDITORIA = os.path.join(CARPETA_SALIDA, "RP_Resumen_Auditoria.m3u")
     
-    if not os.path.exists(RUTA_RESUMEN_AUDITORIA):
-        logging.warning("⚠️ No se encontró el archivo de resumen de auditoría. Abortando balanceo.")
-        return
+    with abrir_almacen(RUTA_RESUMEN_AUDITORIA) as almacen:
+        if len(almacen) == 0:
+            logging.warning("⚠️ No se encontró el archivo de resumen de auditoría. Abortando balanceo.")
+            return
+        balancear_y_publicar(almacen.canales(), asignacion_estable)
+        total = almacen.exportar_m3u(RUTA_RESUMEN_AUDITORIA)
+        logging.info(f"💾 Resumen de Auditoría renderizado desde el almacén: {total} canales.")
 
-    # A) Cargar inventario completo desde el resumen
-    with open(RUTA_RESUMEN_AUDITORIA, "r", encoding="utf-8", errors="ignore") as f:
-        lineas = f.readlines()
-        
+
+def balancear_y_publicar(canales: Iterable[Canal], asignacion_estable: bool = ASIGNACION_ESTABLE,
+                         asignacion_previa: Optional[Dict[str, int]] = None):
+    """
+    Distribuye los canales 'abierto' en servidores, aplicando límites, y publica servidores,
+    excluidos y guía en UNA sola pasada de escritura. Con asignación estable cada canal se
+    queda en su servidor anterior si los límites lo permiten (`asignacion_previa`, URL -> servidor;
+    si no se indica, se lee de los archivos de servidor publicados).
+    Todo se prepara en una carpeta de preparación y se publica con PublicacionAtomica:
+    solo se reemplazan los archivos cuyo hash cambia y los servidores vacíos se eliminan al final.
+    """
+    # A) Recorrer los canales (en streaming si vienen del resumen). Solo los 'abierto' se retienen
+    #    en memoria (hay que ordenarlos); los excluidos se escriben directamente a su archivo.
+    NOMBRE_EXCLUIDOS = "RP_Canales_Excluidos_Audit.m3u"
+    publicacion = PublicacionAtomica(CARPETA_SALIDA)
     bloques_enriquecidos = []
-    bloques_excluidos = []
+    total_excluidos = 0
     
-    for bloque in extraer_bloques_m3u(lineas):
-        url = extraer_url(bloque)
-        if not url: continue
-            
-        estado = extraer_estado(bloque)
-        prioridad = PRIORIDAD_ESTADO.get(estado, 0)
-        
-        canal = {
-            "bloque": bloque, 
-            "url": url,
-            "categoria": extraer_categoria_del_bloque(bloque),
-            "estado": estado,
-            "prioridad": prioridad
-        }
-        
-        if estado == "abierto":
+    with open(publicacion.ruta_preparacion(NOMBRE_EXCLUIDOS), "w", encoding="utf-8", errors="ignore") as f_excluidos:
+        f_excluidos.write("#EXTM3U\n")
+
+        for canal in canales:
+            if canal.estado != "abierto":
+                f_excluidos.write("\n".join(canal.bloque) + "\n")
+                total_excluidos += 1
+                continue
+
             bloques_enriquecidos.append(canal)
-        else:
-            bloques_excluidos.append(canal)
 
     # Ordenar por prioridad y luego por categoría
-    bloques_enriquecidos.sort(key=lambda x: (x['prioridad'], x['categoria']), reverse=True)
+    bloques_enriquecidos.sort(key=lambda x: (x.prioridad, x.categoria), reverse=True)
 
     logging.info(f"Inventario general cargado: {len(bloques_enriquecidos)} canales 'abierto'.")
     
     # B) Iniciar Balanceo Estratégico (Distribución)
     print("\n--- ⚖️ Iniciando Balanceo Estratégico (Prioridad y Límite) ---")
 
-    servidores_activos = defaultdict(lambda: {
-        'inventario': defaultdict(list), 
-        'conteo_global': 0
-    })
-    # Empezar siempre por el Servidor 1
-    servidor_actual_num = 1
-    
-    for canal in tqdm(bloques_enriquecidos, desc="Asignando canales por Prioridad y Límite"):
-        
-        categoria = canal['categoria']
-        
-        while True:
-            servidor = servidores_activos[servidor_actual_num]
-            
-            conteo_cat = len(servidor['inventario'][categoria])
-            conteo_global = servidor['conteo_global']
-            
-            if (conteo_cat < LIMITE_BLOQUES_CATEGORIA) and \
-               (conteo_global < LIMITE_BLOQUES_SERVIDOR_GLOBAL):
-                
-                servidor['inventario'][categoria].append(canal)
-                servidor['conteo_global'] += 1
-                break 
-            else:
-                servidor_actual_num += 1
+    if not asignacion_estable:
+        asignacion_previa = None
+    elif asignacion_previa is None:
+        asignacion_previa = leer_asignacion_servidores()
+    servidores_activos = balancear_canales(
+        bloques_enriquecidos, LIMITE_BLOQUES_CATEGORIA, LIMITE_BLOQUES_SERVIDOR_GLOBAL,
+        mostrar_progreso=True, asignacion_previa=asignacion_previa
+    )
+    if asignacion_previa is not None:
+        sin_mover = sum(
+            1 for num, servidor in servidores_activos.items()
+            for canales in servidor['inventario'].values()
+            for canal in canales if asignacion_previa.get(canal.url) == num
+        )
+        print(f"📌 Asignación estable: {sin_mover}/{len(bloques_enriquecidos)} canales se quedan en su servidor.")
 
-    # C) Guardar servidores
+    # C) Preparar los servidores
+    archivos_previos = {os.path.basename(ruta) for ruta in buscar_archivos_servidor().values()}
     servidores_generados = 0
+    entradas_manifiesto = []
     
     for num_servidor in sorted(servidores_activos.keys()):
         inventario = servidores_activos[num_servidor]['inventario']
         conteo_global = servidores_activos[num_servidor]['conteo_global']
         
         if conteo_global > 0:
-            if guardar_inventario_servidor(num_servidor, inventario):
-                servidores_generados += 1
+            servidores_generados += 1
+            nombre = os.path.basename(obtener_servidor_path(num_servidor))
+            contenido = _renderizar_servidor(inventario)
+            publicacion.escribir(nombre, contenido)
+            entradas_manifiesto.append(entrada_servidor(num_servidor, nombre, contenido, inventario))
+            archivos_previos.discard(nombre)
+
+    # Manifiesto: índice de los servidores publicados (Fase 0, actualizar_servidores y la lista maestra)
+    publicacion.escribir(NOMBRE_MANIFIESTO, serializar_manifiesto(entradas_manifiesto))
             
-    # D) Guardar canales dudosos/fallidos (Excluidos)
-    RUTA_EXCLUIDOS = os.path.join(CARPETA_SALIDA, "RP_Canales_Excluidos_Audit.m3u")
-    if bloques_excluidos:
-        logging.warning(f"⚠️ {len(bloques_excluidos)} canales dudosos/fallidos guardados en: {RUTA_EXCLUIDOS}")
-        with open(RUTA_EXCLUIDOS, "w", encoding="utf-8", errors="ignore") as f:
-            f.write("#EXTM3U\n")
-            for canal in bloques_excluidos:
-                 f.write("\n".join(canal["bloque"]) + "\n")
+    # D) Canales dudosos/fallidos (Excluidos), ya escritos durante la carga
+    obsoletos = archivos_previos
+    if total_excluidos:
+        logging.warning(f"⚠️ {total_excluidos} canales dudosos/fallidos guardados en: "
+                        f"{os.path.join(CARPETA_SALIDA, NOMBRE_EXCLUIDOS)}")
     else:
-        if os.path.exists(RUTA_EXCLUIDOS):
-            os.remove(RUTA_EXCLUIDOS)
+        os.remove(publicacion.ruta_preparacion(NOMBRE_EXCLUIDOS))
+        obsoletos.add(NOMBRE_EXCLUIDOS)
+
+    # E) Guía de Contenido
+    generar_guia_contenido(servidores_activos, publicacion)
 
-    # E) Generar Guía de Contenido
-    generar_guia_contenido(servidores_activos)
+    # F) Publicar: solo los archivos que cambiaron; los servidores sobrantes se eliminan al final
+    publicados, sin_cambios = publicacion.confirmar(obsoletos=sorted(obsoletos))
+    print(f"✍️ Archivos publicados: {len(publicados)}. Sin cambios: {len(sin_cambios)}. "
+          f"Servidores eliminados: {sum(1 for n in obsoletos if n.startswith(NOMBRE_BASE_SERVIDOR))}.")
     
     print(f"✅ Balanceo Estratégico finalizado. Servidores generados: {servidores_generados}.")
 
 
-def generar_guia_contenido(servidores_activos: Dict[int, Any]):
-    """Genera el archivo Markdown con el resumen de contenido por servidor."""
+def balancear_canales(canales: List[Canal], limite_categoria: int, limite_global: int,
+                      mostrar_progreso: bool = False,
+                      asignacion_previa: Optional[Dict[str, int]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Reparte los canales en el MÍNIMO número de servidores que permiten los límites:
+    max(ceil(total / limite_global), max por categoría de ceil(canales / limite_categoria)).
+
+    Los servidores (numerados desde el 01) están en un min-heap por (conteo_global, número):
+    cada canal va al servidor con más cupo libre que aún admite su categoría, en O(log servidores).
+    Con los canales agrupados por categoría (el orden de auditar_y_balancear_servidores) los
+    conteos quedan repartidos a ±1 y nunca se supera un límite; si otro orden lo exigiera,
+    se abre un servidor adicional.
+
+    Con `asignacion_previa` (URL -> servidor) cada canal se deja primero en su servidor
+    anterior si los límites lo permiten; solo los canales nuevos o desplazados pasan por el heap.
+    """
+    servidores_activos = defaultdict(lambda: {
+        'inventario': defaultdict(list), 
+        'conteo_global': 0
+    })
+    if not canales:
+        return servidores_activos
+
+    por_categoria = Counter(canal.categoria for canal in canales)
+    total_servidores = max(
+        math.ceil(len(canales) / limite_global),
+        max(math.ceil(n / limite_categoria) for n in por_categoria.values())
+    )
+    conteo_global: Counter = Counter()       # servidor -> canales
+    conteo_categoria: Counter = Counter()    # (servidor, categoría) -> canales
+
+    def _asignar(canal: Canal, num: int):
+        servidores_activos[num]['inventario'][canal.categoria].append(canal)
+        servidores_activos[num]['conteo_global'] += 1
+        conteo_global[num] += 1
+        conteo_categoria[(num, canal.categoria)] += 1
+
+    pendientes = canales
+    if asignacion_previa:
+        pendientes = []
+        for canal in canales:
+            num = asignacion_previa.get(canal.url)
+            if num is not None and conteo_global[num] < limite_global and \
+                    conteo_categoria[(num, canal.categoria)] < limite_categoria:
+                _asignar(canal, num)
+            else:
+                pendientes.append(canal)
+        total_servidores = max(total_servidores, max(conteo_global, default=0))
+
+    heap = [(conteo_global[num], num) for num in range(1, total_servidores + 1)]
+    heapq.heapify(heap)
+
+    iterable = tqdm(pendientes, desc="Asignando canales por Prioridad y Límite") if mostrar_progreso else pendientes
+    for canal in iterable:
+        categoria = canal.categoria
+
+        # Apartar los servidores con más cupo libre que ya llenaron esta categoría
+        apartados = []
+        while heap and heap[0][0] < limite_global and \
+                conteo_categoria[(heap[0][1], categoria)] >= limite_categoria:
+            apartados.append(heapq.heappop(heap))
+
+        if not heap or heap[0][0] >= limite_global:
+            total_servidores += 1
+            heapq.heappush(heap, (0, total_servidores))
+
+        conteo, num = heap[0]
+        _asignar(canal, num)
+        heapq.heapreplace(heap, (conteo + 1, num))
+
+        for entrada in apartados:
+            heapq.heappush(heap, entrada)
+
+    return servidores_activos
+
+
+def generar_guia_contenido(servidores_activos: Dict[int, Any], publicacion: Optional[PublicacionAtomica] = None):
+    """
+    Genera el archivo Markdown con el resumen de contenido por servidor (a través de
+    `publicacion` si se indica). Si solo cambiaría la fecha de actualización, no se reescribe.
+    """
     
     RUTA_GUIA = os.path.join(CARPETA_SALIDA, "RP_Guia_Contenido.md")
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -290,9 +374,27 @@ def generar_guia_contenido(servidores_activos: Dict[int, Any]):
                 f"| {len(canales)} |\n"
             )
 
+    texto = "\n".join(contenido)
+    if _sin_cambios_salvo_fecha(RUTA_GUIA, texto):
+        logging.info(f"📄 Guía de Contenido sin cambios: {RUTA_GUIA}")
+        return
+
     try:
-        with open(RUTA_GUIA, "w", encoding="utf-8", errors="ignore") as f:
-            f.write("\n".join(contenido))
+        if publicacion is not None:
+            publicacion.escribir(os.path.basename(RUTA_GUIA), texto)
+        else:
+            with open(RUTA_GUIA, "w", encoding="utf-8", errors="ignore") as f:
+                f.write(texto)
         logging.info(f"📄 Guía de Contenido generada en: {RUTA_GUIA}")
     except Exception as e:
-        logging.error(f"Error al generar la guía de contenido: {e}")
\ No newline at end of file
+        logging.error(f"Error al generar la guía de contenido: {e}")
+
+
+def _sin_cambios_salvo_fecha(ruta: str, texto: str) -> bool:
+    """True si el archivo existente solo difiere de `texto` en la línea 'Última Actualización'."""
+    if not os.path.exists(ruta):
+        return False
+    with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+        existente = f.read()
+    sin_fecha = lambda t: [l for l in t.split("\n") if not l.startswith("Última Actualización:")]
+    return sin_fecha(existente) == sin_fecha(texto)
\ No newline at end of file
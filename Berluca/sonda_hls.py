@@ -0,0 +1,288 @@
+# sonda_hls.py
+import re
+import time
+import asyncio
+import logging
+from urllib.parse import urlsplit, urljoin
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sondeo_http import (
+    ErrorSondeo, PoolConexiones, origen_y_ruta, leer_respuesta, host_de_url, intercalar_por_host,
+    USER_AGENT, MAX_REDIRECCIONES, MAX_SONDEOS_POR_HOST
+)
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# --- CONFIGURACIÓN DE LA SONDA HLS ---
+TIMEOUT_SONDA_HLS = 10             # Segundos por canal (lista maestra + lista de medios + segmento)
+MAX_SONDAS_SIMULTANEAS = 100
+MAX_BYTES_LISTA = 512 * 1024       # Una lista HLS más grande no es razonable: se deja a Streamlink
+BYTES_SEGMENTO = 4096              # Primeros bytes del segmento (Range) que confirman que se sirve
+MAX_NIVELES_LISTA = 3              # Listas maestras anidadas que se siguen como máximo
+MAX_VARIANTES_PROBADAS = 2         # Variantes (de menor a mayor ancho de banda) que se prueban si la anterior no existe
+EXTENSIONES_HLS = (".m3u8", ".m3u")
+CODIGOS_INEXISTENTE = (404, 410)   # La lista o el segmento no existen: veredicto 'fallido'
+
+_PATRON_ATRIBUTO = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def es_url_hls(url: str) -> bool:
+    """True si la ruta de la URL apunta a una lista HLS (.m3u8/.m3u), sin mirar la query."""
+    try:
+        return urlsplit(url).path.lower().endswith(EXTENSIONES_HLS)
+    except ValueError:
+        return False
+
+
+def analizar_lista_hls(texto: str, url_base: str) -> Tuple[List[Tuple[int, str]], List[str], bool]:
+    """
+    Analiza una lista HLS. Devuelve (variantes, segmentos, es_final):
+      - variantes: [(BANDWIDTH, URL absoluta)] si es una lista maestra,
+      - segmentos: URLs absolutas de los segmentos si es una lista de medios,
+      - es_final: la lista tiene #EXT-X-ENDLIST (VOD; si no, es en directo).
+    """
+    variantes: List[Tuple[int, str]] = []
+    segmentos: List[str] = []
+    es_final = False
+    ancho_pendiente: Optional[int] = None
+
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea:
+            continue
+        if linea.startswith("#EXT-X-STREAM-INF"):
+            atributos = dict(_PATRON_ATRIBUTO.findall(linea.partition(":")[2]))
+            ancho = atributos.get("BANDWIDTH", "0")
+            ancho_pendiente = int(ancho) if ancho.isdigit() else 0
+        elif linea.startswith("#EXT-X-ENDLIST"):
+            es_final = True
+        elif not linea.startswith("#"):
+            uri = urljoin(url_base, linea)
+            if ancho_pendiente is not None:
+                variantes.append((ancho_pendiente, uri))
+                ancho_pendiente = None
+            else:
+                segmentos.append(uri)
+
+    return variantes, segmentos, es_final
+
+# =========================================================================================
+# 📺 SONDA HLS NATIVA (GET lista -> variante -> primeros bytes de un segmento)
+# =========================================================================================
+
+class SondaHLS:
+    """
+    Sonda asyncio para canales HLS, pensada como etapa previa a Streamlink en la auditoría lenta.
+    Descarga la lista, si es maestra elige la variante de menor ancho de banda (o la siguiente
+    si esa no existe), descarga su lista de medios y pide con Range los primeros bytes de un
+    segmento (el último si es en directo, el primero si es VOD). Usa el mismo pool keep-alive
+    que el motor de sondeo HEAD.
+
+    probar() devuelve 'abierto' (el segmento se sirve), 'fallido' (la lista, todas las variantes
+    de la maestra o el segmento dan 404/410) o None cuando la sonda no puede decidir (no es HLS, error de red, 403, cifrado raro...):
+    esos canales siguen a Streamlink. Con `plazo` (instante de time.monotonic), los canales
+    que aún no han empezado cuando se alcanza también devuelven None, sin probar.
+    """
+
+    def __init__(self, timeout: float = TIMEOUT_SONDA_HLS, max_simultaneos: int = MAX_SONDAS_SIMULTANEAS,
+                 max_por_host: int = MAX_SONDEOS_POR_HOST, plazo: Optional[float] = None):
+        self.timeout = timeout
+        self.plazo = plazo
+        self.max_simultaneos = max(1, max_simultaneos)
+        self.max_por_host = max(1, max_por_host)
+        self.pool = PoolConexiones()
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._semaforos_host: Dict[str, asyncio.Semaphore] = {}
+
+    @staticmethod
+    async def _leer_cuerpo(reader: asyncio.StreamReader, cabeceras: Dict[str, str],
+                           max_bytes: int) -> Tuple[bytes, bool]:
+        """Lee hasta `max_bytes` del cuerpo. Devuelve (cuerpo, completo); si no está completo la conexión no se reutiliza."""
+        if "chunked" in cabeceras.get("transfer-encoding", "").lower():
+            partes, total = [], 0
+            while True:
+                tamano = int((await reader.readuntil(b"\r\n")).split(b";")[0].strip() or b"0", 16)
+                if tamano == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass  # Cabeceras finales (trailers)
+                    return b"".join(partes), True
+                if total + tamano > max_bytes:
+                    partes.append(await reader.readexactly(max_bytes - total))
+                    return b"".join(partes), False
+                partes.append(await reader.readexactly(tamano))
+                await reader.readexactly(2)
+                total += tamano
+
+        longitud = cabeceras.get("content-length")
+        if longitud is not None and longitud.isdigit():
+            longitud = int(longitud)
+            return await reader.readexactly(min(longitud, max_bytes)), longitud <= max_bytes
+
+        # Sin longitud: el cuerpo llega hasta que el servidor cierra la conexión
+        partes, total = [], 0
+        while total < max_bytes:
+            parte = await reader.read(max_bytes - total)
+            if not parte:
+                break
+            partes.append(parte)
+            total += len(parte)
+        return b"".join(partes), False
+
+    async def _peticion_get(self, url: str, max_bytes: int,
+                            rango: Optional[int] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """GET por una conexión del pool (con Range opcional). Reintenta una vez si la conexión reutilizada estaba muerta."""
+        origen, ruta, cabecera_host = origen_y_ruta(url)
+        objetivo, cabeceras_proxy = self.pool.objetivo(origen, ruta, cabecera_host)
+        peticion = (
+            f"GET {objetivo} HTTP/1.1\r\n"
+            f"Host: {cabecera_host}\r\n"
+            f"{cabeceras_proxy}"
+            f"User-Agent: {USER_AGENT}\r\n"
+            "Accept: */*\r\n"
+            + (f"Range: bytes=0-{rango - 1}\r\n" if rango else "")
+            + "Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1", errors="ignore")
+
+        for _ in range(2):
+            reader, writer, reutilizada = await self.pool.obtener(origen)
+            try:
+                writer.write(peticion)
+                await writer.drain()
+                codigo, cabeceras = await leer_respuesta(reader)
+                if codigo in (204, 304):
+                    cuerpo, completo = b"", True  # Respuestas sin cuerpo
+                else:
+                    cuerpo, completo = await self._leer_cuerpo(reader, cabeceras, max_bytes)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ErrorSondeo) as e:
+                writer.close()
+                if reutilizada:
+                    continue  # El servidor cerró la conexión inactiva: reintentar con una nueva
+                raise ErrorSondeo(str(e)) from e
+            except BaseException:
+                writer.close()
+                raise
+
+            if completo and cabeceras.get("connection", "").lower() != "close":
+                self.pool.devolver(origen, reader, writer)
+            else:
+                writer.close()
+            return codigo, cabeceras, cuerpo
+
+        raise ErrorSondeo(f"Conexión cerrada por el servidor: {url}")
+
+    async def _get(self, url: str, max_bytes: int, rango: Optional[int] = None) -> Tuple[int, bytes, str]:
+        """GET siguiendo redirecciones. Devuelve (código final, cuerpo, URL final)."""
+        for _ in range(MAX_REDIRECCIONES + 1):
+            codigo, cabeceras, cuerpo = await self._peticion_get(url, max_bytes, rango)
+            ubicacion = cabeceras.get("location")
+            if codigo in (301, 302, 303, 307, 308) and ubicacion:
+                url = urljoin(url, ubicacion)
+                continue
+            return codigo, cuerpo, url
+        raise ErrorSondeo("Demasiadas redirecciones")
+
+    async def _lista(self, url: str) -> Tuple[Optional[str], Optional[str], str]:
+        """Descarga una lista HLS. Devuelve (veredicto, texto, URL final); texto None si no se puede seguir."""
+        codigo, cuerpo, url_final = await self._get(url, MAX_BYTES_LISTA)
+        if codigo in CODIGOS_INEXISTENTE:
+            return "fallido", None, url_final
+        if not 200 <= codigo < 300:
+            return None, None, url_final
+        texto = cuerpo.decode("utf-8", errors="ignore").lstrip("\ufeff \t\r\n")
+        if not texto.startswith("#EXTM3U"):
+            return None, None, url_final  # No es HLS (p. ej. una página): lo decide Streamlink
+        return None, texto, url_final
+
+    async def _variante(self, variantes: List[Tuple[int, str]]) -> Tuple[Optional[str], Optional[str], str]:
+        """
+        Descarga la primera variante servible, de menor a mayor ancho de banda (hasta MAX_VARIANTES_PROBADAS).
+        Una variante con 404/410 no condena al canal: solo es 'fallido' si no existe ninguna de la maestra.
+        """
+        candidatas = sorted(variantes)
+        for _, url_variante in candidatas[:MAX_VARIANTES_PROBADAS]:
+            veredicto, texto, url_lista = await self._lista(url_variante)
+            if texto is not None or veredicto != "fallido":
+                return veredicto, texto, url_lista
+        # Todas las probadas faltan: 'fallido' solo si eran todas las de la maestra
+        return ("fallido" if len(candidatas) <= MAX_VARIANTES_PROBADAS else None), None, url_lista
+
+    async def _probar(self, url: str) -> Optional[str]:
+        veredicto, texto, url_lista = await self._lista(url)
+        if texto is None:
+            return veredicto
+
+        for _ in range(MAX_NIVELES_LISTA):
+            variantes, segmentos, es_final = analizar_lista_hls(texto, url_lista)
+            if not variantes:
+                break
+            # Las variantes de menor ancho de banda: las más baratas de confirmar
+            veredicto, texto, url_lista = await self._variante(variantes)
+            if texto is None:
+                return veredicto
+        else:
+            return None
+
+        if not segmentos:
+            return None
+        segmento = segmentos[0] if es_final else segmentos[-1]
+        codigo, cuerpo, _ = await self._get(segmento, BYTES_SEGMENTO, rango=BYTES_SEGMENTO)
+        if codigo in (200, 206) and cuerpo:
+            return "abierto"
+        if codigo in CODIGOS_INEXISTENTE:
+            return "fallido"
+        return None
+
+    async def probar(self, url: str) -> Optional[str]:
+        """Prueba un canal HLS: 'abierto', 'fallido' o None (indeciso, pasa a Streamlink)."""
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_simultaneos)
+
+        host = host_de_url(url)
+        if not host:
+            return None
+        semaforo_host = self._semaforos_host.get(host)
+        if semaforo_host is None:
+            semaforo_host = self._semaforos_host[host] = asyncio.Semaphore(self.max_por_host)
+
+        async with semaforo_host, self._semaforo:
+            if self.plazo is not None and time.monotonic() >= self.plazo:
+                return None
+            try:
+                return await asyncio.wait_for(self._probar(url), timeout=self.timeout)
+            except (ErrorSondeo, asyncio.TimeoutError, OSError, UnicodeError, ValueError):
+                return None
+
+    async def probar_lote(self, urls: List[str],
+                          al_completar: Optional[Callable[[int, Optional[str]], None]] = None,
+                          intercalar: bool = True) -> List[Optional[str]]:
+        """
+        Prueba todas las URLs concurrentemente (intercaladas por host, o en el orden recibido con
+        intercalar=False), conservando el orden de entrada en los resultados.
+        """
+        resultados: List[Optional[str]] = [None] * len(urls)
+
+        async def _tarea(i: int, url: str):
+            resultados[i] = await self.probar(url)
+            if al_completar:
+                al_completar(i, resultados[i])
+
+        orden = intercalar_por_host(range(len(urls)), lambda i: urls[i]) if intercalar else range(len(urls))
+        try:
+            await asyncio.gather(*(_tarea(i, urls[i]) for i in orden))
+        finally:
+            self.pool.cerrar()
+        return resultados
+
+
+def sondear_hls(urls: List[str], timeout: float = TIMEOUT_SONDA_HLS,
+                max_simultaneos: int = MAX_SONDAS_SIMULTANEAS,
+                al_completar: Optional[Callable[[int, Optional[str]], None]] = None,
+                plazo: Optional[float] = None) -> List[Optional[str]]:
+    """
+    Prueba un lote de canales HLS con un único bucle asyncio. Devuelve el veredicto (o None) por URL, en orden.
+    Con `plazo`, las URLs se prueban en el orden recibido y las que no empiezan a tiempo quedan en None.
+    """
+    if not urls:
+        return []
+    sonda = SondaHLS(timeout=timeout, max_simultaneos=max_simultaneos, plazo=plazo)
+    return asyncio.run(sonda.probar_lote(urls, al_completar, intercalar=plazo is None))
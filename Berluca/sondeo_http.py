@@ -0,0 +1,509 @@
+# sondeo_http.py
+import time
+import asyncio
+import ssl
+import logging
+import base64
+import threading
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import urlsplit, urljoin, quote, unquote
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from control_adaptativo import ControlAIMD, CupoAdaptativoAsync, TimeoutsPorHost, FACTOR_MAXIMO_CONCURRENCIA
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# --- CONFIGURACIÓN DEL MOTOR DE SONDEO ---
+TIMEOUT_SONDEO = 15
+MAX_SONDEOS_SIMULTANEOS = 200      # Peticiones en vuelo como máximo (todo el motor)
+MAX_SONDEOS_POR_HOST = 6           # Peticiones en vuelo como máximo contra un mismo host
+FALLOS_CORTE_HOST = 5              # Fallos consecutivos (conexión/timeout) que abren el circuito del host
+MAX_CONEXIONES_INACTIVAS_HOST = 8  # Conexiones keep-alive reutilizables por origen
+MAX_REDIRECCIONES = 10
+CODIGOS_ABIERTO = (200, 301, 302, 303, 307, 308)
+USER_AGENT = "Mozilla/5.0"
+CONTROL_ADAPTATIVO = True          # Concurrencia AIMD y timeout por host según la latencia observada
+TIMEOUT_MINIMO_SONDEO = 3          # Límite inferior del timeout adaptativo por host
+NO_SONDEADO = "aplazado"           # Estado devuelto para las URLs que no se sondearon antes del plazo
+SIN_SONDEAR = "omitido"            # URL no sondeada (host cortado, URL sin host, error interno): no es un veredicto
+
+# Caracteres que no se re-codifican en el path/query (equivalente a requote_uri de requests)
+_SEGUROS_URI = "!#$%&'()*+,/:;=?@[]~-._"
+
+Origen = Tuple[str, str, int]
+ResultadoSondeo = Tuple[str, Optional[int]]  # (estado, código HTTP final o None si no hubo respuesta)
+
+
+class ErrorSondeo(Exception):
+    """Fallo de red/protocolo durante el sondeo (equivale a RequestException en requests)."""
+
+
+# =========================================================================================
+# 🚧 AGRUPACIÓN POR HOST Y CORTACIRCUITOS
+# =========================================================================================
+
+def host_de_url(url: str) -> str:
+    """Devuelve el host (en minúsculas) de la URL, o '' si no es válida."""
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def intercalar_por_host(elementos: Iterable[Any], obtener_url: Callable[[Any], str] = lambda x: x) -> List[Any]:
+    """
+    Agrupa los elementos por host y los intercala (round-robin) para que los trabajos
+    consecutivos no apunten al mismo origen. El orden relativo dentro de cada host se conserva.
+    """
+    grupos: "OrderedDict[str, List[Any]]" = OrderedDict()
+    for elemento in elementos:
+        grupos.setdefault(host_de_url(obtener_url(elemento)), []).append(elemento)
+
+    intercalados = []
+    colas = [iter(grupo) for grupo in grupos.values()]
+    while colas:
+        siguientes = []
+        for cola in colas:
+            elemento = next(cola, None)
+            if elemento is not None:
+                intercalados.append(elemento)
+                siguientes.append(cola)
+        colas = siguientes
+    return intercalados
+
+
+class CortacircuitosHosts:
+    """
+    Cuenta los fallos consecutivos de conexión/timeout por host. Al alcanzar el umbral, el circuito
+    del host queda abierto durante el resto de la ejecución y sus URLs pendientes no se prueban.
+    Es seguro entre hilos (lo usan tanto el motor asyncio como la auditoría lenta multihilo).
+    """
+
+    def __init__(self, umbral: int = FALLOS_CORTE_HOST):
+        self.umbral = max(1, umbral)
+        self._fallos_consecutivos: Dict[str, int] = {}
+        self._abiertos = set()
+        self._omitidas = 0
+        self._lock = threading.Lock()
+
+    def abierto(self, host: str) -> bool:
+        """True si el host está cortado (y contabiliza la URL omitida)."""
+        with self._lock:
+            if host in self._abiertos:
+                self._omitidas += 1
+                return True
+            return False
+
+    def registrar_exito(self, host: str):
+        with self._lock:
+            self._fallos_consecutivos[host] = 0
+
+    def registrar_fallo(self, host: str):
+        with self._lock:
+            fallos = self._fallos_consecutivos.get(host, 0) + 1
+            self._fallos_consecutivos[host] = fallos
+            if fallos >= self.umbral and host not in self._abiertos:
+                self._abiertos.add(host)
+                logging.warning(f"🚧 Host '{host}' cortado tras {fallos} fallos consecutivos. Se omiten sus URLs restantes.")
+
+    @property
+    def hosts_cortados(self) -> int:
+        return len(self._abiertos)
+
+    @property
+    def urls_omitidas(self) -> int:
+        return self._omitidas
+
+
+# =========================================================================================
+# 🔌 POOL DE CONEXIONES KEEP-ALIVE
+# =========================================================================================
+
+def _bytes_pendientes(reader: asyncio.StreamReader) -> bool:
+    """
+    True si la conexión tiene bytes recibidos y sin leer (p. ej. un cuerpo enviado tras un HEAD).
+    Reutilizarla haría leer esos bytes como la respuesta a la siguiente petición.
+    StreamReader no expone su búfer: se consulta el atributo interno.
+    """
+    return bool(getattr(reader, "_buffer", b""))
+
+
+class PoolConexiones:
+    """
+    Mantiene conexiones HTTP/1.1 inactivas por origen (esquema, host, puerto) para reutilizarlas.
+
+    Respeta los proxies del entorno (HTTP_PROXY / HTTPS_PROXY / NO_PROXY, vía urllib): las URLs
+    https atraviesan el proxy con un túnel CONNECT y las http se piden al proxy en forma absoluta
+    (ver objetivo()). Solo proxies http://, con usuario y clave opcionales; con otro esquema de
+    proxy la conexión es directa. `proxies` ({esquema: URL del proxy}) sustituye al entorno.
+    """
+
+    def __init__(self, max_inactivas_por_origen: int = MAX_CONEXIONES_INACTIVAS_HOST,
+                 proxies: Optional[Dict[str, str]] = None):
+        self.max_inactivas_por_origen = max_inactivas_por_origen
+        self._inactivas: Dict[Origen, List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._contexto_ssl = ssl.create_default_context()
+        self._proxies = urllib.request.getproxies() if proxies is None else proxies
+
+    def _proxy(self, origen: Origen) -> Optional[Tuple[str, int, Optional[str]]]:
+        """(host, puerto, Proxy-Authorization o None) del proxy para el origen, o None si la conexión es directa."""
+        esquema, host, _ = origen
+        url_proxy = self._proxies.get(esquema)
+        if not url_proxy or urllib.request.proxy_bypass(host):
+            return None
+        partes = urlsplit(url_proxy if "://" in url_proxy else f"http://{url_proxy}")
+        if partes.scheme != "http" or not partes.hostname:
+            return None
+        autorizacion = None
+        if partes.username is not None:
+            credenciales = f"{unquote(partes.username)}:{unquote(partes.password or '')}"
+            autorizacion = "Basic " + base64.b64encode(credenciales.encode("utf-8")).decode("ascii")
+        return partes.hostname, partes.port or 80, autorizacion
+
+    def objetivo(self, origen: Origen, ruta: str, cabecera_host: str) -> Tuple[str, str]:
+        """
+        Destino de la línea de petición y cabeceras extra para el origen: (ruta, '') en conexión
+        directa o por túnel CONNECT, (URL absoluta, Proxy-Authorization) a través de un proxy http.
+        """
+        proxy = self._proxy(origen) if origen[0] == "http" else None
+        if proxy is None:
+            return ruta, ""
+        extra = f"Proxy-Authorization: {proxy[2]}\r\n" if proxy[2] else ""
+        return f"http://{cabecera_host}{ruta}", extra
+
+    async def obtener(self, origen: Origen) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Devuelve (reader, writer, reutilizada). Abre una conexión nueva si no hay inactivas."""
+        inactivas = self._inactivas.get(origen)
+        while inactivas:
+            reader, writer = inactivas.pop()
+            if not writer.is_closing() and not reader.at_eof() and not _bytes_pendientes(reader):
+                return reader, writer, True
+            writer.close()
+
+        esquema, host, puerto = origen
+        proxy = self._proxy(origen)
+        try:
+            if proxy is None:
+                reader, writer = await asyncio.open_connection(
+                    host, puerto,
+                    ssl=self._contexto_ssl if esquema == "https" else None,
+                    server_hostname=host if esquema == "https" else None,
+                )
+            else:
+                reader, writer = await asyncio.open_connection(proxy[0], proxy[1])
+                if esquema == "https":
+                    await self._abrir_tunel(reader, writer, host, puerto, proxy[2])
+        except (OSError, ssl.SSLError) as e:
+            raise ErrorSondeo(f"No se pudo conectar a {host}:{puerto}: {e}") from e
+        return reader, writer, False
+
+    async def _abrir_tunel(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                           host: str, puerto: int, autorizacion: Optional[str]):
+        """Túnel CONNECT a través del proxy y TLS con el origen por encima."""
+        destino = f"[{host}]:{puerto}" if ":" in host else f"{host}:{puerto}"
+        try:
+            writer.write((
+                f"CONNECT {destino} HTTP/1.1\r\nHost: {destino}\r\n"
+                + (f"Proxy-Authorization: {autorizacion}\r\n" if autorizacion else "")
+                + "\r\n"
+            ).encode("latin-1", errors="ignore"))
+            await writer.drain()
+            codigo, _ = await leer_respuesta(reader)
+            if codigo != 200:
+                raise ErrorSondeo(f"El proxy rechazó el túnel a {destino} (HTTP {codigo})")
+            await writer.start_tls(self._contexto_ssl, server_hostname=host)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            writer.close()
+            raise ErrorSondeo(f"Respuesta inválida del proxy para {destino}: {e}") from e
+        except BaseException:
+            writer.close()
+            raise
+
+    def devolver(self, origen: Origen, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Devuelve una conexión sana al pool (o la cierra si el pool del origen está lleno o quedan bytes sin leer)."""
+        inactivas = self._inactivas.setdefault(origen, [])
+        if (len(inactivas) < self.max_inactivas_por_origen and not writer.is_closing()
+                and not _bytes_pendientes(reader)):
+            inactivas.append((reader, writer))
+        else:
+            writer.close()
+
+    def cerrar(self):
+        """Cierra todas las conexiones inactivas."""
+        for inactivas in self._inactivas.values():
+            for _, writer in inactivas:
+                writer.close()
+        self._inactivas.clear()
+
+
+# =========================================================================================
+# 🛰️ MOTOR DE SONDEO (HEAD)
+# =========================================================================================
+
+def origen_y_ruta(url: str) -> Tuple[Origen, str, str]:
+    """Descompone la URL en (origen, ruta con query, cabecera Host)."""
+    partes = urlsplit(url)
+    esquema = partes.scheme.lower()
+    if esquema not in ("http", "https") or not partes.hostname:
+        raise ErrorSondeo(f"URL inválida: {url}")
+
+    try:
+        puerto = partes.port or (443 if esquema == "https" else 80)
+    except ValueError as e:
+        raise ErrorSondeo(f"Puerto inválido en {url}") from e
+
+    ruta = quote(partes.path or "/", safe=_SEGUROS_URI)
+    if partes.query:
+        ruta += "?" + quote(partes.query, safe=_SEGUROS_URI)
+
+    host = partes.hostname
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    cabecera_host = host if puerto in (80, 443) else f"{host}:{puerto}"
+    return (esquema, partes.hostname, puerto), ruta, cabecera_host
+
+
+async def leer_respuesta(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    """Lee la línea de estado y las cabeceras de una respuesta (sin el cuerpo). Ignora respuestas 1xx."""
+    while True:
+        linea_estado = await reader.readuntil(b"\r\n")
+        partes = linea_estado.decode("latin-1").split(None, 2)
+        if len(partes) < 2 or not partes[0].startswith("HTTP/") or not partes[1].isdigit():
+            raise ErrorSondeo(f"Respuesta HTTP inválida: {linea_estado[:60]!r}")
+        codigo = int(partes[1])
+
+        cabeceras: Dict[str, str] = {}
+        while True:
+            linea = await reader.readuntil(b"\r\n")
+            if linea == b"\r\n":
+                break
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        if 100 <= codigo < 200:
+            continue
+        return codigo, cabeceras
+
+
+class MotorSondeo:
+    """
+    Motor asyncio de sondeo HTTP HEAD con conexiones keep-alive y un número acotado
+    de peticiones en vuelo (global y por host). Devuelve los mismos estados que la antigua
+    prueba con requests: 'abierto' (2xx/3xx final), 'fallido' (otro código HTTP) o
+    'dudoso' (error de red/timeout). Las URLs que no llegan a la red (host cortado por el
+    cortacircuitos, URL sin host) devuelven SIN_SONDEAR: no son un veredicto y no deben cachearse.
+
+    Con `adaptativo`, `max_simultaneos` es la concurrencia inicial: un ControlAIMD la ajusta
+    (hasta FACTOR_MAXIMO_CONCURRENCIA veces) según la tasa de timeouts, y el timeout de cada
+    host sale de las latencias observadas (TimeoutsPorHost, con `timeout` como máximo).
+
+    Con `plazo` (instante de time.monotonic), las URLs que aún no han empezado cuando se
+    alcanza devuelven (NO_SONDEADO, None): el llamador conserva su estado anterior.
+    """
+
+    def __init__(self, timeout: float = TIMEOUT_SONDEO, max_simultaneos: int = MAX_SONDEOS_SIMULTANEOS,
+                 max_por_host: int = MAX_SONDEOS_POR_HOST,
+                 cortacircuitos: Optional[CortacircuitosHosts] = None,
+                 adaptativo: bool = CONTROL_ADAPTATIVO, plazo: Optional[float] = None,
+                 proxies: Optional[Dict[str, str]] = None):
+        self.timeout = timeout
+        self.plazo = plazo
+        self.max_simultaneos = max(1, max_simultaneos)
+        self.max_por_host = max(1, max_por_host)
+        self.pool = PoolConexiones(proxies=proxies)
+        self.cortacircuitos = cortacircuitos or CortacircuitosHosts()
+        self.control: Optional[ControlAIMD] = None
+        self.timeouts: Optional[TimeoutsPorHost] = None
+        if adaptativo:
+            self.control = ControlAIMD(self.max_simultaneos, maximo=self.max_simultaneos * FACTOR_MAXIMO_CONCURRENCIA)
+            self.timeouts = TimeoutsPorHost(timeout, TIMEOUT_MINIMO_SONDEO)
+        self._cupo: Optional[CupoAdaptativoAsync] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._semaforos_host: Dict[str, asyncio.Semaphore] = {}
+
+    async def _peticion_head(self, url: str) -> Tuple[int, Dict[str, str]]:
+        """Envía un HEAD por una conexión del pool. Reintenta una vez si la conexión reutilizada estaba muerta."""
+        origen, ruta, cabecera_host = origen_y_ruta(url)
+        objetivo, cabeceras_proxy = self.pool.objetivo(origen, ruta, cabecera_host)
+        peticion = (
+            f"HEAD {objetivo} HTTP/1.1\r\n"
+            f"Host: {cabecera_host}\r\n"
+            f"{cabeceras_proxy}"
+            f"User-Agent: {USER_AGENT}\r\n"
+            "Accept: */*\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1", errors="ignore")
+
+        for _ in range(2):
+            reader, writer, reutilizada = await self.pool.obtener(origen)
+            try:
+                writer.write(peticion)
+                await writer.drain()
+                codigo, cabeceras = await leer_respuesta(reader)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ErrorSondeo) as e:
+                writer.close()
+                if reutilizada:
+                    continue  # El servidor cerró la conexión inactiva: reintentar con una nueva
+                raise ErrorSondeo(str(e)) from e
+            except BaseException:
+                writer.close()
+                raise
+
+            if cabeceras.get("connection", "").lower() == "close":
+                writer.close()
+            else:
+                # devolver() la descarta si el servidor envió un cuerpo tras el HEAD (bytes sin leer)
+                self.pool.devolver(origen, reader, writer)
+            return codigo, cabeceras
+
+        raise ErrorSondeo(f"Conexión cerrada por el servidor: {url}")
+
+    async def _codigo_final(self, url: str) -> int:
+        """Sigue las redirecciones (como allow_redirects=True) y devuelve el código HTTP final."""
+        for _ in range(MAX_REDIRECCIONES + 1):
+            codigo, cabeceras = await self._peticion_head(url)
+            ubicacion = cabeceras.get("location")
+            if codigo in (301, 302, 303, 307, 308) and ubicacion:
+                url = urljoin(url, ubicacion)
+                continue
+            return codigo
+        raise ErrorSondeo("Demasiadas redirecciones")
+
+    async def sondear(self, url: str) -> str:
+        """Sondea una URL y devuelve 'abierto', 'fallido' o 'dudoso' (también si no se pudo sondear)."""
+        estado = (await self.sondear_detalle(url))[0]
+        return 'dudoso' if estado == SIN_SONDEAR else estado
+
+    async def _codigo_con_timeout(self, url: str, host: str, timeout: float) -> Tuple[Optional[int], bool]:
+        """Devuelve (código HTTP final o None si hubo error de red, True si venció el timeout)."""
+        inicio = time.monotonic()
+        try:
+            codigo = await asyncio.wait_for(self._codigo_final(url), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.cortacircuitos.registrar_fallo(host)
+            return None, True
+        except (ErrorSondeo, OSError):
+            self.cortacircuitos.registrar_fallo(host)
+            return None, False
+        except (UnicodeError, ValueError):
+            return None, False
+
+        if self.timeouts is not None:
+            self.timeouts.registrar_latencia(host, time.monotonic() - inicio)
+        self.cortacircuitos.registrar_exito(host)
+        return codigo, False
+
+    def _plazo_vencido(self) -> bool:
+        return self.plazo is not None and time.monotonic() >= self.plazo
+
+    async def sondear_detalle(self, url: str) -> ResultadoSondeo:
+        """Sondea una URL y devuelve (estado, código HTTP final)."""
+        if self.control is None and self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_simultaneos)
+        elif self.control is not None and self._cupo is None:
+            self._cupo = CupoAdaptativoAsync(self.control)
+
+        host = host_de_url(url)
+        if not host:
+            return SIN_SONDEAR, None
+        semaforo_host = self._semaforos_host.get(host)
+        if semaforo_host is None:
+            semaforo_host = self._semaforos_host[host] = asyncio.Semaphore(self.max_por_host)
+
+        # Primero el cupo del host: las URLs en espera de un host lento no ocupan cupo global.
+        async with semaforo_host:
+            if self.cortacircuitos.abierto(host):
+                return SIN_SONDEAR, None
+            if self._cupo is None:
+                async with self._semaforo:
+                    if self._plazo_vencido():
+                        return NO_SONDEADO, None
+                    codigo, _ = await self._codigo_con_timeout(url, host, self.timeout)
+            else:
+                await self._cupo.adquirir()
+                if self._plazo_vencido():
+                    await self._cupo.liberar()
+                    return NO_SONDEADO, None
+                vencido = None
+                try:
+                    codigo, vencido = await self._codigo_con_timeout(url, host, self.timeouts.timeout(host))
+                finally:
+                    await self._cupo.liberar(congestion=vencido)
+
+        if codigo is None:
+            return 'dudoso', None
+        return ('abierto' if codigo in CODIGOS_ABIERTO else 'fallido'), codigo
+
+    async def sondear_lote(self, urls: List[str],
+                           al_completar: Optional[Callable[[int, str], None]] = None,
+                           intercalar: bool = True) -> List[ResultadoSondeo]:
+        """
+        Sondea todas las URLs concurrentemente, intercaladas por host (o en el orden recibido
+        con intercalar=False, p. ej. si ya vienen ordenadas por valor).
+        Devuelve (estado, código HTTP) por URL, conservando el orden de entrada.
+        """
+        resultados: List[ResultadoSondeo] = [(SIN_SONDEAR, None)] * len(urls)
+
+        async def _tarea(i: int, url: str):
+            try:
+                resultados[i] = await self.sondear_detalle(url)
+            except Exception as e:
+                # Un origen con una respuesta imprevista no debe tumbar el lote entero
+                logging.debug(f"Error inesperado al sondear {url}: {type(e).__name__}: {e}")
+                resultados[i] = (SIN_SONDEAR, None)
+            if al_completar:
+                al_completar(i, resultados[i][0])
+
+        orden = intercalar_por_host(range(len(urls)), lambda i: urls[i]) if intercalar else range(len(urls))
+        try:
+            await asyncio.gather(*(_tarea(i, urls[i]) for i in orden))
+        finally:
+            self.pool.cerrar()
+
+        if self.control is not None and len(urls) > 1:
+            logging.info(f"📈 Concurrencia adaptativa: inicial {self.max_simultaneos}, final {self.control.limite}, "
+                         f"máxima {self.control.maximo_alcanzado}, reducciones por congestión {self.control.reducciones}.")
+        if self.cortacircuitos.hosts_cortados:
+            logging.info(f"🚧 Cortacircuitos: {self.cortacircuitos.hosts_cortados} hosts cortados, "
+                         f"{self.cortacircuitos.urls_omitidas} URLs sin sondear (sin veredicto).")
+        return resultados
+
+
+# =========================================================================================
+# 🔁 INTERFAZ SÍNCRONA (para los módulos de auditoría)
+# =========================================================================================
+
+def sondear_urls_detalle(urls: List[str], timeout: float = TIMEOUT_SONDEO,
+                         max_simultaneos: int = MAX_SONDEOS_SIMULTANEOS,
+                         al_completar: Optional[Callable[[int, str], None]] = None,
+                         max_por_host: int = MAX_SONDEOS_POR_HOST,
+                         fallos_corte_host: int = FALLOS_CORTE_HOST,
+                         adaptativo: bool = CONTROL_ADAPTATIVO,
+                         plazo: Optional[float] = None) -> List[ResultadoSondeo]:
+    """
+    Sondea un lote de URLs con un único bucle asyncio y devuelve (estado, código HTTP) en orden.
+    Con `adaptativo`, max_simultaneos es la concurrencia inicial y timeout el máximo por host.
+    Con `plazo`, las URLs se sondean en el orden recibido y las que no empiezan a tiempo
+    devuelven (NO_SONDEADO, None).
+    """
+    if not urls:
+        return []
+    motor = MotorSondeo(timeout=timeout, max_simultaneos=max_simultaneos, max_por_host=max_por_host,
+                        cortacircuitos=CortacircuitosHosts(fallos_corte_host), adaptativo=adaptativo, plazo=plazo)
+    return asyncio.run(motor.sondear_lote(urls, al_completar, intercalar=plazo is None))
+
+
+def sondear_urls(urls: List[str], timeout: float = TIMEOUT_SONDEO,
+                 max_simultaneos: int = MAX_SONDEOS_SIMULTANEOS,
+                 al_completar: Optional[Callable[[int, str], None]] = None,
+                 max_por_host: int = MAX_SONDEOS_POR_HOST,
+                 fallos_corte_host: int = FALLOS_CORTE_HOST) -> List[str]:
+    """Sondea un lote de URLs con un único bucle asyncio y devuelve sus estados en orden (SIN_SONDEAR -> 'dudoso')."""
+    resultados = sondear_urls_detalle(urls, timeout, max_simultaneos, al_completar, max_por_host, fallos_corte_host)
+    return ['dudoso' if estado == SIN_SONDEAR else estado for estado, _ in resultados]
+
+
+def sondear_url(url: str, timeout: float = TIMEOUT_SONDEO) -> str:
+    """Sondea una sola URL ('abierto', 'fallido' o 'dudoso')."""
+    return sondear_urls([url], timeout=timeout, max_simultaneos=1)[0]
@@ -0,0 +1,9 @@
+# tests/conftest.py
+# Los módulos de Beluga son planos (se importan por nombre desde su carpeta), igual que al
+# ejecutar `python main.py`: se añade la carpeta del proyecto al path.
+import os
+import sys
+
+CARPETA_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CARPETA_PROYECTO not in sys.path:
+    sys.path.insert(0, CARPETA_PROYECTO)
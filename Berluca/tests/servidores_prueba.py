@@ -0,0 +1,205 @@
+# tests/servidores_prueba.py
+# Servidores HTTP locales que imitan los servicios externos (API de GitHub, HLS).
+# Los usan las pruebas y los micro-benchmarks (`benchmarks.py github|hls`).
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+from typing import Any, Dict, List, Tuple, Type
+
+
+def iniciar_servidor(manejador: Type[BaseHTTPRequestHandler]) -> Tuple[ThreadingHTTPServer, str]:
+    """Arranca `manejador` en un puerto libre de 127.0.0.1 (hilo daemon). Devuelve (servidor, url_base)."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+class _ManejadorBase(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, codigo: int, cuerpo: bytes, tipo: str):
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorGitHubPrueba(_ManejadorBase):
+    """
+    API de GitHub mínima para un repositorio 'dueno/listas' (rama main):
+      /repos/dueno/listas/commits/main          -> SHA actual (Accept: application/vnd.github.sha)
+      /repos/dueno/listas/git/trees/<sha>       -> árbol recursivo (truncado si TRUNCADO)
+      /repos/dueno/listas/contents/<ruta>       -> listado de la API de Contenido (recorrido clásico)
+    Anota cada petición (ruta y cabecera Authorization) en PETICIONES.
+    Usar `ServidorGitHubPrueba.nuevo(archivos)` para obtener una subclase con su propio estado.
+    """
+    SHA = "a" * 40
+    TRUNCADO = False
+    ARCHIVOS: List[str] = []
+    PETICIONES: List[Dict[str, Any]] = []
+
+    @classmethod
+    def nuevo(cls, archivos: List[str]) -> Type["ServidorGitHubPrueba"]:
+        return type("ServidorGitHubPrueba", (cls,), {"ARCHIVOS": list(archivos), "PETICIONES": []})
+
+    def do_GET(self):
+        ruta = urlsplit(self.path).path
+        self.PETICIONES.append({"ruta": ruta, "autorizacion": self.headers.get("Authorization")})
+        prefijo = "/repos/dueno/listas/"
+        if ruta == prefijo + "commits/main":
+            self._responder(200, self.SHA.encode(), "text/plain")
+        elif ruta == prefijo + f"git/trees/{self.SHA}":
+            arbol = [{"path": archivo, "type": "blob"} for archivo in self.ARCHIVOS]
+            self._responder(200, json.dumps({"tree": arbol, "truncated": self.TRUNCADO}).encode(), "application/json")
+        elif ruta.startswith(prefijo + "contents"):
+            directorio = ruta[len(prefijo + "contents"):].strip("/")
+            base = f"http://{self.headers['Host']}/raw"
+            elementos, subdirectorios = [], set()
+            for archivo in self.ARCHIVOS:
+                if directorio and not archivo.startswith(directorio + "/"):
+                    continue
+                resto = archivo[len(directorio) + 1:] if directorio else archivo
+                if "/" in resto:
+                    subdirectorios.add(resto.split("/")[0])
+                else:
+                    elementos.append({"type": "file", "name": resto, "path": archivo,
+                                      "download_url": f"{base}/dueno/listas/main/{quote(archivo)}"})
+            elementos += [{"type": "dir", "name": nombre, "path": f"{directorio}/{nombre}".strip("/")}
+                          for nombre in sorted(subdirectorios)]
+            self._responder(200, json.dumps(elementos).encode(), "application/json")
+        else:
+            self._responder(404, b"{}", "application/json")
+
+
+class ServidorHLSPrueba(_ManejadorBase):
+    """
+    Servidor HLS mínimo (keep-alive, Range) para la sonda:
+      /vivo/N/master.m3u8     -> maestra con 2 variantes en directo y segmentos servibles   => 'abierto'
+      /parcial/N/master.m3u8  -> la variante más baja no existe (404), la siguiente sí      => 'abierto'
+      /roto/N/master.m3u8     -> ninguna de sus 2 variantes existe (404)                    => 'fallido'
+      /triple/N/master.m3u8   -> 3 variantes y solo existe la más alta (no se llega a ella) => indeciso
+      /web/N/canal.m3u8       -> página HTML con extensión .m3u8                            => indeciso
+    """
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo van en escrituras separadas
+    SEGMENTO = bytes([0x47]) * 188 * 64
+    MAESTRAS = {
+        "vivo": [(2500000, "alta.m3u8"), (800000, "baja.m3u8")],
+        "parcial": [(2500000, "alta.m3u8"), (800000, "no_existe.m3u8")],
+        "roto": [(2500000, "no_existe_a.m3u8"), (800000, "no_existe_b.m3u8")],
+        "triple": [(5000000, "alta.m3u8"), (2500000, "no_existe_a.m3u8"), (800000, "no_existe_b.m3u8")],
+    }
+
+    def do_GET(self):
+        tipo, _, resto = self.path.strip("/").partition("/")
+        archivo = resto.rpartition("/")[2]
+        if tipo in self.MAESTRAS and archivo == "master.m3u8":
+            cuerpo = "#EXTM3U\n" + "".join(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={ancho},CODECS=\"avc1.4d401f,mp4a.40.2\"\n{variante}\n"
+                for ancho, variante in self.MAESTRAS[tipo])
+            self._responder(200, cuerpo.encode(), "application/vnd.apple.mpegurl")
+        elif tipo in self.MAESTRAS and archivo in ("alta.m3u8", "baja.m3u8"):
+            segmentos = "".join(f"#EXTINF:6.0,\nseg{n}.ts\n" for n in range(100, 105))
+            self._responder(200, f"#EXTM3U\n#EXT-X-TARGETDURATION:6\n{segmentos}".encode(), "application/vnd.apple.mpegurl")
+        elif tipo in self.MAESTRAS and archivo.endswith(".ts"):
+            rango = self.headers.get("Range", "")
+            if rango.startswith("bytes=0-"):
+                fin = int(rango.split("-")[1]) + 1
+                self._responder(206, self.SEGMENTO[:fin], "video/mp2t")
+            else:
+                self._responder(200, self.SEGMENTO, "video/mp2t")
+        elif tipo == "web":
+            self._responder(200, b"<html><body>Reproductor</body></html>", "text/html")
+        else:
+            self._responder(404, b"no encontrado", "text/plain")
+
+
+class ServidorListasPrueba(_ManejadorBase):
+    """
+    Servidor de listas M3U con validadores para la caché de descargas:
+      /listas/<nombre>.m3u   -> 200 con ETag; 304 si If-None-Match coincide
+      /rebelde/<nombre>.m3u  -> 304 aunque no se envíen validadores (salvo con Cache-Control: no-cache)
+    Anota cada petición (ruta y código devuelto) en PETICIONES.
+    Usar `ServidorListasPrueba.nuevo()` para obtener una subclase con su propio estado.
+    """
+    VERSION = "1"
+    PETICIONES: List[Tuple[str, int]] = []
+
+    @classmethod
+    def nuevo(cls) -> Type["ServidorListasPrueba"]:
+        return type("ServidorListasPrueba", (cls,), {"PETICIONES": []})
+
+    def do_GET(self):
+        ruta = urlsplit(self.path).path
+        etag = f'"{ruta}-v{self.VERSION}"'
+        if ruta.startswith("/rebelde/") and self.headers.get("Cache-Control") != "no-cache":
+            codigo = 304
+        elif ruta.startswith(("/listas/", "/rebelde/")):
+            codigo = 304 if self.headers.get("If-None-Match") == etag else 200
+        else:
+            codigo = 404
+        self.PETICIONES.append((ruta, codigo))
+        if codigo == 304:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+        elif codigo == 200:
+            cuerpo = f"#EXTM3U\n#EXTINF:-1,{ruta} v{self.VERSION}\nhttp://canal.example{ruta}\n".encode()
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "audio/x-mpegurl")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        else:
+            self._responder(404, b"no encontrado", "text/plain")
+
+
+class ServidorHEADPrueba(_ManejadorBase):
+    """
+    Servidor para el motor de sondeo HEAD (keep-alive):
+      /cuerpo  -> 200 al HEAD, seguido (en la misma escritura) de un cuerpo que NO debería enviar
+                  y que parece otra respuesta (404)
+      otra     -> 200 sin cuerpo
+    Anota el puerto cliente de cada petición en CONEXIONES (un puerto distinto = una conexión nueva).
+    """
+    RESPUESTA_EXTRA = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+    CONEXIONES: List[int] = []
+
+    @classmethod
+    def nuevo(cls) -> Type["ServidorHEADPrueba"]:
+        return type("ServidorHEADPrueba", (cls,), {"CONEXIONES": []})
+
+    def do_HEAD(self):
+        self.CONEXIONES.append(self.client_address[1])
+        cabecera = b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n"
+        self.wfile.write(cabecera + (self.RESPUESTA_EXTRA if self.path == "/cuerpo" else b""))
+
+
+class ProxyPrueba(_ManejadorBase):
+    """
+    Proxy HTTP mínimo que responde él mismo: 200 a las peticiones en forma absoluta y 403 a CONNECT.
+    Anota (método, destino, Proxy-Authorization) en PETICIONES.
+    """
+    PETICIONES: List[Tuple[str, str, Any]] = []
+
+    @classmethod
+    def nuevo(cls) -> Type["ProxyPrueba"]:
+        return type("ProxyPrueba", (cls,), {"PETICIONES": []})
+
+    def _anotar_y_responder(self, codigo: int):
+        self.PETICIONES.append((self.command, self.path, self.headers.get("Proxy-Authorization")))
+        self.send_response(codigo)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._anotar_y_responder(200)
+
+    def do_CONNECT(self):
+        self._anotar_y_responder(403)
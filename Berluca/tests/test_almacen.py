@@ -0,0 +1,30 @@
+# tests/test_almacen.py
+import almacen
+from almacen import AlmacenCanales
+from modelo import Canal
+
+DIA = 24 * 3600
+
+
+def _canal(url, estado):
+    return Canal([f"#EXTINF:-1,{url}", f"#ESTADO:{estado}", url], url, url, "cine", estado)
+
+
+def test_historial_se_poda_y_conserva_el_ultimo_cambio(tmp_path, monkeypatch):
+    reloj = [1_700_000_000.0]
+    monkeypatch.setattr(almacen.time, "time", lambda: reloj[0])
+    with AlmacenCanales(str(tmp_path / "canales.sqlite3"), retencion=30 * DIA) as registro:
+        registro.reemplazar_inventario([_canal("http://a/1", "abierto"), _canal("http://a/2", "fallido")])
+        for estado in ("fallido", "abierto", "fallido"):
+            reloj[0] += 15 * DIA
+            registro.actualizar_estados([("http://a/1", estado)])
+
+        # Día 45: el alta (día 0) sale de la retención de 30 días y tiene cambios posteriores
+        assert [estado for estado, _ in registro.historial("http://a/1")] == ["fallido", "abierto", "fallido"]
+        # Sin cambios posteriores, el único registro de la URL se conserva aunque sea antiguo
+        assert [estado for estado, _ in registro.historial("http://a/2")] == ["fallido"]
+
+        reloj[0] += 100 * DIA
+        registro.actualizar_estados([("http://a/2", "fallido")])
+        assert [estado for estado, _ in registro.historial("http://a/1")] == ["fallido"]
+        assert [estado for estado, _ in registro.historial("http://a/2")] == ["fallido"]
@@ -0,0 +1,27 @@
+# tests/test_cache_clasificacion.py
+from cache_clasificacion import CacheClasificacion, firma_configuracion
+
+
+def test_guardar_olvida_los_nombres_no_consultados(tmp_path):
+    ruta = str(tmp_path / "clasificacion.json")
+    cache = CacheClasificacion("firma", ruta)
+    cache.registrar("canal uno", "cine")
+    cache.registrar("canal dos", "deportes")
+    cache.guardar()
+
+    cache = CacheClasificacion("firma", ruta)
+    assert cache.obtener("canal uno") == "cine"
+    cache.guardar()
+    assert len(CacheClasificacion("firma", ruta)) == 1
+
+    cache = CacheClasificacion("firma", ruta)
+    cache.guardar(purgar=False)
+    assert len(CacheClasificacion("firma", ruta)) == 1
+
+
+def test_otra_configuracion_descarta_la_cache(tmp_path):
+    ruta = str(tmp_path / "clasificacion.json")
+    cache = CacheClasificacion(firma_configuracion({"cine": ["film"]}), ruta)
+    cache.registrar("canal uno", "cine")
+    cache.guardar()
+    assert len(CacheClasificacion(firma_configuracion({"cine": ["film", "peli"]}), ruta)) == 0
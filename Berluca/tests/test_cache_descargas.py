@@ -0,0 +1,93 @@
+# tests/test_cache_descargas.py
+# Descargas condicionales (ETag) con la caché de descargas contra un servidor local.
+import json
+import os
+
+import pytest
+import requests
+
+import cache_descargas
+from cache_descargas import CacheDescargas, descargar_con_cache
+from servidores_prueba import ServidorListasPrueba, iniciar_servidor
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    """Servidor de listas con estado propio y la caché de descargas en una carpeta temporal."""
+    monkeypatch.setattr(cache_descargas, "CARPETA_CACHE_DESCARGAS", str(tmp_path / "descargas"))
+    monkeypatch.setattr(cache_descargas, "RUTA_INDICE_DESCARGAS", str(tmp_path / "descargas.json"))
+    manejador = ServidorListasPrueba.nuevo()
+    servidor, base = iniciar_servidor(manejador)
+    yield manejador, base, tmp_path
+    servidor.shutdown()
+
+
+def _leer(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_segunda_descarga_reutiliza_la_copia_con_304(entorno):
+    manejador, base, carpeta = entorno
+    url, destino = f"{base}/listas/a.m3u", str(carpeta / "a.m3u")
+    cache = CacheDescargas(str(carpeta / "descargas.json"))
+    descargar_con_cache(url, destino, cache=cache)
+    os.remove(destino)
+    descargar_con_cache(url, destino, cache=cache)
+    assert manejador.PETICIONES == [("/listas/a.m3u", 200), ("/listas/a.m3u", 304)]
+    assert "v1" in _leer(destino)
+
+
+def test_indice_se_escribe_una_vez_y_purga_las_listas_ausentes(entorno):
+    manejador, base, carpeta = entorno
+    ruta_indice = str(carpeta / "descargas.json")
+    cache = CacheDescargas(ruta_indice)
+    for nombre in ("a", "b"):
+        descargar_con_cache(f"{base}/listas/{nombre}.m3u", str(carpeta / f"{nombre}.m3u"), cache=cache)
+    assert not os.path.exists(ruta_indice)  # Nada se escribe por descarga
+    cache.guardar()
+    with open(ruta_indice, encoding="utf-8") as f:
+        assert sorted(json.load(f)) == [f"{base}/listas/a.m3u", f"{base}/listas/b.m3u"]
+
+    # Siguiente ejecución: 'b' ya no aparece y se olvida (entrada y cuerpo cacheado)
+    cache = CacheDescargas(ruta_indice)
+    descargar_con_cache(f"{base}/listas/a.m3u", str(carpeta / "a.m3u"), cache=cache)
+    cache.guardar()
+    with open(ruta_indice, encoding="utf-8") as f:
+        assert list(json.load(f)) == [f"{base}/listas/a.m3u"]
+    assert not os.path.exists(cache_descargas._ruta_cuerpo(f"{base}/listas/b.m3u"))
+
+
+def test_304_sin_copia_cacheada_repite_la_descarga_completa(entorno):
+    manejador, base, carpeta = entorno
+    destino = str(carpeta / "r.m3u")
+    descargar_con_cache(f"{base}/rebelde/r.m3u", destino, cache=CacheDescargas(str(carpeta / "descargas.json")))
+    assert manejador.PETICIONES == [("/rebelde/r.m3u", 304), ("/rebelde/r.m3u", 200)]
+    assert _leer(destino).startswith("#EXTM3U")
+
+
+def test_lista_cambiada_se_descarga_de_nuevo(entorno):
+    manejador, base, carpeta = entorno
+    url, destino = f"{base}/listas/a.m3u", str(carpeta / "a.m3u")
+    cache = CacheDescargas(str(carpeta / "descargas.json"))
+    descargar_con_cache(url, destino, cache=cache)
+    manejador.VERSION = "2"
+    descargar_con_cache(url, destino, cache=cache)
+    assert [codigo for _, codigo in manejador.PETICIONES] == [200, 200]
+    assert "v2" in _leer(destino)
+
+
+def test_fallo_al_escribir_el_indice_no_falla_la_descarga(entorno):
+    manejador, base, carpeta = entorno
+    ruta_indice = carpeta / "indice_es_carpeta"
+    ruta_indice.mkdir()  # os.replace sobre una carpeta falla con OSError
+    cache = CacheDescargas(str(ruta_indice))
+    assert descargar_con_cache(f"{base}/listas/a.m3u", str(carpeta / "a.m3u"), cache=cache)
+    cache.guardar()  # Se registra el aviso, sin excepción
+
+
+def test_error_http_se_propaga(entorno):
+    _, base, carpeta = entorno
+    with pytest.raises(requests.exceptions.HTTPError):
+        descargar_con_cache(f"{base}/no_existe.m3u", str(carpeta / "x.m3u"),
+                            cache=CacheDescargas(str(carpeta / "descargas.json")))
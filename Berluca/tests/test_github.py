@@ -0,0 +1,73 @@
+# tests/test_github.py
+# Descubrimiento de listas en GitHub (git/trees + caché por SHA) contra una API local.
+from urllib.parse import quote
+
+import pytest
+
+import main as beluga
+from servidores_prueba import ServidorGitHubPrueba, iniciar_servidor
+
+REPO_URL = "https://github.com/dueno/listas/tree/main/listas"
+ARCHIVOS = [f"listas/pais_{i % 7}/lista {i}.m3u" if i % 3 else f"listas/lista_{i}.m3u8" for i in range(30)]
+ARCHIVOS += ["listas/LEEME.md", "README.md", "otros/fuera.m3u"]
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """API de GitHub local con estado propio y la caché de árboles en una carpeta temporal."""
+    monkeypatch.setattr(beluga, "RUTA_CACHE_ARBOLES", str(tmp_path / "github_arboles.json"))
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    manejador = ServidorGitHubPrueba.nuevo(ARCHIVOS)
+    servidor, base = iniciar_servidor(manejador)
+    yield manejador, base
+    servidor.shutdown()
+
+
+def _recolectar(api, token=None):
+    manejador, base = api
+    manejador.PETICIONES.clear()
+    return sorted(beluga.recolectar_urls_desde_repositorio(
+        REPO_URL, token=token, api_base=base, raw_base=f"{base}/raw"))
+
+
+def _esperadas(base):
+    return sorted(f"{base}/raw/dueno/listas/main/{quote(archivo)}" for archivo in ARCHIVOS
+                  if archivo.startswith("listas/") and archivo.endswith((".m3u", ".m3u8")))
+
+
+def test_arbol_nuevo_cuesta_dos_peticiones(api):
+    manejador, base = api
+    assert _recolectar(api) == _esperadas(base)
+    assert len(manejador.PETICIONES) == 2
+
+
+def test_repositorio_sin_cambios_cuesta_una_peticion(api):
+    manejador, base = api
+    _recolectar(api)
+    assert _recolectar(api) == _esperadas(base)
+    assert [p["ruta"] for p in manejador.PETICIONES] == ["/repos/dueno/listas/commits/main"]
+
+
+def test_nuevo_commit_descarga_el_arbol_de_nuevo(api):
+    manejador, base = api
+    _recolectar(api)
+    manejador.SHA = "b" * 40
+    assert _recolectar(api) == _esperadas(base)
+    assert len(manejador.PETICIONES) == 2
+    assert manejador.PETICIONES[1]["ruta"].endswith("git/trees/" + "b" * 40)
+
+
+def test_token_en_todas_las_peticiones(api):
+    manejador, _ = api
+    _recolectar(api, token="token-prueba")
+    assert manejador.PETICIONES
+    assert all(p["autorizacion"] == "Bearer token-prueba" for p in manejador.PETICIONES)
+
+
+def test_arbol_truncado_recurre_a_la_api_de_contenido(api):
+    manejador, base = api
+    manejador.TRUNCADO = True
+    # El recorrido clásico aplica el mismo filtro de extensiones (.m3u y .m3u8) que el árbol
+    assert _recolectar(api, token="token-prueba") == _esperadas(base)
+    assert any("/contents" in p["ruta"] for p in manejador.PETICIONES)
+    assert all(p["autorizacion"] == "Bearer token-prueba" for p in manejador.PETICIONES)
@@ -0,0 +1,56 @@
+# tests/test_sonda_hls.py
+# Sonda HLS nativa contra un servidor HLS local.
+import time
+
+import pytest
+
+from sonda_hls import analizar_lista_hls, es_url_hls, sondear_hls
+from servidores_prueba import ServidorHLSPrueba, iniciar_servidor
+
+
+@pytest.fixture(scope="module")
+def base():
+    servidor, url_base = iniciar_servidor(ServidorHLSPrueba)
+    yield url_base
+    servidor.shutdown()
+
+
+def _url(base, tipo, n=0):
+    return f"{base}/{tipo}/{n}/" + ("canal.m3u8" if tipo == "web" else "master.m3u8")
+
+
+@pytest.mark.parametrize("tipo, esperado", [
+    ("vivo", "abierto"),
+    ("parcial", "abierto"),   # La variante más baja da 404: se prueba la siguiente
+    ("roto", "fallido"),      # Ninguna variante de la maestra existe
+    ("triple", None),         # Faltan las dos variantes probadas, pero no todas: lo decide Streamlink
+    ("web", None),            # No es HLS
+])
+def test_veredictos(base, tipo, esperado):
+    assert sondear_hls([_url(base, tipo)]) == [esperado]
+
+
+def test_lote_conserva_el_orden(base):
+    tipos = ["vivo", "roto", "web", "parcial"] * 5
+    urls = [_url(base, tipo, i) for i, tipo in enumerate(tipos)]
+    esperado = {"vivo": "abierto", "parcial": "abierto", "roto": "fallido", "web": None}
+    assert sondear_hls(urls) == [esperado[tipo] for tipo in tipos]
+
+
+def test_plazo_vencido_no_prueba(base):
+    assert sondear_hls([_url(base, "vivo")], plazo=time.monotonic() - 1) == [None]
+
+
+def test_analizar_lista_maestra_y_de_medios():
+    variantes, segmentos, es_final = analizar_lista_hls(
+        "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000,CODECS=\"a,b\"\nbaja.m3u8\n", "http://h/c/master.m3u8")
+    assert variantes == [(800000, "http://h/c/baja.m3u8")] and segmentos == [] and not es_final
+
+    variantes, segmentos, es_final = analizar_lista_hls(
+        "#EXTM3U\n#EXTINF:6,\nseg1.ts\n#EXTINF:6,\n/abs/seg2.ts\n#EXT-X-ENDLIST\n", "http://h/c/baja.m3u8")
+    assert variantes == [] and segmentos == ["http://h/c/seg1.ts", "http://h/abs/seg2.ts"] and es_final
+
+
+def test_es_url_hls():
+    assert es_url_hls("http://h/canal.M3U8?token=1")
+    assert not es_url_hls("http://h/canal.php?f=x.m3u8")
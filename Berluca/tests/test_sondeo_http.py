@@ -0,0 +1,70 @@
+# tests/test_sondeo_http.py
+# Motor de sondeo HEAD: reutilización de conexiones y proxies.
+import asyncio
+import base64
+
+import pytest
+
+from sondeo_http import MotorSondeo
+from servidores_prueba import ProxyPrueba, ServidorHEADPrueba, iniciar_servidor
+
+
+def _sondear(urls, **opciones):
+    motor = MotorSondeo(max_simultaneos=1, max_por_host=1, adaptativo=False, **opciones)
+    return [estado for estado, _ in asyncio.run(motor.sondear_lote(urls, intercalar=False))]
+
+
+@pytest.fixture
+def servidor_head():
+    manejador = ServidorHEADPrueba.nuevo()
+    servidor, base = iniciar_servidor(manejador)
+    yield manejador, base
+    servidor.shutdown()
+
+
+@pytest.fixture
+def proxy():
+    manejador = ProxyPrueba.nuevo()
+    servidor, base = iniciar_servidor(manejador)
+    yield manejador, base
+    servidor.shutdown()
+
+
+def test_conexion_con_cuerpo_tras_head_no_se_reutiliza(servidor_head):
+    manejador, base = servidor_head
+    # Sin descartar la conexión, el 404 sobrante se leería como respuesta de la segunda URL
+    assert _sondear([f"{base}/cuerpo", f"{base}/otra"], proxies={}) == ["abierto", "abierto"]
+    assert len(set(manejador.CONEXIONES)) == 2
+
+
+def test_conexion_limpia_se_reutiliza(servidor_head):
+    manejador, base = servidor_head
+    assert _sondear([f"{base}/a", f"{base}/b"], proxies={}) == ["abierto", "abierto"]
+    assert len(set(manejador.CONEXIONES)) == 1
+
+
+def test_http_a_traves_del_proxy_en_forma_absoluta(proxy, monkeypatch):
+    manejador, base = proxy
+    monkeypatch.delenv("no_proxy", raising=False)
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    url_proxy = base.replace("http://", "http://usuario:clave@")
+    assert _sondear(["http://canal.invalid/vivo.m3u8"], proxies={"http": url_proxy}) == ["abierto"]
+    credenciales = "Basic " + base64.b64encode(b"usuario:clave").decode()
+    assert manejador.PETICIONES == [("HEAD", "http://canal.invalid/vivo.m3u8", credenciales)]
+
+
+def test_https_a_traves_del_proxy_con_connect(proxy, monkeypatch):
+    manejador, base = proxy
+    monkeypatch.delenv("no_proxy", raising=False)
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    # El proxy de prueba rechaza el túnel: sin conexión directa de reserva, el canal queda 'dudoso'
+    assert _sondear(["https://canal.invalid/vivo.m3u8"], proxies={"https": base}) == ["dudoso"]
+    assert manejador.PETICIONES == [("CONNECT", "canal.invalid:443", None)]
+
+
+def test_no_proxy_conecta_directo(proxy, servidor_head, monkeypatch):
+    manejador_proxy, base_proxy = proxy
+    _, base = servidor_head
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    assert _sondear([f"{base}/a"], proxies={"http": base_proxy}) == ["abierto"]
+    assert manejador_proxy.PETICIONES == []